@@ -1,6 +1,8 @@
 from flask import Flask
 from .config import config
 from .extensions import db, migrate, login_manager, oauth
+from .services.url_cache import signed_url_cache
+from .services.task_runner import local_task_runner
 
 def create_app(config_name=None):
     if config_name is None:
@@ -18,6 +20,8 @@ def create_app(config_name=None):
     migrate.init_app(app, db)
     login_manager.init_app(app)
     oauth.init_app(app)
+    signed_url_cache.max_entries = app.config['SIGNED_URL_CACHE_SIZE']
+    local_task_runner.init_app(app)
     oauth.register(
         name='google',
         server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
@@ -52,8 +56,9 @@ def create_app(config_name=None):
         from flask import render_template
         return render_template('404.html'), 404
 
-    from app.utils.filters import friendly_date
+    from app.utils.filters import friendly_date, media_url
     app.jinja_env.filters['friendly_date'] = friendly_date
+    app.jinja_env.globals['media_url'] = media_url
 
     return app
 
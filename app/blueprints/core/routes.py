@@ -1,12 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app
+from flask import Blueprint, render_template, redirect, url_for, request, flash
 from app.utils.decorators import role_required
 from flask_login import login_required, current_user
 from app.services import MediaService
 import uuid6
-import google.auth
-from google.cloud import storage
-from google.auth import impersonated_credentials
-import os
+from app.services.storage_backend import get_storage
 
 core_bp = Blueprint('core', __name__)
 media_service = MediaService()
@@ -17,19 +14,22 @@ def index():
     sort_by = request.args.get('sort', 'created_at_desc')
     filter_type = request.args.get('type', 'all')
     
-    media_list = media_service.get_global_media(
+    media_list, next_cursor = media_service.get_media_feed(
         sort_by=sort_by, 
         filter_type=filter_type, 
         user_id=current_user.id
     )
-    return render_template('index.html', media_list=media_list, user=current_user)
+    # Sign every image on the page in one pass and embed the direct URLs
+    object_names = media_service.media_object_names(media_list) + [current_user.avatar_url]
+    signed_urls = media_service.get_render_urls(n for n in object_names if n and not n.startswith('http'))
+
+    return render_template('index.html', media_list=media_list, next_cursor=next_cursor, signed_urls=signed_urls, user=current_user)
 
 @core_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
     if request.method == 'POST':
         from app.extensions import db
-        import os
         from werkzeug.utils import secure_filename
         
         # Update text fields
@@ -54,40 +54,15 @@ def profile():
             if file and file.filename != '':
                 filename = secure_filename(f"avatar_{current_user.id}_{uuid6.uuid6()}.png")
                 
-                if current_app.config.get('STORAGE_BACKEND') == 'gcs':
-                    # GCS Logic - Inlined for minimal impact, eventually ensure this is shared
-                    try:
-                        credentials, project = google.auth.default()
-                        sa_email = os.environ.get('SERVICE_ACCOUNT_EMAIL') or f"thesalo-app-sa@{current_app.config['GOOGLE_CLOUD_PROJECT']}.iam.gserviceaccount.com"
-                        credentials = impersonated_credentials.Credentials(
-                            source_credentials=credentials,
-                            target_principal=sa_email,
-                            target_scopes=["https://www.googleapis.com/auth/cloud-platform"],
-                            lifetime=3600
-                        )
-                        storage_client = storage.Client(credentials=credentials)
-                        bucket_name = current_app.config['GCS_BUCKET_NAME']
-                        bucket = storage_client.bucket(bucket_name)
-                        blob = bucket.blob(f"avatars/{filename}")
-                        file.seek(0)
-                        blob.upload_from_file(file)
-                        current_user.avatar_url = f"avatars/{filename}"
-                    except Exception as e:
-                        print(f"GCS Upload Error: {e}")
-                        # Fallback or Error? 
-                        # Giving error message is better
-                        flash(f'アイコンのアップロードに失敗しました: {e}', 'error')
-                        return redirect(url_for('core.profile'))
-                else:
-                    # Save to uploads folder (make sure to use absolute path provided by config)
-                    # For local we might want avatars/ prefix too if we want consistence?
-                    # Original code was root relative? os.path.join(UPLOAD_FOLDER, filename)
-                    # Let's keep original local behavior but maybe prefix with avatars/ for cleanness if I can?
-                    # The original code: file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                    # It saved directly to uploads/. I'll keep it as is to avoid breaking existing local avatars paths
-                    # unless I move them.
-                    file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                    current_user.avatar_url = filename
+                object_name = f"avatars/{filename}"
+                try:
+                    file.seek(0)
+                    get_storage().put(object_name, file, file.mimetype or None)
+                    current_user.avatar_url = object_name
+                except Exception as e:
+                    print(f"Avatar Upload Error: {e}")
+                    flash(f'アイコンのアップロードに失敗しました: {e}', 'error')
+                    return redirect(url_for('core.profile'))
         
         try:
             db.session.commit()
@@ -1,11 +1,16 @@
-from flask import Blueprint, request, jsonify, send_from_directory, current_app, abort, render_template, redirect
+from flask import Blueprint, request, jsonify, current_app, abort, render_template, redirect, make_response
 from flask_login import login_required, current_user
-from app.services import MediaService
+from app.services import MediaService, UploadSessionService
+from app.services.storage_backend import get_storage
 from app.utils.decorators import role_required
+from app.utils.file_serving import send_local_file
+from app.utils.dates import parse_taken_at, to_jst
 import uuid6
+import time
 
 media_bp = Blueprint('media', __name__)
 media_service = MediaService()
+upload_session_service = UploadSessionService()
 
 @media_bp.route('/add', methods=['GET'])
 @login_required
@@ -22,27 +27,36 @@ def upload():
         
     files = request.files.getlist('file')
     comments = request.form.getlist('comments')
-    results = []
+    # Get description by index if available
+    uploads = [
+        (file, comments[i] if i < len(comments) else None)
+        for i, file in enumerate(files)
+        if file.filename != ''
+    ]
     
-    for i, file in enumerate(files):
-        if file.filename == '':
-            continue
-        try:
-            # Get description by index if available
-            description = comments[i] if i < len(comments) else None
-            
-            # Upload global media using current user as uploader
-            media = media_service.upload_media(file, current_user, description=description)
-            results.append({
-                'id': str(media.id),
-                'filename': media.filename,
-                'status': media.status
-            })
-        except ValueError as e:
-            return jsonify({'error': str(e)}), 400
-        except Exception as e:
-            print(f"Upload error: {e}")
-            return jsonify({'error': 'Internal server error'}), 500
+    try:
+        # Upload global media using current user as uploader
+        media_list, failures = media_service.upload_media_batch(uploads, current_user)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Upload error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+    results = [{
+        'id': str(media.id),
+        'filename': media.filename,
+        'status': media.status,
+        'duplicate': getattr(media, 'is_duplicate', False)
+    } for media in media_list]
+
+    if failures:
+        # Files that were stored are kept; report the ones that weren't
+        return jsonify({
+            'error': 'Internal server error',
+            'uploaded': results,
+            'failed': [filename for filename, _ in failures]
+        }), 500
              
     return jsonify({'uploaded': results})
 
@@ -50,9 +64,6 @@ def upload():
 @login_required
 @role_required('family')
 def sign_upload():
-    if current_app.config.get('STORAGE_BACKEND') != 'gcs':
-        return jsonify({'error': 'Direct upload only supported for GCS'}), 400
-        
     data = request.get_json()
     filename = data.get('filename')
     mime_type = data.get('mime_type')
@@ -72,6 +83,33 @@ def sign_upload():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@media_bp.route('/upload/local/<path:object_name>', methods=['PUT'])
+def put_local_upload(object_name):
+    """
+    Target of the signed PUT URLs issued by /upload/sign when storage isn't GCS.
+    Like a GCS signed URL, the signature is the credential (no session needed).
+    """
+    if get_storage().serves_signed_urls:
+        abort(404)
+    if not media_service.is_upload_object_name(object_name):
+        return jsonify({'error': 'Invalid object name'}), 400
+
+    try:
+        expires_at = int(request.args.get('expires', '0'))
+        size = media_service.store_local_upload(
+            object_name,
+            request.headers.get('Content-Type', ''),
+            expires_at,
+            request.args.get('signature'),
+            request.stream
+        )
+    except (PermissionError, ValueError):
+        return jsonify({'error': 'Invalid or expired upload URL'}), 403
+    except FileExistsError:
+        return jsonify({'error': 'Object already exists'}), 409
+
+    return jsonify({'object_name': object_name, 'size': size}), 201
+
 @media_bp.route('/upload/finalize', methods=['POST'])
 @login_required
 @role_required('family')
@@ -95,17 +133,126 @@ def finalize_upload():
             mime_type=mime_type,
             file_size=int(file_size),
             uploader=current_user,
-            description=description
+            description=description,
+            crc32c=data.get('crc32c')
         )
         return jsonify({
             'id': str(media.id),
             'filename': media.filename,
-            'status': media.status
+            'status': media.status,
+            'duplicate': getattr(media, 'is_duplicate', False)
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Finalize error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# --- Resumable chunked uploads (large files) ---
+
+def _load_upload_session(token):
+    try:
+        return upload_session_service.load_session(token, current_user.id)
+    except PermissionError:
+        abort(make_response(jsonify({'error': 'Permission denied'}), 403))
+    except ValueError as e:
+        abort(make_response(jsonify({'error': str(e)}), 400))
+
+@media_bp.route('/upload/sessions', methods=['POST'])
+@login_required
+@role_required('family')
+def create_upload_session():
+    data = request.get_json() or {}
+    filename = data.get('filename')
+    mime_type = data.get('mime_type') or 'application/octet-stream'
+    size = data.get('size')
+
+    if not filename or not size:
+        return jsonify({'error': 'Missing required fields'}), 400
+    if not media_service.allowed_file(filename):
+        return jsonify({'error': 'Invalid file extension'}), 400
+
+    try:
+        session = upload_session_service.create_session(
+            media_service._new_object_name(filename), mime_type, int(size), current_user.id
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(session)
+
+@media_bp.route('/upload/sessions/<token>', methods=['GET'])
+@login_required
+@role_required('family')
+def upload_session_status(token):
+    session = _load_upload_session(token)
+    return jsonify({
+        'object_name': session['object_name'],
+        'part_size': session['part_size'],
+        'parts': session['parts'],
+        'parallelism': current_app.config['UPLOAD_PART_PARALLELISM'],
+        'direct_parts': get_storage().resumable_uploads,
+        'completed_parts': upload_session_service.completed_parts(session)
+    })
+
+@media_bp.route('/upload/sessions/<token>/parts/<int:index>', methods=['POST'])
+@login_required
+@role_required('family')
+def start_upload_part(token, index):
+    """Hand out a resumable upload URI for one part (backends with direct uploads, e.g. GCS)."""
+    if not get_storage().resumable_uploads:
+        return jsonify({'error': 'Parts are PUT to this URL with this storage backend'}), 400
+    session = _load_upload_session(token)
+    try:
+        url = upload_session_service.part_upload_url(session, index, request.host_url.rstrip('/'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'url': url, 'size': upload_session_service.part_length(session, index)})
+
+@media_bp.route('/upload/sessions/<token>/parts/<int:index>', methods=['PUT'])
+@login_required
+@role_required('family')
+def put_upload_part(token, index):
+    """Stand-in for resumable part uploads on backends without them (local, memory)."""
+    if get_storage().resumable_uploads:
+        return jsonify({'error': 'Upload parts directly to storage'}), 400
+    session = _load_upload_session(token)
+    try:
+        size = upload_session_service.store_part(session, index, request.stream)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'part': index, 'size': size})
+
+@media_bp.route('/upload/sessions/<token>/complete', methods=['POST'])
+@login_required
+@role_required('family')
+def complete_upload_session(token):
+    session = _load_upload_session(token)
+    data = request.get_json() or {}
+
+    try:
+        upload_session_service.assemble(session)
+        media = media_service.finalize_upload(
+            object_name=session['object_name'],
+            original_filename=data.get('original_filename') or session['object_name'].rsplit('/', 1)[-1],
+            mime_type=session['mime_type'],
+            file_size=session['size'],
+            uploader=current_user,
+            description=data.get('description'),
+            crc32c=data.get('crc32c')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Upload session error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'id': str(media.id),
+        'filename': media.filename,
+        'status': media.status,
+        'duplicate': getattr(media, 'is_duplicate', False)
+    })
+
 @media_bp.route('/file/<path:filename>')
 @login_required
 def serve_file(filename):
@@ -113,34 +260,91 @@ def serve_file(filename):
     # filename likely starts with family_uuid/...
     # For now, strict login required is enforced.
     
-    if current_app.config['STORAGE_BACKEND'] == 'gcs':
+    if get_storage().serves_signed_urls:
         try:
-            url = media_service.generate_signed_url(filename)
-            return redirect(url)
+            if filename.endswith('.m3u8'):
+                return _hls_playlist_response(filename)
+            return _redirect_to_signed_url(filename)
         except Exception as e:
             print(f"Error generating signed URL: {e}")
             abort(404)
             
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    return send_local_file(filename)
+
+def _hls_playlist_response(filename):
+    # Relative segment URIs would resolve against the signed playlist URL and fail,
+    # so the playlist is served from here with every segment URL signed
+    text, max_age = media_service.render_hls_playlist(filename)
+    response = make_response(text)
+    response.headers['Content-Type'] = 'application/vnd.apple.mpegurl'
+    response.headers['Cache-Control'] = f'private, max-age={max(max_age, 0)}'
+    return response
 
 @media_bp.route('/thumb/<path:filename>')
 @login_required
 def serve_thumbnail(filename):
-    if current_app.config['STORAGE_BACKEND'] == 'gcs':
+    if get_storage().serves_signed_urls:
         try:
             # Thumbnails same bucket? assuming yes or same logic
-            url = media_service.generate_signed_url(filename)
-            return redirect(url)
+            return _redirect_to_signed_url(filename)
         except Exception as e:
             print(f"Error generating thumbnail signed URL: {e}")
             abort(404)
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    return send_local_file(filename)
+
+def _redirect_to_signed_url(filename):
+    url, expires_at = media_service.get_cached_signed_url(filename)
+    response = redirect(url)
+    # Let the browser reuse the redirect while the URL is still comfortably valid
+    max_age = int(expires_at - time.time()) - current_app.config['SIGNED_URL_MIN_REMAINING_SEC']
+    if max_age > 0:
+        response.headers['Cache-Control'] = f'private, max-age={max_age}'
+    return response
+
+@media_bp.route('/feed', methods=['GET'])
+@login_required
+def feed():
+    """Cursor-paginated gallery feed used by the index page's infinite scroll."""
+    sort_by = request.args.get('sort', 'created_at_desc')
+    filter_type = request.args.get('type', 'all')
+    cursor = request.args.get('cursor') or None
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+    try:
+        media_list, next_cursor = media_service.get_media_feed(
+            cursor=cursor,
+            limit=limit,
+            sort_by=sort_by,
+            filter_type=filter_type,
+            user_id=current_user.id
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'items': [{
+            'id': str(m.id),
+            'filename': m.filename,
+            'mime_type': m.mime_type,
+            'thumbnail_path': m.thumbnail_path,
+            'renditions': m.renditions or [],
+            'status': m.status,
+            'is_favorited': getattr(m, 'is_favorited', False),
+            'taken_at': to_jst(m.taken_at).isoformat() if m.taken_at else None,
+            'created_at': m.created_at.isoformat()
+        } for m in media_list],
+        'html': render_template(
+            'partials/media_items.html',
+            media_list=media_list,
+            signed_urls=media_service.get_render_urls(media_service.media_object_names(media_list))
+        ),
+        'next_cursor': next_cursor
+    })
 
 @media_bp.route('/<string:media_id>/update', methods=['POST'])
 @login_required
 @role_required('family')
 def update_media(media_id):
-    from app.services import MediaService
     from app.extensions import db
     
     try:
@@ -153,9 +357,13 @@ def update_media(media_id):
         
         description = request.form.get('description')
         taken_at = request.form.get('taken_at')
+        parsed_taken_at = parse_taken_at(taken_at)
+        if taken_at and parsed_taken_at is None:
+            return jsonify({'error': 'Invalid taken_at'}), 400
         
         media.description = description
-        media.taken_at = taken_at
+        media.taken_at = parsed_taken_at
+        media.taken_at_legacy = None
         
         db.session.commit()
         return jsonify({'success': True})
@@ -181,10 +389,66 @@ def delete_media_item(media_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@media_bp.route('/bulk-delete', methods=['POST'])
+@login_required
+@role_required('owner')
+def bulk_delete_media():
+    """Delete the selected media: {"ids": [...]} -> per-item results."""
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return jsonify({'error': 'Missing ids'}), 400
+    if len(ids) > current_app.config['BULK_DELETE_MAX_ITEMS']:
+        return jsonify({'error': f"Too many items (max {current_app.config['BULK_DELETE_MAX_ITEMS']})"}), 400
+
+    try:
+        results = media_service.delete_media_bulk([str(i) for i in ids], current_user)
+    except Exception as e:
+        print(f"Bulk delete error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'deleted': sum(1 for r in results if r['status'] == 'deleted'),
+        'results': results
+    })
+
+@media_bp.route('/<string:media_id>/similar', methods=['GET'])
+@login_required
+@role_required('owner')
+def similar_media(media_id):
+    """Near-duplicate images of one photo (perceptual-hash distance), closest first."""
+    media = media_service.get_media(media_id)
+    if not media:
+        return jsonify({'error': 'Media not found'}), 404
+
+    max_distance = request.args.get('distance', current_app.config['SIMILAR_MEDIA_DISTANCE'], type=int)
+    max_distance = min(max(max_distance, 0), current_app.config['SIMILAR_MEDIA_MAX_DISTANCE'])
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+
+    try:
+        matches = media_service.find_similar_media(media, max_distance, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'id': str(media.id),
+        'distance': max_distance,
+        'items': [{
+            'id': str(m.id),
+            'filename': m.filename,
+            'mime_type': m.mime_type,
+            'thumbnail_path': m.thumbnail_path,
+            'width': m.width,
+            'height': m.height,
+            'distance': distance,
+            'dhash_distance': d_distance,
+            'created_at': m.created_at.isoformat()
+        } for m, distance, d_distance in matches]
+    })
+
 @media_bp.route('/<string:media_id>/details', methods=['GET'])
 @login_required
 def get_media_details(media_id):
-    from app.services import MediaService
     media = media_service.get_media(media_id)
     if not media:
         return jsonify({'error': 'Not found'}), 404
@@ -192,7 +456,8 @@ def get_media_details(media_id):
     return jsonify({
         'id': str(media.id),
         'description': media.description,
-        'taken_at': media.taken_at,
+        # JST wall time; the edit form's datetime-local input uses the first 16 chars
+        'taken_at': to_jst(media.taken_at).isoformat() if media.taken_at else None,
         'filename': media.filename,
         'mime_type': media.mime_type,
         'thumbnail_path': media.thumbnail_path
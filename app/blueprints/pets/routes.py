@@ -1,16 +1,21 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_login import login_required
+from flask_login import login_required, current_user
 from app.utils.decorators import role_required
-from app.services import PetService
+from app.services import PetService, MediaService
 
 pets_bp = Blueprint('pets', __name__)
 pet_service = PetService()
+media_service = MediaService()
 
 @pets_bp.route('/', methods=['GET'])
 @login_required
 def list_pets():
     pets = pet_service.get_all_pets()
-    return render_template('pets.html', pets=pets)
+    avatars = [p.avatar_url for p in pets if p.avatar_url and not p.avatar_url.startswith('http')]
+    if current_user.avatar_url and not current_user.avatar_url.startswith('http'):
+        avatars.append(current_user.avatar_url)
+    signed_urls = media_service.get_render_urls(avatars)
+    return render_template('pets.html', pets=pets, signed_urls=signed_urls)
 
 @pets_bp.route('/add', methods=['POST'])
 @login_required
@@ -1,13 +1,23 @@
+import json
 import os
 import shutil
 import tempfile
+import traceback
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required
 from app.extensions import db
 from app.models.media import Media
-from google.cloud import storage
+from app.services.ffmpeg_executor import ffmpeg_executor
+from app.services.storage_backend import get_storage
+from app.utils.dates import parse_exif_datetime
+from app.utils.decorators import role_required
+from app.utils.hashing import phash, dhash
 import uuid6
-from PIL import Image, ImageOps
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+from sqlalchemy import or_
 import pillow_heif
 import subprocess
 import magic
@@ -16,6 +26,44 @@ tasks_bp = Blueprint('tasks', __name__)
 
 pillow_heif.register_heif_opener()
 
+# Longest edge of each image rendition, largest first.
+# The first entry is the main display size (stored as media.filename).
+RENDITION_WIDTHS = (1920, 640, 320)
+# Encoded for every width; formats the installed Pillow can't write are skipped
+RENDITION_FORMATS = ('jpeg', 'webp', 'avif')
+RENDITION_ENCODERS = {
+    'jpeg': ('jpg', 'image/jpeg', {'quality': 85}),
+    'webp': ('webp', 'image/webp', {'quality': 80, 'method': 4}),
+    'avif': ('avif', 'image/avif', {'quality': 60, 'speed': 8}),
+}
+# Downscaling first takes cheap integer reductions (decoder scaling, Image.reduce)
+# while the image stays at least this many times the target, then resamples with LANCZOS
+RESIZE_REDUCING_GAP = 2.0
+# Browser-playable video outputs (H.264 High 4:2:0 + AAC in MP4), largest first:
+# (longest edge, x264 rate control, AAC bitrate). The first is stored as media.filename,
+# the others as 'mp4' renditions for phones and slow connections.
+VIDEO_RENDITIONS = (
+    (1920, ["-crf", "23", "-maxrate", "8M", "-bufsize", "16M"], "128k"),
+    (854, ["-crf", "28", "-maxrate", "1500k", "-bufsize", "3M"], "96k"),
+)
+VIDEO_X264_PRESET = 'veryfast'
+# HLS bitrate ladder for long/large videos: (short edge, video bitrate kbps, AAC bitrate).
+# Rungs taller than the source are skipped (the smallest is always kept).
+HLS_LADDER = (
+    (1080, 5000, "128k"),
+    (720, 2800, "128k"),
+    (480, 1200, "96k"),
+    (360, 700, "64k"),
+)
+HLS_CONTENT_TYPES = {'.m3u8': 'application/vnd.apple.mpegurl', '.ts': 'video/mp2t'}
+# Grid hover previews: a sprite sheet of frames spread over the video (scrubbing)
+# and a short muted clip, both small enough to fetch on hover
+PREVIEW_SPRITE_FRAMES = 10
+PREVIEW_SPRITE_COLUMNS = 5
+PREVIEW_FRAME_WIDTH = 160
+PREVIEW_CLIP_SEC = 3
+PREVIEW_CLIP_WIDTH = 320
+
 @tasks_bp.route('/handlers/process-media', methods=['POST'])
 def process_media():
     payload = request.get_json()
@@ -23,95 +71,195 @@ def process_media():
         return jsonify({'error': 'Missing media_id'}), 400
         
     media_id = payload['media_id']
-    print(f"Propcessing task for media_id: {media_id}")
+    print(f"Processing task for media_id: {media_id}")
     
-    # Process
+    # Cloud Tasks redelivers anything but a 2xx: retry transient failures and items
+    # another worker still holds, acknowledge everything else
     try:
-        _process_media_logic(media_id)
-    except Exception as e:
-        print(f"Error processing media {media_id}: {e}")
-        # Return 200 to acknowledge task (so it doesn't retry infinitely if fatal error)
-        # Or 500 to retry? 
-        # For now, let's return 200 but mark as error in DB
-        return jsonify({'status': 'error', 'message': str(e)}), 200
-        
-    return jsonify({'status': 'success'}), 200
+        outcome = _process_media_logic(media_id)
+    except RetryableProcessingError as e:
+        print(f"Retryable error processing media {media_id}: {e}")
+        return jsonify({'status': 'retry', 'message': str(e)}), 500
+    except ValueError:
+        return jsonify({'error': 'Invalid media_id'}), 400
+
+    if outcome == 'busy':
+        return jsonify({'status': 'busy'}), 409
+    return jsonify({'status': outcome}), 200
+
+@tasks_bp.route('/handlers/ffmpeg-metrics', methods=['GET'])
+@login_required
+@role_required('owner')
+def ffmpeg_metrics():
+    """Queue depth and latencies of ffmpeg jobs run by this process."""
+    return jsonify(ffmpeg_executor.metrics())
+
+class RetryableProcessingError(Exception):
+    """Processing failed for a transient reason (storage, network, timeout); try again later."""
+
+class LeaseLost(Exception):
+    """Another worker took the item over after this worker's claim expired."""
+
+# Failures caused by the file itself, which no retry can fix
+FATAL_PROCESSING_ERRORS = (
+    UnidentifiedImageError,
+    Image.DecompressionBombError,
+    subprocess.CalledProcessError,
+    ValueError,
+)
 
 def _process_media_logic(media_id_str):
-    media = db.session.get(Media, uuid6.UUID(media_id_str))
-    if not media:
-        print(f"Media not found: {media_id_str}")
-        return
+    """
+    Process one media item, at most once at a time across every worker and runner.
 
-    is_gcs = current_app.config['STORAGE_BACKEND'] == 'gcs'
-    bucket = None
-    
-    if is_gcs:
-        storage_client = storage.Client()
-        bucket_name = current_app.config['GCS_BUCKET_NAME']
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(media.filename)
-        
-        if not blob.exists():
-            print(f"GCS object not found: {media.filename}")
-            media.status = 'error'
-            db.session.commit()
-            return
-    else:
-        # Local
-        full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], media.filename)
-        if not os.path.exists(full_path):
-            print(f"Local file not found: {full_path}")
-            media.status = 'error'
-            db.session.commit()
-            return
-
-    # Create Temp Dir
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        local_filename = Path(media.filename).name
-        local_file_path = temp_path / local_filename
-        
-        # Download / Copy
-        if is_gcs:
-            bucket.blob(media.filename).download_to_filename(str(local_file_path))
-        else:
-            full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], media.filename)
-            shutil.copy(full_path, local_file_path)
-        
-        # Process
-        updated = False
-        
+    Returns 'ready' when processed, 'skipped' when it already was (a duplicate
+    delivery: one UPDATE and one lookup), 'busy' while another worker holds the
+    claim, 'missing' or 'error'. Fatal failures set status 'error'; transient ones
+    release the claim and raise RetryableProcessingError until
+    MEDIA_PROCESSING_MAX_ATTEMPTS claims have been used.
+    """
+    media_id = uuid6.UUID(media_id_str)
+    claim = _claim_media(media_id)
+    if claim != 'claimed':
+        print(f"Media {media_id_str} not processed: {claim}")
+        return claim
+
+    media = db.session.get(Media, media_id, populate_existing=True)
+    storage = get_storage()
+    if not storage.exists(media.filename):
+        print(f"Stored object not found: {media.filename}")
+        _finish_media(media, 'error', 'Stored object not found')
+        return 'error'
+
+    superseded = []
+    try:
         if media.mime_type.startswith('image/'):
-            updated = _process_image(media, local_file_path, bucket)
+            superseded = _process_image(media, storage)
         elif media.mime_type.startswith('video/'):
-            updated = _process_video(media, local_file_path, bucket)
-            
-        media.status = 'ready'
-        db.session.commit()
+            superseded = _process_video(media, storage)
+    except LeaseLost:
+        # The row now belongs to the other worker; leave it untouched
+        print(f"Media {media_id_str} was claimed by another worker, giving up")
+        db.session.rollback()
+        return 'busy'
+    except Exception as e:
+        message = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        print(f"Error processing media {media_id_str}: {message}")
+        db.session.rollback()
+        media = db.session.get(Media, media_id, populate_existing=True)
+        retryable = not isinstance(e, FATAL_PROCESSING_ERRORS)
+        if retryable and media.processing_attempts < current_app.config['MEDIA_PROCESSING_MAX_ATTEMPTS']:
+            _finish_media(media, 'processing', message)
+            raise RetryableProcessingError(message) from e
+        _finish_media(media, 'error', message)
+        return 'error'
+
+    _finish_media(media, 'ready')
+    # Only now that the row points at the new objects: until then a rollback (and the
+    # retry after it) still needs the original
+    for object_name in superseded:
+        try:
+            storage.delete(object_name)
+        except Exception as e:
+            print(f"Failed to delete original {object_name}: {e}")
+    return 'ready'
+
+def _claim_media(media_id):
+    """
+    Take the processing lease with a single compare-and-set UPDATE: only a
+    'processing' row whose lease is free or expired can be claimed, so concurrent
+    deliveries of the same item can't both win. Returns 'claimed', or why not.
+    """
+    now = _utcnow()
+    lease = timedelta(seconds=current_app.config['MEDIA_PROCESSING_LEASE_SEC'])
+    result = db.session.execute(
+        db.update(Media)
+        .where(
+            Media.id == media_id,
+            Media.status == 'processing',
+            or_(Media.processing_lease_until.is_(None), Media.processing_lease_until < now)
+        )
+        .values(processing_lease_until=now + lease, processing_attempts=Media.processing_attempts + 1)
+    )
+    db.session.commit()
+    if result.rowcount == 1:
+        return 'claimed'
+
+    status = db.session.execute(db.select(Media.status).where(Media.id == media_id)).scalar()
+    return {None: 'missing', 'ready': 'skipped', 'error': 'error'}.get(status, 'busy')
+
+def _renew_lease(media, duration_sec=None):
+    """
+    Extend the claim to cover the next ffmpeg job: its wait for a slot plus its
+    timeout, so a long video keeps its claim however long each job takes. Written
+    on a connection of its own, leaving the item's pending changes uncommitted.
+    Raises LeaseLost when the claim (identified by its attempt number) is gone.
+    """
+    config = current_app.config
+    seconds = max(
+        config['MEDIA_PROCESSING_LEASE_SEC'],
+        config['FFMPEG_QUEUE_TIMEOUT_SEC'] + ffmpeg_executor.timeout_for(duration_sec)
+    )
+    with db.engine.begin() as connection:
+        result = connection.execute(
+            db.update(Media)
+            .where(
+                Media.id == media.id,
+                Media.status == 'processing',
+                Media.processing_attempts == media.processing_attempts
+            )
+            .values(processing_lease_until=_utcnow() + timedelta(seconds=seconds))
+        )
+    if result.rowcount != 1:
+        raise LeaseLost(str(media.id))
+
+def _finish_media(media, status, error=None):
+    media.status = status
+    media.processing_error = error
+    media.processing_lease_until = None
+    db.session.commit()
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _open_source(media, storage):
+    """
+    The original as something Image.open() can read, without copying it first.
+    Local files are opened by path (so Pillow can memory-map uncompressed data);
+    other backends stream through their reader (GCS buffers at most
+    PROCESSING_READ_CHUNK_SIZE bytes at a time).
+    """
+    path = storage.local_path(media.filename)
+    if path is not None:
+        return nullcontext(path)
+    return storage.open(media.filename)
+
+def _process_image(media, storage):
+    """Returns the object names this replaced, to delete once the row is committed."""
+    superseded = []
+    with _open_source(media, storage) as source, Image.open(source) as img:
+        _request_reduced_decode(img, RENDITION_WIDTHS[0])
+        # Decode fully before anything is written back under the same name
+        img.load()
 
-def _process_image(media, file_path, bucket):
-    with Image.open(file_path) as img:
         # EXIF Date
         exif = img._getexif()
-        taken_at = None
         if exif:
-             # 36867: DateTimeOriginal, 36868: DateTimeDigitized, 306: DateTime
-            dt_str = exif.get(36867) or exif.get(36868) or exif.get(306)
-            if dt_str:
-                try:
-                    taken_at = dt_str.replace(":", "-", 2).replace(" ", "T")
+            # (date tag, matching offset tag): 36867/36881 DateTimeOriginal/OffsetTimeOriginal,
+            # 36868/36882 DateTimeDigitized/OffsetTimeDigitized, 306/36880 DateTime/OffsetTime
+            for date_tag, offset_tag in ((36867, 36881), (36868, 36882), (306, 36880)):
+                taken_at = parse_exif_datetime(exif.get(date_tag), exif.get(offset_tag))
+                if taken_at:
                     media.taken_at = taken_at
-                    print(f"EXIF Date found for {media.id}: {taken_at}")
-                except Exception as e:
-                    print(f"Error parsing EXIF date '{dt_str}' for {media.id}: {e}")
+                    print(f"EXIF Date found for {media.id}: {taken_at.isoformat()}")
+                    break
             else:
                 print(f"No valid date EXIF found for {media.id}. Keys present: {list(exif.keys())}")
         else:
             print(f"No EXIF data found for {media.id}")
         
         # Resize/Convert
-        max_size = 1920
+        max_size = RENDITION_WIDTHS[0]
         img = ImageOps.exif_transpose(img)
         
         if img.mode in ("RGBA", "P"):
@@ -120,76 +268,389 @@ def _process_image(media, file_path, bucket):
         ratio = min(1.0, max_size / max(img.size))
         if ratio < 1.0:
             new_size = (int(img.width * ratio), int(img.height * ratio))
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
+            img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
             
         media.width = img.width
         media.height = img.height
-        
-        # Save as JPEG
-        current_ext = file_path.suffix.lower()
-        new_filename = file_path.stem + ".jpg"
-        new_file_path = file_path.parent / new_filename
-        
-        img.save(new_file_path, "JPEG", quality=85)
+        # Computed on the display-size image: cheap, and insensitive to the original's encoding
+        media.phash = phash(img)
+        media.dhash = dhash(img)
         
         # Upload back if changed/resized
-        is_gcs = (bucket is not None)
+        p = Path(media.filename)
         new_object_name = media.filename # default same
         
-        if current_ext not in ['.jpg', '.jpeg']:
+        if p.suffix.lower() not in ['.jpg', '.jpeg']:
             # New extension
-            p = Path(media.filename)
-            new_object_name = str(p.parent / new_filename).replace('\\', '/')
-            
-            # Delete old
-            if is_gcs:
-                try:
-                    bucket.blob(media.filename).delete()
-                except: pass
-            else:
-                old_full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], media.filename)
-                if os.path.exists(old_full_path):
-                    os.remove(old_full_path)
-
+            new_object_name = str(p.parent / (p.stem + ".jpg")).replace('\\', '/')
+            superseded.append(media.filename)
             media.filename = new_object_name
             media.mime_type = 'image/jpeg'
         
         # Save new file
-        if is_gcs:
-            blob = bucket.blob(new_object_name)
-            blob.upload_from_filename(str(new_file_path), content_type='image/jpeg')
-        else:
-            dest_path = os.path.join(current_app.config['UPLOAD_FOLDER'], new_object_name)
-            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-            shutil.copy(new_file_path, dest_path)
+        _store_image(storage, img, new_object_name, 'JPEG', 'image/jpeg', quality=85)
+
+        # Smaller sizes and modern formats, all derived from the already decoded image
+        media.renditions = _generate_renditions(img, new_object_name, storage)
         
-    return True
+    return superseded
 
-def _process_video(media, file_path, bucket):
-    # Thumbnail generation
-    thumb_name = f"{file_path.stem}_thumb.jpg"
-    thumb_path = file_path.parent / thumb_name
-    
+def _request_reduced_decode(img, max_size):
+    """
+    Ask the decoder for a smaller image when the original is at least twice `max_size`.
+    Must be called before load(). JPEG then decodes straight at 1/2, 1/4 or 1/8 scale
+    (so a 48 MP photo is never expanded to full size) and HEIC uses an embedded
+    thumbnail when one is big enough; other formats ignore the request. The decoded
+    image is never smaller than `max_size`, so the LANCZOS resample still sets the
+    final size.
+    """
+    ratio = max_size / max(img.size)
+    if ratio <= 0.5:
+        img.draft(None, (max(1, int(img.width * ratio)), max(1, int(img.height * ratio))))
+
+def _generate_renditions(img, object_name, storage):
+    """
+    Encode the grid/lightbox renditions of an already decoded, oriented image.
+    Sizes are produced largest first and each one is downscaled from the previous
+    step instead of the full-size original, so the decode happens only once.
+    The main JPEG at RENDITION_WIDTHS[0] is stored as media.filename itself.
+    """
+    p = Path(object_name)
+    renditions = []
+    formats = [fmt for fmt in RENDITION_FORMATS if fmt == 'jpeg' or features.check(fmt)]
+    current = img
+
+    for i, max_size in enumerate(RENDITION_WIDTHS):
+        ratio = min(1.0, max_size / max(current.size))
+        if ratio < 1.0:
+            current = current.resize(
+                (max(1, int(current.width * ratio)), max(1, int(current.height * ratio))),
+                Image.Resampling.LANCZOS,
+                reducing_gap=RESIZE_REDUCING_GAP
+            )
+        elif i > 0:
+            # Source is already smaller than this step; the previous rendition covers it
+            continue
+
+        for fmt in formats:
+            if fmt == 'jpeg' and i == 0:
+                # Main file, already stored
+                continue
+
+            ext, mime, save_kwargs = RENDITION_ENCODERS[fmt]
+            rendition_name = f"{p.stem}_{max_size}.{ext}"
+            rendition_object_name = str(p.parent / "renditions" / rendition_name).replace('\\', '/')
+            _store_image(storage, current, rendition_object_name, fmt.upper(), mime, **save_kwargs)
+
+            renditions.append({
+                'format': fmt,
+                'width': current.width,
+                'height': current.height,
+                'path': rendition_object_name
+            })
+
+    return renditions
+
+def _store_image(storage, img, object_name, image_format, content_type, **save_kwargs):
+    """Encode an image straight into storage (no intermediate file)."""
+    with storage.writer(object_name, content_type) as f:
+        img.save(f, image_format, **save_kwargs)
+
+def _process_video(media, storage):
+    """Returns the object names this replaced, to delete once the row is committed."""
+    with _video_source(media, storage) as source:
+        # One ffprobe pass for metadata and for deciding how much re-encoding is needed
+        _renew_lease(media)
+        info = _probe_video(source)
+        media.duration_sec = info['duration']
+        media.video_codec = info['video_codec']
+        _renew_lease(media, info['duration'])
+        _store_video_thumbnail(media, source, storage)
+        superseded = _transcode_video(media, source, info, storage)
+        _renew_lease(media, info['duration'])
+        media.renditions = media.renditions + _generate_video_previews(media, source, info, storage)
+        if _wants_hls(media, info):
+            _renew_lease(media, info['duration'])
+            media.renditions = media.renditions + [_package_hls(media, source, info, storage)]
+    return superseded
+
+@contextmanager
+def _video_source(media, storage):
+    """Filesystem path of the original for ffmpeg/ffprobe."""
+    path = storage.local_path(media.filename)
+    if path is not None:
+        # ffmpeg reads the local file in place
+        yield path
+        return
+
+    # MP4/MOV need a seekable input (the moov atom is often at the end), so remote
+    # videos are still downloaded once; outputs are written next to it
+    with tempfile.TemporaryDirectory() as temp_dir:
+        local_file_path = Path(temp_dir) / Path(media.filename).name
+        with storage.open(media.filename) as source, open(local_file_path, 'wb') as f:
+            shutil.copyfileobj(source, f, 1024 * 1024)
+        yield str(local_file_path)
+
+def _probe_video(source):
+    """
+    Duration, display size (rotation applied) and codecs of a video via ffprobe:
+    {'duration', 'width', 'height', 'video_codec', 'audio_codec', 'pix_fmt', 'container'}.
+    """
     cmd = [
-        "ffmpeg", "-y", "-ss", "00:00:01", "-i", str(file_path),
-        "-vframes", "1", "-q:v", "5", str(thumb_path)
+        "ffprobe", "-v", "error", "-print_format", "json",
+        "-show_format", "-show_streams", source
     ]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = ffmpeg_executor.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    probe = json.loads(result.stdout or b'{}')
+
+    streams = probe.get('streams', [])
+    video = next((st for st in streams if st.get('codec_type') == 'video'), None)
+    audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+    if video is None:
+        raise ValueError("No video stream found")
+
+    width, height = int(video.get('width') or 0), int(video.get('height') or 0)
+    # Phones record portrait video as landscape frames plus a rotation
+    rotation = video.get('tags', {}).get('rotate')
+    for side_data in video.get('side_data_list', []):
+        if 'rotation' in side_data:
+            rotation = side_data['rotation']
+    if rotation is not None and abs(int(float(rotation))) % 180 == 90:
+        width, height = height, width
+
+    duration = probe.get('format', {}).get('duration') or video.get('duration')
+    return {
+        'duration': float(duration) if duration else None,
+        'width': width,
+        'height': height,
+        'video_codec': video.get('codec_name'),
+        'audio_codec': audio.get('codec_name') if audio else None,
+        'pix_fmt': video.get('pix_fmt'),
+        'container': probe.get('format', {}).get('format_name', ''),
+    }
+
+def _is_browser_playable(info, max_edge):
+    """H.264 4:2:0 with AAC (or no audio) in MP4/MOV and no larger than max_edge: a remux suffices."""
+    return (
+        'mp4' in info['container'].split(',')
+        and info['video_codec'] == 'h264'
+        and info['pix_fmt'] == 'yuv420p'
+        and info['audio_codec'] in ('aac', None)
+        and max(info['width'], info['height']) <= max_edge
+    )
+
+def _video_output_size(info, max_edge):
+    ratio = min(1.0, max_edge / max(info['width'], info['height']))
+    # x264 with 4:2:0 chroma needs even dimensions
+    return (
+        max(2, int(info['width'] * ratio) // 2 * 2),
+        max(2, int(info['height'] * ratio) // 2 * 2),
+    )
+
+def _transcode_video(media, source, info, storage):
+    """
+    Store a browser-playable H.264/AAC MP4 as media.filename (replacing the original)
+    plus smaller renditions for phones. Every output has the moov atom first
+    (+faststart), so playback starts after the first few KB instead of a full download.
+    Originals that are already H.264/AAC MP4 of a suitable size are only remuxed.
+    Returns the replaced original's name, if it had another extension.
+    """
+    p = Path(media.filename)
+    main_object_name = str(p.with_suffix('.mp4')).replace('\\', '/')
+    renditions = []
+    outputs = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for i, (max_edge, x264_args, audio_bitrate) in enumerate(VIDEO_RENDITIONS):
+            if i > 0 and max(info['width'], info['height']) <= max_edge:
+                # Source is already this small; the main file serves phones too
+                continue
+
+            output = str(Path(temp_dir) / f"out_{max_edge}.mp4")
+            if i == 0 and _is_browser_playable(info, max_edge):
+                size = (info['width'], info['height'])
+                codec_args = ["-c", "copy"]
+            else:
+                size = _video_output_size(info, max_edge)
+                codec_args = [
+                    "-vf", f"scale={size[0]}:{size[1]}",
+                    "-c:v", "libx264", "-preset", VIDEO_X264_PRESET, "-profile:v", "high", "-pix_fmt", "yuv420p",
+                    *x264_args,
+                    "-c:a", "aac", "-b:a", audio_bitrate, "-ac", "2",
+                ]
+            cmd = [
+                "ffmpeg", "-y", "-v", "error", "-i", source,
+                "-map", "0:v:0", "-map", "0:a:0?", *codec_args,
+                "-movflags", "+faststart", output
+            ]
+            _renew_lease(media, info['duration'])
+            ffmpeg_executor.run(cmd, timeout=ffmpeg_executor.timeout_for(info['duration']))
+
+            if i == 0:
+                object_name = main_object_name
+                media.width, media.height = size
+            else:
+                object_name = str(p.parent / "renditions" / f"{p.stem}_{max_edge}.mp4").replace('\\', '/')
+                renditions.append({'format': 'mp4', 'width': size[0], 'height': size[1], 'path': object_name})
+            outputs.append((object_name, output))
+
+        # Stored only once every encode has read the original, which the main file may replace
+        for object_name, output in outputs:
+            with open(output, 'rb') as f:
+                storage.put(object_name, f, 'video/mp4', os.path.getsize(output))
+
+    superseded = []
+    if main_object_name != media.filename:
+        superseded.append(media.filename)
+        media.filename = main_object_name
+    media.mime_type = 'video/mp4'
+    media.renditions = renditions
+    return superseded
+
+def _generate_video_previews(media, source, info, storage):
+    """
+    Hover previews for the grid, from one ffmpeg run: a JPEG sprite sheet of
+    PREVIEW_SPRITE_FRAMES frames spread over the whole video, decoded from keyframes
+    only (-skip_frame nokey), and a muted PREVIEW_CLIP_SEC clip taken 10% in, reached
+    with input seeking so nothing before it is decoded.
+    Returns the 'sprite' and 'preview' rendition entries.
+    """
+    duration = info['duration'] or PREVIEW_CLIP_SEC
+    frame_w, frame_h = _scaled_even(info, PREVIEW_FRAME_WIDTH)
+    clip_w, clip_h = _scaled_even(info, PREVIEW_CLIP_WIDTH)
+    rows = -(-PREVIEW_SPRITE_FRAMES // PREVIEW_SPRITE_COLUMNS)
+    clip_start = max(0.0, min(duration * 0.1, duration - PREVIEW_CLIP_SEC))
+
+    p = Path(media.filename)
+    sprite_object_name = str(p.parent / "renditions" / f"{p.stem}_sprite.jpg").replace('\\', '/')
+    clip_object_name = str(p.parent / "renditions" / f"{p.stem}_preview.mp4").replace('\\', '/')
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sprite_path = str(Path(temp_dir) / "sprite.jpg")
+        clip_path = str(Path(temp_dir) / "preview.mp4")
+        filters = ';'.join([
+            f"[0:v]fps={PREVIEW_SPRITE_FRAMES}/{duration:.3f},scale={frame_w}:{frame_h},"
+            f"tile={PREVIEW_SPRITE_COLUMNS}x{rows}[sprite]",
+            f"[1:v]fps=12,scale={clip_w}:{clip_h}[clip]",
+        ])
+        cmd = [
+            "ffmpeg", "-y", "-v", "error",
+            "-skip_frame", "nokey", "-i", source,
+            "-ss", f"{clip_start:.3f}", "-t", str(PREVIEW_CLIP_SEC), "-i", source,
+            "-filter_complex", filters,
+            "-map", "[sprite]", "-frames:v", "1", "-q:v", "6", sprite_path,
+            "-map", "[clip]", "-an", "-c:v", "libx264", "-preset", VIDEO_X264_PRESET,
+            "-crf", "32", "-pix_fmt", "yuv420p", "-movflags", "+faststart", clip_path,
+        ]
+        ffmpeg_executor.run(cmd, timeout=ffmpeg_executor.timeout_for(info['duration']))
+
+        for object_name, path, content_type in [
+            (sprite_object_name, sprite_path, 'image/jpeg'),
+            (clip_object_name, clip_path, 'video/mp4'),
+        ]:
+            with open(path, 'rb') as f:
+                storage.put(object_name, f, content_type, os.path.getsize(path))
+
+    return [
+        {
+            'format': 'sprite', 'width': frame_w, 'height': frame_h, 'path': sprite_object_name,
+            'frames': PREVIEW_SPRITE_FRAMES, 'columns': PREVIEW_SPRITE_COLUMNS,
+        },
+        {'format': 'preview', 'width': clip_w, 'height': clip_h, 'path': clip_object_name},
+    ]
+
+def _scaled_even(info, max_width):
+    """Display size scaled down to at most max_width wide, with even dimensions."""
+    ratio = min(1.0, max_width / info['width'])
+    return max(2, int(info['width'] * ratio) // 2 * 2), max(2, int(info['height'] * ratio) // 2 * 2)
+
+def _wants_hls(media, info):
+    config = current_app.config
+    if not config['HLS_ENABLED']:
+        return False
+    return (info['duration'] or 0) >= config['HLS_MIN_DURATION_SEC'] or media.file_size_bytes >= config['HLS_MIN_SIZE_BYTES']
+
+def _hls_ladder(info):
+    short_edge = min(info['width'], info['height'])
+    rungs = [rung for rung in HLS_LADDER if rung[0] <= short_edge]
+    return rungs or [HLS_LADDER[-1]]
+
+def _package_hls(media, source, info, storage):
+    """
+    Segment the video into an HLS bitrate ladder stored under
+    {dir}/hls/{stem}/ (master.m3u8, v{n}/index.m3u8, v{n}/seg_NNNNN.ts), all rungs
+    encoded in one ffmpeg run from a single decode. Keyframes are forced on segment
+    boundaries so players can switch rungs between any two segments.
+    Returns the 'hls' rendition entry pointing at the master playlist.
+    """
+    p = Path(media.filename)
+    prefix = str(p.parent / "hls" / p.stem).replace('\\', '/')
+    segment_sec = current_app.config['HLS_SEGMENT_SEC']
+    has_audio = info['audio_codec'] is not None
+    rungs = _hls_ladder(info)
+
+    sizes = []
+    filters = [f"[0:v]split={len(rungs)}" + ''.join(f"[s{i}]" for i in range(len(rungs)))]
+    for i, (short_edge, _, _) in enumerate(rungs):
+        ratio = min(1.0, short_edge / min(info['width'], info['height']))
+        size = (max(2, int(info['width'] * ratio) // 2 * 2), max(2, int(info['height'] * ratio) // 2 * 2))
+        sizes.append(size)
+        filters.append(f"[s{i}]scale={size[0]}:{size[1]}[v{i}]")
+
+    cmd = ["ffmpeg", "-y", "-v", "error", "-i", source, "-filter_complex", ';'.join(filters)]
+    for i, (_, video_kbps, audio_bitrate) in enumerate(rungs):
+        cmd += [
+            "-map", f"[v{i}]",
+            f"-c:v:{i}", "libx264", f"-b:v:{i}", f"{video_kbps}k",
+            f"-maxrate:v:{i}", f"{int(video_kbps * 1.07)}k", f"-bufsize:v:{i}", f"{int(video_kbps * 1.5)}k",
+        ]
+        if has_audio:
+            cmd += ["-map", "0:a:0", f"-c:a:{i}", "aac", f"-b:a:{i}", audio_bitrate, f"-ac:a:{i}", "2"]
+    stream_map = ' '.join(f"v:{i},a:{i}" if has_audio else f"v:{i}" for i in range(len(rungs)))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cmd += [
+            "-preset", VIDEO_X264_PRESET, "-profile:v", "high", "-pix_fmt", "yuv420p",
+            "-force_key_frames", f"expr:gte(t,n_forced*{segment_sec})", "-sc_threshold", "0",
+            "-f", "hls", "-hls_time", str(segment_sec), "-hls_playlist_type", "vod",
+            "-hls_flags", "independent_segments",
+            "-hls_segment_filename", str(Path(temp_dir) / "v%v" / "seg_%05d.ts"),
+            "-var_stream_map", stream_map,
+            str(Path(temp_dir) / "v%v" / "index.m3u8"),
+        ]
+        ffmpeg_executor.run(cmd, timeout=ffmpeg_executor.timeout_for(info['duration']))
+
+        # Segments and variant playlists first, so the master never points at missing files
+        for dirpath, _, filenames in os.walk(temp_dir):
+            for filename in sorted(filenames):
+                path = Path(dirpath) / filename
+                relative = path.relative_to(temp_dir).as_posix()
+                with open(path, 'rb') as f:
+                    storage.put(f"{prefix}/{relative}", f, HLS_CONTENT_TYPES.get(path.suffix), path.stat().st_size)
+
+    codecs = 'avc1.640028,mp4a.40.2' if has_audio else 'avc1.640028'
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for i, ((_, video_kbps, audio_bitrate), size) in enumerate(zip(rungs, sizes)):
+        bandwidth = int(video_kbps * 1.07) * 1000 + (int(audio_bitrate.rstrip('k')) * 1000 if has_audio else 0)
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={size[0]}x{size[1]},CODECS="{codecs}"')
+        lines.append(f"v{i}/index.m3u8")
+    master = f"{prefix}/master.m3u8"
+    storage.put_bytes(master, ('\n'.join(lines) + '\n').encode(), HLS_CONTENT_TYPES['.m3u8'])
+
+    return {'format': 'hls', 'width': sizes[0][0], 'height': sizes[0][1], 'path': master}
+
+def _store_video_thumbnail(media, source, storage):
+    # Thumbnail generation, written to stdout instead of a temp file
+    cmd = [
+        "ffmpeg", "-y", "-ss", "00:00:01", "-i", source,
+        "-vframes", "1", "-q:v", "5", "-f", "image2pipe", "-c:v", "mjpeg", "pipe:1"
+    ]
+    result = ffmpeg_executor.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
     
-    if thumb_path.exists():
+    if result.stdout:
         p = Path(media.filename)
-        thumb_object_name = str(p.parent / "thumbs" / thumb_name).replace('\\', '/')
-        
-        is_gcs = (bucket is not None)
+        thumb_object_name = str(p.parent / "thumbs" / f"{p.stem}_thumb.jpg").replace('\\', '/')
         
-        if is_gcs:
-            blob = bucket.blob(thumb_object_name)
-            blob.upload_from_filename(str(thumb_path), content_type='image/jpeg')
-        else:
-            dest_path = os.path.join(current_app.config['UPLOAD_FOLDER'], thumb_object_name)
-            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-            shutil.copy(thumb_path, dest_path)
+        storage.put_bytes(thumb_object_name, result.stdout, 'image/jpeg')
             
         media.thumbnail_path = thumb_object_name
-        
-    return True
@@ -14,6 +14,31 @@ class Config:
     # Uploads
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
     MAX_CONTENT_LENGTH = 1024 * 1024 * 1024  # 1GB limit as per design
+    # Files of one multi-file upload written to storage concurrently (server batch
+    # path) and sent at once by the browser (direct uploads)
+    UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', '8'))
+    # 'uuid7': {name}_{uuid7}.ext, no storage lookups (default).
+    # 'sequential': legacy {name}.ext / {name}_1.ext found by probing storage.
+    # Existing objects keep their names either way; only new uploads are affected.
+    UPLOAD_OBJECT_NAMING = os.environ.get('UPLOAD_OBJECT_NAMING', 'uuid7')
+    # Resumable uploads: files larger than one part are sent in parts (>= this size,
+    # at most 32 per file), this many at a time from the browser
+    UPLOAD_PART_SIZE = int(os.environ.get('UPLOAD_PART_SIZE', str(16 * 1024 * 1024)))
+    UPLOAD_PART_PARALLELISM = int(os.environ.get('UPLOAD_PART_PARALLELISM', '4'))
+    # Bulk delete: at most this many ids per request; local files are unlinked this many at a time
+    BULK_DELETE_MAX_ITEMS = int(os.environ.get('BULK_DELETE_MAX_ITEMS', '500'))
+    STORAGE_DELETE_WORKERS = int(os.environ.get('STORAGE_DELETE_WORKERS', '8'))
+    # Near-duplicate search: default/maximum pHash Hamming distance, and how often the
+    # in-process index picks up newly processed media
+    SIMILAR_MEDIA_DISTANCE = int(os.environ.get('SIMILAR_MEDIA_DISTANCE', '6'))
+    SIMILAR_MEDIA_MAX_DISTANCE = int(os.environ.get('SIMILAR_MEDIA_MAX_DISTANCE', '12'))
+    SIMILAR_INDEX_REFRESH_SEC = float(os.environ.get('SIMILAR_INDEX_REFRESH_SEC', '5'))
+    # HLS adaptive streaming is packaged (next to the progressive MP4) for videos at
+    # least this long or this large
+    HLS_ENABLED = os.environ.get('HLS_ENABLED', 'true').lower() == 'true'
+    HLS_MIN_DURATION_SEC = float(os.environ.get('HLS_MIN_DURATION_SEC', '60'))
+    HLS_MIN_SIZE_BYTES = int(os.environ.get('HLS_MIN_SIZE_BYTES', str(200 * 1024 * 1024)))
+    HLS_SEGMENT_SEC = int(os.environ.get('HLS_SEGMENT_SEC', '6'))
     
     # Auth
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
@@ -21,11 +46,37 @@ class Config:
     
 
     # Job & Storage Configuration
-    # 'gcs' or 'local'
+    # 'gcs', 'local' (UPLOAD_FOLDER) or 'memory' (in-process, for tests and benchmarks)
     STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'gcs')
-    # 'cloud_tasks' or 'sync'
-    # 'cloud_tasks' or 'sync'
+    # 'cloud_tasks', 'sync' (inline in the request) or 'local' (process pool + DB queue)
     TASK_RUNNER = os.environ.get('TASK_RUNNER', 'cloud_tasks')
+    # TASK_RUNNER='local': processes per web worker process
+    LOCAL_TASK_WORKERS = int(os.environ.get('LOCAL_TASK_WORKERS', str(os.cpu_count() or 2)))
+    # Seconds between queue polls (new uploads wake the dispatcher immediately)
+    LOCAL_TASK_POLL_SEC = float(os.environ.get('LOCAL_TASK_POLL_SEC', '2'))
+    # A task still 'running' after this long is assumed lost and requeued
+    LOCAL_TASK_STALE_SEC = int(os.environ.get('LOCAL_TASK_STALE_SEC', '3600'))
+    LOCAL_TASK_MAX_ATTEMPTS = int(os.environ.get('LOCAL_TASK_MAX_ATTEMPTS', '3'))
+    # Recycle pool processes to bound memory growth from image/video libraries
+    LOCAL_TASK_MAX_TASKS_PER_CHILD = int(os.environ.get('LOCAL_TASK_MAX_TASKS_PER_CHILD', '100'))
+    # Any runner: a worker claims a media item for this long (redeliveries meanwhile are
+    # refused); video processing extends the claim before every ffmpeg job to cover its
+    # slot wait and timeout. Transient failures are retried until this many claims
+    MEDIA_PROCESSING_LEASE_SEC = int(os.environ.get('MEDIA_PROCESSING_LEASE_SEC', '3600'))
+    MEDIA_PROCESSING_MAX_ATTEMPTS = int(os.environ.get('MEDIA_PROCESSING_MAX_ATTEMPTS', '3'))
+
+    # ffmpeg/ffprobe jobs (app.services.ffmpeg_executor): at most this many at once on
+    # the machine (shared by every web/pool process through lock files in FFMPEG_LOCK_DIR),
+    # each with cpu_count // FFMPEG_MAX_CONCURRENCY threads and a lowered priority
+    FFMPEG_MAX_CONCURRENCY = int(os.environ.get('FFMPEG_MAX_CONCURRENCY', str(max(1, (os.cpu_count() or 2) // 2))))
+    FFMPEG_LOCK_DIR = os.environ.get('FFMPEG_LOCK_DIR', '/tmp/thesalo-ffmpeg')
+    FFMPEG_NICE = int(os.environ.get('FFMPEG_NICE', '10'))
+    # Wall-clock limit per job: base plus this many seconds per second of video.
+    # CPU time is capped at the wall-clock limit times the job's threads.
+    FFMPEG_TIMEOUT_SEC = int(os.environ.get('FFMPEG_TIMEOUT_SEC', '600'))
+    FFMPEG_TIMEOUT_PER_VIDEO_SEC = float(os.environ.get('FFMPEG_TIMEOUT_PER_VIDEO_SEC', '4'))
+    # Longest a job waits for a free slot before failing (the task is retried later)
+    FFMPEG_QUEUE_TIMEOUT_SEC = int(os.environ.get('FFMPEG_QUEUE_TIMEOUT_SEC', '3600'))
 
     # Dev Login Bypass
     BYPASS_AUTH = os.environ.get('BYPASS_AUTH', 'false').lower() == 'true'
@@ -35,12 +86,39 @@ class Config:
     # UPLOAD_FOLDER explicitly defined above, removing duplicate here if identical or fixing precedence
     # UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(__file__))), 'uploads')
 
+    # Local file serving (STORAGE_BACKEND='local')
+    MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', str(365 * 24 * 3600)))
+    # nginx `internal` location aliased to UPLOAD_FOLDER (e.g. '/_uploads/'); enables X-Accel-Redirect
+    LOCAL_FILE_ACCEL_PREFIX = os.environ.get('LOCAL_FILE_ACCEL_PREFIX')
+    # Apache/lighttpd X-Sendfile (read by Flask's send_file)
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
+
     # GCP
     GOOGLE_CLOUD_PROJECT = os.environ.get('GOOGLE_CLOUD_PROJECT', 'thesalo-gallery')
     GCS_BUCKET_NAME = os.environ.get('GCS_BUCKET_NAME', 'thesalo-uploads-thesalo-gallery')
     CLOUD_TASKS_QUEUE_PATH = os.environ.get('CLOUD_TASKS_QUEUE_PATH', 'projects/thesalo-gallery/locations/asia-northeast1/queues/image-processing-queue')
     CLOUD_RUN_SERVICE_URL = os.environ.get('CLOUD_RUN_SERVICE_URL') # For worker callback
 
+    # GCS client (shared per process)
+    GCS_HTTP_POOL_SIZE = int(os.environ.get('GCS_HTTP_POOL_SIZE', '32'))
+    # Refresh credentials this long before they expire
+    GCS_CREDENTIALS_REFRESH_AHEAD_SEC = int(os.environ.get('GCS_CREDENTIALS_REFRESH_AHEAD_SEC', '300'))
+    # Read buffer when media processing streams an original from GCS
+    PROCESSING_READ_CHUNK_SIZE = int(os.environ.get('PROCESSING_READ_CHUNK_SIZE', str(8 * 1024 * 1024)))
+
+    # Signed URLs for /media/file and /media/thumb
+    SIGNED_URL_EXPIRATION_SEC = int(os.environ.get('SIGNED_URL_EXPIRATION_SEC', '3600'))
+    # Expirations are rounded down to this boundary so URLs signed close together are identical
+    SIGNED_URL_BUCKET_SEC = int(os.environ.get('SIGNED_URL_BUCKET_SEC', '900'))
+    # A cached URL is not handed out once less than this is left
+    SIGNED_URL_MIN_REMAINING_SEC = int(os.environ.get('SIGNED_URL_MIN_REMAINING_SEC', '600'))
+    SIGNED_URL_CACHE_SIZE = int(os.environ.get('SIGNED_URL_CACHE_SIZE', '10000'))
+    # Concurrent signBlob calls when a page needs many URLs signed at once
+    SIGNED_URL_BATCH_WORKERS = int(os.environ.get('SIGNED_URL_BATCH_WORKERS', '8'))
+    # Optional GCS HMAC key: URLs are then signed locally instead of through IAM signBlob
+    GCS_HMAC_ACCESS_ID = os.environ.get('GCS_HMAC_ACCESS_ID')
+    GCS_HMAC_SECRET = os.environ.get('GCS_HMAC_SECRET')
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
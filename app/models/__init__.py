@@ -1,2 +1,3 @@
 from .auth import User
-from .media import Media, Tag, PetProfile, Album, media_tags, album_media
\ No newline at end of file
+from .media import Media, Tag, PetProfile, Album, media_tags, album_media
+from .task import ProcessingTask
@@ -1,6 +1,7 @@
-from sqlalchemy import String, ForeignKey, Integer, Text, Table, Column
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, ForeignKey, Integer, Float, Text, Table, Column, Index, DateTime
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from typing import List, Optional
+from datetime import datetime
 from .base import BaseModel
 from .auth import User
 import uuid6
@@ -60,18 +61,39 @@ class Media(BaseModel):
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
     original_filename: Mapped[str] = mapped_column(String(255), nullable=False)
     mime_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    # 'image' / 'video' / 'other', derived from mime_type so type filters can use an index
+    media_kind: Mapped[Optional[str]] = mapped_column(String(10))
     file_size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
     
     width: Mapped[Optional[int]] = mapped_column(Integer)
     height: Mapped[Optional[int]] = mapped_column(Integer)
-    duration_sec: Mapped[Optional[float]] = mapped_column(Integer) # Float? Integer in design?
+    duration_sec: Mapped[Optional[float]] = mapped_column(Float)
+    # Codec of the uploaded video as reported by ffprobe (the served file is always H.264)
+    video_codec: Mapped[Optional[str]] = mapped_column(String(32))
     
     description: Mapped[Optional[str]] = mapped_column(Text)
-    taken_at: Mapped[Optional[str]] = mapped_column(String(50)) # ISO string
+    # Capture time (EXIF DateTimeOriginal or edited), stored in UTC
+    taken_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    # Pre-migration free-form string; cleared by scripts/backfill_taken_at.py once converted
+    taken_at_legacy: Mapped[Optional[str]] = mapped_column(String(50))
     
     status: Mapped[str] = mapped_column(String(50), default='processing', index=True) # processing, ready, error
+    # Processing claim (see tasks._claim_media): a worker owns the item until the lease
+    # expires (naive UTC); attempts counts claims, processing_error the last failure
+    processing_lease_until: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    processing_attempts: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    processing_error: Mapped[Optional[str]] = mapped_column(Text)
     
     thumbnail_path: Mapped[Optional[str]] = mapped_column(String(1024))
+    # Downscaled/re-encoded copies: [{"format": "webp", "width": 640, "height": 480, "path": "..."}]
+    # (videos: smaller 'mp4' renditions)
+    renditions: Mapped[Optional[list]] = mapped_column(db.JSON)
+    # Hex SHA-256 of the uploaded bytes; the same file is stored only once
+    content_sha256: Mapped[Optional[str]] = mapped_column(String(64))
+    # Perceptual hash (app.utils.hashing.phash) of the processed image, for near-duplicates
+    phash: Mapped[Optional[str]] = mapped_column(String(16))
+    # Difference hash (app.utils.hashing.dhash), ranks near-duplicates together with phash
+    dhash: Mapped[Optional[str]] = mapped_column(String(16))
     
 
     
@@ -83,6 +105,59 @@ class Media(BaseModel):
     
     # Albums association can also be here or in Album
 
+    @validates('mime_type')
+    def _sync_media_kind(self, key, mime_type):
+        self.media_kind = media_kind_for(mime_type)
+        return mime_type
+
+    def renditions_for(self, fmt: str) -> list:
+        """Renditions of one format, smallest first (for srcset)."""
+        return sorted(
+            (r for r in (self.renditions or []) if r.get('format') == fmt),
+            key=lambda r: r['width']
+        )
+
+def media_kind_for(mime_type: str) -> str:
+    if mime_type and mime_type.startswith('image'):
+        return 'image'
+    if mime_type and mime_type.startswith('video'):
+        return 'video'
+    return 'other'
+
+# Gallery indexes: one per filter prefix (none / kind / uploader) x sort key, each
+# ending in id so keyset pagination (MediaService.get_media_feed) is a pure range scan.
+# created_at and taken_at ASC NULLS LAST are read backwards for the DESC sorts; taken_at
+# DESC NULLS LAST needs its own index since a backward scan would put NULLs first.
+# SQLite can't index NULLS LAST, so those are PostgreSQL only.
+Index('ix_media_created_at', Media.created_at, Media.id)
+Index('ix_media_taken_at', Media.taken_at, Media.created_at, Media.id)
+Index(
+    'ix_media_taken_at_desc',
+    Media.taken_at.desc().nullslast(), Media.created_at.desc(), Media.id.desc()
+).ddl_if(dialect='postgresql')
+
+Index('ix_media_kind_created_at', Media.media_kind, Media.created_at, Media.id)
+Index('ix_media_kind_taken_at', Media.media_kind, Media.taken_at, Media.created_at, Media.id)
+Index(
+    'ix_media_kind_taken_at_desc',
+    Media.media_kind, Media.taken_at.desc().nullslast(), Media.created_at.desc(), Media.id.desc()
+).ddl_if(dialect='postgresql')
+
+Index('ix_media_uploader_created_at', Media.uploader_id, Media.created_at, Media.id)
+Index('ix_media_uploader_taken_at', Media.uploader_id, Media.taken_at, Media.created_at, Media.id)
+Index(
+    'ix_media_uploader_taken_at_desc',
+    Media.uploader_id, Media.taken_at.desc().nullslast(), Media.created_at.desc(), Media.id.desc()
+).ddl_if(dialect='postgresql')
+
+# Upload deduplication (NULL for rows uploaded before hashing, which never conflict)
+Index('ix_media_content_sha256', Media.content_sha256, unique=True)
+# The near-duplicate index (SimilarMediaIndex) syncs rows changed since its last refresh
+Index('ix_media_updated_at', Media.updated_at)
+
+# Favorites filter (all media of one user); the (media_id, user_id) PK serves the EXISTS check
+Index('ix_media_favorites_user_id_media_id', media_favorites.c.user_id, media_favorites.c.media_id)
+
 class Album(BaseModel):
     __tablename__ = 'albums'
     
@@ -0,0 +1,23 @@
+from sqlalchemy import String, ForeignKey, Integer, Text, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import datetime
+from .base import BaseModel
+import uuid6
+from app.extensions import db
+
+class ProcessingTask(BaseModel):
+    """
+    Persistent queue entry for TASK_RUNNER='local' (see LocalTaskRunner).
+    Rows survive restarts; finished tasks are deleted, failed ones are kept for inspection.
+    """
+    __tablename__ = 'processing_tasks'
+
+    media_id: Mapped[uuid6.UUID] = mapped_column(db.Uuid, ForeignKey('media.id', ondelete='CASCADE'), nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String(20), default='queued', nullable=False) # queued, running, error
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+
+# Claiming scans the oldest queued rows
+Index('ix_processing_tasks_status_created_at', ProcessingTask.status, ProcessingTask.created_at)
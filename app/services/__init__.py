@@ -1,3 +1,4 @@
 from .auth_service import AuthService
 from .media_service import MediaService
 from .pet_service import PetService
+from .upload_session_service import UploadSessionService
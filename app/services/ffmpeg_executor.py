@@ -0,0 +1,178 @@
+import fcntl
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from flask import current_app
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not on Windows
+    resource = None
+
+# Latency samples kept for the percentiles in metrics()
+METRICS_WINDOW = 200
+# Poll interval while every machine-wide slot is taken
+SLOT_POLL_SEC = 0.2
+
+
+class FFmpegTimeout(RuntimeError):
+    """A job exceeded its wall-clock or CPU limit, or never got a slot."""
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class FFmpegExecutor:
+    """
+    Runs ffmpeg/ffprobe with a machine-wide concurrency limit, timeouts and metrics.
+
+    At most FFMPEG_MAX_CONCURRENCY jobs run at once. The slots are flock()ed files in
+    FFMPEG_LOCK_DIR, so the limit holds across gunicorn workers and LocalTaskRunner
+    pool processes, and a crashed process releases its slot. Each job gets
+    cpu_count // FFMPEG_MAX_CONCURRENCY threads (`-threads`) and runs at FFMPEG_NICE,
+    so video work never takes every core away from page requests.
+
+    A job is killed after its wall-clock timeout; the kernel stops it once it has used
+    timeout x threads seconds of CPU (RLIMIT_CPU). Queue depth and wait/run latencies
+    of this process are available from metrics().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._counts = {'completed': 0, 'failed': 0, 'timed_out': 0}
+        self._wait_ms = deque(maxlen=METRICS_WINDOW)
+        self._run_ms = deque(maxlen=METRICS_WINDOW)
+
+    def threads(self):
+        """Threads per job: an equal share of the cores between concurrent jobs."""
+        concurrency = max(1, current_app.config['FFMPEG_MAX_CONCURRENCY'])
+        return max(1, (os.cpu_count() or 1) // concurrency)
+
+    def timeout_for(self, duration_sec=None):
+        config = current_app.config
+        return config['FFMPEG_TIMEOUT_SEC'] + (duration_sec or 0) * config['FFMPEG_TIMEOUT_PER_VIDEO_SEC']
+
+    def run(self, cmd, timeout=None, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE):
+        """
+        subprocess.run(cmd, check=True) under the limits above. For ffmpeg, `-threads`
+        is applied to every input (decoders) and as the default for encoders.
+        Raises CalledProcessError on failure and FFmpegTimeout on a timeout.
+        """
+        config = current_app.config
+        timeout = timeout or self.timeout_for()
+        threads = self.threads()
+        if cmd[0] == 'ffmpeg':
+            cmd = self._with_threads(cmd, threads)
+
+        with self._lock:
+            self._waiting += 1
+        queued_at = time.monotonic()
+        try:
+            slot = self._acquire_slot(config['FFMPEG_MAX_CONCURRENCY'], config['FFMPEG_LOCK_DIR'],
+                                      config['FFMPEG_QUEUE_TIMEOUT_SEC'])
+        except FFmpegTimeout:
+            with self._lock:
+                self._waiting -= 1
+                self._counts['timed_out'] += 1
+            raise
+        started_at = time.monotonic()
+        with self._lock:
+            self._waiting -= 1
+            self._running += 1
+            self._wait_ms.append((started_at - queued_at) * 1000)
+
+        outcome = 'failed'
+        try:
+            result = self._run_limited(cmd, timeout, threads, config['FFMPEG_NICE'], stdout, stderr)
+            outcome = 'completed'
+            return result
+        except FFmpegTimeout:
+            outcome = 'timed_out'
+            raise
+        finally:
+            os.close(slot)
+            run_ms = (time.monotonic() - started_at) * 1000
+            with self._lock:
+                self._running -= 1
+                self._counts[outcome] += 1
+                self._run_ms.append(run_ms)
+                waiting = self._waiting
+            print(f"[ffmpeg] {cmd[0]} {outcome}: waited {(started_at - queued_at) * 1000:.0f} ms, "
+                  f"ran {run_ms:.0f} ms, {waiting} queued")
+
+    def metrics(self):
+        with self._lock:
+            wait_ms, run_ms = list(self._wait_ms), list(self._run_ms)
+            return {
+                'queued': self._waiting,
+                'running': self._running,
+                **self._counts,
+                'wait_ms_p50': _percentile(wait_ms, 0.5),
+                'wait_ms_p95': _percentile(wait_ms, 0.95),
+                'run_ms_p50': _percentile(run_ms, 0.5),
+                'run_ms_p95': _percentile(run_ms, 0.95),
+            }
+
+    def _with_threads(self, cmd, threads):
+        out = [cmd[0]]
+        for arg in cmd[1:]:
+            if arg == '-i':
+                out += ['-threads', str(threads)]
+            out.append(arg)
+        # Trailing option before the last output: the encoder default for that output
+        # (earlier outputs of multi-output commands get it through -filter_threads)
+        return out[:1] + ['-filter_threads', str(threads)] + out[1:-1] + ['-threads', str(threads), out[-1]]
+
+    def _acquire_slot(self, concurrency, lock_dir, queue_timeout):
+        """Block until one of the machine-wide slot files is locked; returns its fd."""
+        os.makedirs(lock_dir, exist_ok=True)
+        deadline = time.monotonic() + queue_timeout
+        while True:
+            for index in range(max(1, concurrency)):
+                fd = os.open(os.path.join(lock_dir, f'slot-{index}.lock'), os.O_RDWR | os.O_CREAT, 0o666)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    os.close(fd)
+            if time.monotonic() >= deadline:
+                raise FFmpegTimeout(f"No ffmpeg slot free after {queue_timeout}s")
+            time.sleep(SLOT_POLL_SEC)
+
+    def _run_limited(self, cmd, timeout, threads, nice, stdout, stderr):
+        # Own process group so a timeout also kills anything ffmpeg spawned
+        process = subprocess.Popen(cmd, stdout=stdout, stderr=stderr, start_new_session=True)
+        try:
+            if nice:
+                os.setpriority(os.PRIO_PROCESS, process.pid, nice)
+            if resource is not None and hasattr(resource, 'prlimit'):
+                cpu_limit = int(timeout * threads)
+                resource.prlimit(process.pid, resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 5))
+        except (OSError, ValueError) as e:
+            # The process may already have exited
+            print(f"[ffmpeg] could not apply limits to {process.pid}: {e}")
+
+        try:
+            out, err = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.communicate()
+            raise FFmpegTimeout(f"{cmd[0]} exceeded {timeout:.0f}s")
+
+        if process.returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+            raise FFmpegTimeout(f"{cmd[0]} exceeded its CPU time limit")
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, out, err)
+        return subprocess.CompletedProcess(cmd, 0, out, err)
+
+
+ffmpeg_executor = FFmpegExecutor()
@@ -1,18 +1,32 @@
 import os
+import posixpath
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
+import time
+import threading
 from flask import current_app
 from werkzeug.utils import secure_filename
 from app.extensions import db
-from app.models.media import Media
+from app.models.media import Media, media_favorites, media_tags, media_pets, album_media
+from app.models.task import ProcessingTask
 from app.models.auth import User
 import uuid6
 import magic
-from google.cloud import storage
 from google.cloud import tasks_v2
 import json
-import google.auth
-from google.auth import impersonated_credentials
+import base64
+from sqlalchemy import and_, or_, tuple_, literal, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from .storage_client import service_account_email
+from .storage_backend import get_storage
+from .url_cache import signed_url_cache
+from .similarity_index import similar_media_index
+from .url_signer import verify_local_upload
+from app.utils.dates import parse_taken_at
+from app.utils.hashing import sha256_stream
+from .task_runner import local_task_runner
+from concurrent.futures import ThreadPoolExecutor
 
 class MediaService:
     def allowed_file(self, filename: str) -> bool:
@@ -20,6 +34,20 @@ class MediaService:
         allowed_extensions = {".png", ".jpg", ".jpeg", ".gif", ".heic", ".mp4", ".mov", ".avi", ".mkv"}
         return ext in allowed_extensions
 
+    def is_upload_object_name(self, object_name: str) -> bool:
+        """
+        Whether a client-supplied object name can be an upload: galleries/{yyyy}/{mm}/{file},
+        as issued by /upload/sign, never a path outside it or a derived object
+        (renditions/, thumbs/, hls/ sit one level deeper).
+        """
+        parts = object_name.split('/')
+        return (
+            len(parts) == 4
+            and parts[0] == 'galleries'
+            and all(part not in ('', '.', '..') for part in parts)
+            and '\\' not in object_name
+        )
+
     def get_file_type(self, filename: str) -> str:
         ext = Path(filename).suffix.lower()
         if ext in {".png", ".jpg", ".jpeg", ".gif", ".heic"}:
@@ -28,161 +56,326 @@ class MediaService:
             return "video"
         return "other"
         
-    def _get_storage_client(self):
-        # On Cloud Run, default credentials don't support signing.
-        # We wrap them in ImpersonatedCredentials to use IAM API for signing.
-        if current_app.config.get('STORAGE_BACKEND') == 'gcs':
-             credentials, project = google.auth.default()
-             sa_email = self._get_service_account_email()
-             
-             # Only wrap if we have a specific SA email to impersonate and we are likely in a non-key env
-             # (Self-impersonation)
-             if sa_email:
-                 try:
-                     credentials = impersonated_credentials.Credentials(
-                         source_credentials=credentials,
-                         target_principal=sa_email,
-                         target_scopes=["https://www.googleapis.com/auth/cloud-platform"],
-                         lifetime=3600
-                     )
-                 except Exception as e:
-                     print(f"Warning: Failed to create impersonated credentials: {e}")
-                     # Fallback to default if impersonation fails (e.g. local dev with key)
-
-             return storage.Client(credentials=credentials)
-             
-        return storage.Client()
-
     def _get_tasks_client(self):
         return tasks_v2.CloudTasksClient()
 
     def upload_media(self, file, uploader: User, description: str = None):
-        if not file or not self.allowed_file(file.filename):
-            raise ValueError("Invalid file or extension")
-        
-        filename = secure_filename(file.filename)
-        
-        # Determine global save path: galleries/{yyyy}/{mm}/{filename}
+        media_list, failures = self.upload_media_batch([(file, description)], uploader)
+        if failures:
+            raise failures[0][1]
+        return media_list[0]
+
+    def upload_media_batch(self, uploads, uploader: User):
+        """
+        Store several uploaded files concurrently and register them together.
+
+        `uploads` is a list of (FileStorage, description). Every file is validated
+        before anything is stored (ValueError for the whole batch). Files are hashed,
+        and those whose content is already in the library (or earlier in the batch)
+        are not stored again: the existing Media is returned instead, flagged with
+        `is_duplicate`. The rest are written to storage through a bounded thread pool
+        (UPLOAD_WORKERS), the Media rows are inserted in a single transaction and
+        processing is dispatched in bulk.
+        Returns (media_list, failures) where failures is [(original_filename, exception)]
+        for files whose storage write failed.
+        """
+        for file, _ in uploads:
+            if not file or not self.allowed_file(file.filename):
+                raise ValueError("Invalid file or extension")
+
+        # Sniff type and size up front (cheap; reads 2KB per file)
+        prepared = []
+        for file, description in uploads:
+            file.seek(0)
+            header = file.read(2048)
+            mime = magic.from_buffer(header, mime=True)
+            file.seek(0, os.SEEK_END)
+            file_size = file.tell()
+            file.seek(0)
+            prepared.append((file, description, mime, file_size))
+
+        # Names taken by earlier files of this batch (phones often send many "image.jpg")
+        reserved = set()
+        reserved_lock = threading.Lock()
+        app = current_app._get_current_object()
+        storage = get_storage()
+
+        def content_hash(file):
+            file.seek(0)
+            digest = sha256_stream(file)
+            file.seek(0)
+            return digest
+
+        def store(file, mime):
+            with app.app_context():
+                if current_app.config['UPLOAD_OBJECT_NAMING'] == 'sequential':
+                    object_name = self._unique_object_name(secure_filename(file.filename), reserved, reserved_lock)
+                else:
+                    object_name = self._new_object_name(file.filename)
+                storage.put(object_name, file, mime)
+                return object_name
+
+        workers = max(1, min(current_app.config['UPLOAD_WORKERS'], len(prepared)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # hashlib releases the GIL on large chunks, so files are hashed in parallel
+            hashes = list(executor.map(content_hash, [file for file, _, _, _ in prepared]))
+            existing = self._media_by_content_hash(hashes)
+
+            to_store = {}
+            for index, digest in enumerate(hashes):
+                if digest not in existing and digest not in to_store:
+                    to_store[digest] = index
+            futures = {
+                index: executor.submit(store, prepared[index][0], prepared[index][2])
+                for index in to_store.values()
+            }
+
+        media_list = []
+        failures = []
+        new_media = {}
+        for digest, index in to_store.items():
+            file, description, mime, file_size = prepared[index]
+            try:
+                object_name = futures[index].result()
+            except Exception as e:
+                print(f"Upload error for {file.filename}: {e}")
+                failures.append((file.filename, e))
+                continue
+            new_media[digest] = Media(
+                uploader_id=uploader.id,
+                filename=object_name,
+                original_filename=file.filename,
+                mime_type=mime,
+                file_size_bytes=file_size,
+                status='processing',
+                description=description,
+                content_sha256=digest
+            )
+
+        if new_media:
+            existing.update(self._insert_deduplicated(list(new_media.values())))
+
+        # One entry per distinct file, in upload order
+        for digest in dict.fromkeys(hashes):
+            if digest in existing:
+                media_list.append(existing[digest])
+            elif digest in new_media:
+                media_list.append(new_media[digest])
+
+        # Trigger Tasks (rows that lost a concurrent-upload race were never inserted)
+        inserted = [m for m in new_media.values() if m.content_sha256 not in existing]
+        if inserted:
+            self._dispatch_processing_batch(inserted)
+
+        return media_list, failures
+
+    def _media_by_content_hash(self, hashes):
+        """
+        {content_sha256: Media} for hashes already in the library, flagged as duplicates.
+        Items whose processing failed don't count: their hash is released, so the same
+        file can be uploaded (and processed) again as a new Media.
+        """
+        hashes = {h for h in hashes if h}
+        if not hashes:
+            return {}
+        released = db.session.execute(
+            db.update(Media)
+            .where(Media.content_sha256.in_(hashes), Media.status == 'error')
+            .values(content_sha256=None)
+        )
+        if released.rowcount:
+            db.session.commit()
+        found = db.session.execute(
+            db.select(Media).where(Media.content_sha256.in_(hashes))
+        ).scalars().all()
+        for media in found:
+            # Transient flag read by the upload routes
+            media.is_duplicate = True
+        return {media.content_sha256: media for media in found}
+
+    def _insert_deduplicated(self, media_list):
+        """
+        Insert new Media rows in one transaction. If a concurrent upload registered
+        the same content first (unique index on content_sha256), the rows that lost
+        are dropped, their stored objects deleted, and the winners returned as
+        {content_sha256: Media} duplicates; the remaining rows are inserted.
+        """
+        db.session.add_all(media_list)
+        try:
+            db.session.commit()
+            return {}
+        except IntegrityError:
+            db.session.rollback()
+
+        existing = self._media_by_content_hash(m.content_sha256 for m in media_list)
+        remaining = []
+        for media in media_list:
+            if media.content_sha256 in existing:
+                if existing[media.content_sha256].filename == media.filename:
+                    # The winner is this very object (the same upload finalized twice)
+                    continue
+                try:
+                    get_storage().delete(media.filename)
+                except Exception as e:
+                    print(f"Failed to delete duplicate upload {media.filename}: {e}")
+            else:
+                remaining.append(media)
+        if remaining:
+            db.session.add_all(remaining)
+            db.session.commit()
+        return existing
+
+    def _new_object_name(self, filename):
+        """
+        galleries/{yyyy}/{mm}/{stem}_{uuid7}{ext}. Unique without asking storage, so
+        concurrent uploads never collide and names are never reused for another upload.
+        UUIDv7 keeps names of one month roughly in upload order.
+        """
+        now = datetime.now()
+        clean_name = secure_filename(filename)
+        base_name = Path(clean_name).stem
+        ext = Path(clean_name).suffix
+        return f"galleries/{now.strftime('%Y')}/{now.strftime('%m')}/{base_name}_{uuid6.uuid7().hex}{ext}"
+
+    def _unique_object_name(self, filename, reserved=None, reserved_lock=None):
+        """
+        Legacy naming (UPLOAD_OBJECT_NAMING='sequential'): galleries/{yyyy}/{mm}/{filename},
+        suffixing _1, _2... while the name is taken. Costs one existence probe per attempt.
+        """
         now = datetime.now()
         yyyy = now.strftime('%Y')
         mm = now.strftime('%m')
-        
-        # Unique check loop
+
         base_name = Path(filename).stem
         ext = Path(filename).suffix
         counter = 0
-        
+        storage = get_storage()
+
         while True:
             if counter == 0:
                 final_filename = filename
             else:
                 final_filename = f"{base_name}_{counter}{ext}"
-            
+            counter += 1
+
             # Object name (Relative path) used for DB
             object_name = f"galleries/{yyyy}/{mm}/{final_filename}"
-            
+
+            if reserved is not None:
+                with reserved_lock:
+                    if object_name in reserved:
+                        continue
+                    reserved.add(object_name)
+
             # Check existence
-            if current_app.config['STORAGE_BACKEND'] == 'gcs':
-                if not self._gcs_exists(object_name):
-                    break
+            if not storage.exists(object_name):
+                return object_name
+
+    def get_cached_signed_url(self, object_name, method="GET"):
+        """
+        Signed URL for reading an object, reused across requests.
+        Returns (url, expires_at) with expires_at as a unix timestamp.
+
+        Expirations are aligned to SIGNED_URL_BUCKET_SEC boundaries and a URL is reused
+        until only SIGNED_URL_MIN_REMAINING_SEC of its lifetime is left, so repeated
+        views get the identical URL (cacheable by the browser) and signing (an IAM
+        signBlob round-trip) happens at most once per object per bucket.
+        """
+        return self.get_signed_urls([object_name], method=method)[object_name]
+
+    def get_signed_urls(self, object_names, method="GET"):
+        """
+        Batch version of get_cached_signed_url: {object_name: (url, expires_at)}.
+
+        Cache misses are signed in one pass by the storage backend (see GCSStorage.sign_urls).
+        """
+        config = current_app.config
+        min_remaining = config['SIGNED_URL_MIN_REMAINING_SEC']
+        expiration = config['SIGNED_URL_EXPIRATION_SEC']
+        bucket_sec = config['SIGNED_URL_BUCKET_SEC']
+
+        results = {}
+        missing = []
+        for object_name in dict.fromkeys(n for n in object_names if n):
+            cached = signed_url_cache.get((object_name, method), min_remaining=min_remaining)
+            if cached:
+                results[object_name] = cached
             else:
-                 # Local
-                full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], yyyy, mm, final_filename)
-                if not os.path.exists(full_path):
-                    break
-            counter += 1
+                missing.append(object_name)
 
-        # Upload/Save
-        file.seek(0)
-        header = file.read(2048)
-        mime = magic.from_buffer(header, mime=True)
-        file.seek(0) # Reset
-        
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
+        if not missing:
+            return results
 
-        if current_app.config['STORAGE_BACKEND'] == 'gcs':
-            self._save_to_gcs(file, object_name, mime)
-        else:
-            self._save_to_local(file, object_name)
-        
-        media = Media(
-            uploader_id=uploader.id,
-            filename=object_name, 
-            original_filename=file.filename,
-            mime_type=mime,
-            file_size_bytes=file_size,
-            status='processing',
-            description=description
-        )
-        db.session.add(media)
-        db.session.commit()
-        
-        # Trigger Task
-        if current_app.config['TASK_RUNNER'] == 'sync':
-            # Run directly
-            from app.blueprints.tasks import _process_media_logic
-            print(f"[Sync] Processing media {media.id} locally...")
-            _process_media_logic(str(media.id))
-        else:
-            self._create_cloud_task(media.id)
-        
-        return media
+        expires_at = int(time.time() + expiration) // bucket_sec * bucket_sec
+        signed = get_storage().sign_urls(missing, expires_at, method=method)
 
-    def _gcs_exists(self, object_name):
-        storage_client = self._get_storage_client()
-        bucket_name = current_app.config['GCS_BUCKET_NAME']
-        bucket = storage_client.bucket(bucket_name)
-        return bucket.blob(object_name).exists()
-        
-    def _save_to_gcs(self, file, object_name, mime_type):
-        storage_client = self._get_storage_client()
-        bucket_name = current_app.config['GCS_BUCKET_NAME']
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(object_name)
-        blob.upload_from_file(file, content_type=mime_type)
-
-    def generate_signed_url(self, object_name, expiration=3600, method="GET", content_type=None):
-        """Generate a signed URL for a GCS blob."""
-        storage_client = self._get_storage_client()
-        bucket_name = current_app.config['GCS_BUCKET_NAME']
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(object_name)
-        
-        return blob.generate_signed_url(
-            version="v4",
-            expiration=timedelta(seconds=expiration),
-            method=method,
-            content_type=content_type
-        )
+        for name, url in signed.items():
+            signed_url_cache.put((name, method), url, expires_at)
+            results[name] = (url, expires_at)
+
+        return results
+
+    def get_render_urls(self, object_names):
+        """
+        Direct URLs to embed in rendered pages ({object_name: url}), skipping the
+        /media/file redirect hop. Empty for local storage, where templates keep
+        linking to the serving routes.
+        """
+        if not get_storage().serves_signed_urls:
+            return {}
+        try:
+            return {name: url for name, (url, _) in self.get_signed_urls(object_names).items()}
+        except Exception as e:
+            # Templates fall back to the redirecting routes
+            print(f"Error batch signing URLs: {e}")
+            return {}
+
+    def media_object_names(self, media_list):
+        """Every object a grid page references (files, thumbnails, renditions, uploader avatars)."""
+        names = []
+        for m in media_list:
+            names.append(m.filename)
+            names.append(m.thumbnail_path)
+            # HLS playlists are always served through the app (see render_hls_playlist)
+            names.extend(r['path'] for r in m.renditions or [] if r.get('format') != 'hls')
+            avatar = m.uploader.avatar_url if m.uploader else None
+            if avatar and not avatar.startswith('http'):
+                names.append(avatar)
+        return [n for n in names if n]
+
+    def render_hls_playlist(self, object_name):
+        """
+        An HLS playlist with its segment URIs replaced by signed storage URLs, all
+        signed in one batch. Nested playlists stay relative, so players fetch them
+        through /media/file (and this method) as well.
+        Returns (text, max_age): how long the rewritten playlist may be cached.
+        """
+        with get_storage().open(object_name) as f:
+            lines = f.read().decode('utf-8').splitlines()
 
-    def generate_upload_signed_url(self, filename: str, mime_type: str):
+        base = posixpath.dirname(object_name)
+        segments = {
+            line: posixpath.normpath(posixpath.join(base, line))
+            for line in lines
+            if line and not line.startswith('#') and not line.endswith('.m3u8')
+        }
+        signed = self.get_signed_urls(segments.values())
+
+        expires_at = min((exp for _, exp in signed.values()), default=time.time() + current_app.config['SIGNED_URL_EXPIRATION_SEC'])
+        text = '\n'.join(signed[segments[line]][0] if line in segments and segments[line] in signed else line for line in lines) + '\n'
+        max_age = int(expires_at - time.time()) - current_app.config['SIGNED_URL_MIN_REMAINING_SEC']
+        return text, max_age
+
+    def generate_upload_signed_url(self, filename: str, mime_type: str, expiration=3600):
         """Generate a PUT signed URL for direct upload."""
         if not self.allowed_file(filename):
              raise ValueError("Invalid file extension")
 
-        # Determine path (same logic as upload_media)
-        now = datetime.now()
-        yyyy = now.strftime('%Y')
-        mm = now.strftime('%m')
-        
-        clean_name = secure_filename(filename)
-        base_name = Path(clean_name).stem
-        ext = Path(clean_name).suffix
+        object_name = self._new_object_name(filename)
+        final_filename = Path(object_name).name
         
-        # We can't easily check for existence in GCS efficiently in a loop for signed URL generation 
-        # without network calls. For direct upload, we'll use a UUID to ensure uniqueness 
-        # to avoid collisions and overwrites.
-        unique_id = uuid6.uuid7().hex[:8]
-        final_filename = f"{base_name}_{unique_id}{ext}"
-        object_name = f"galleries/{yyyy}/{mm}/{final_filename}"
-        
-        url = self.generate_signed_url(
-            object_name, 
-            method="PUT", 
-            content_type=mime_type
-        )
+        expires_at = int(time.time()) + expiration
+        url = get_storage().sign_urls([object_name], expires_at, method="PUT", content_type=mime_type)[object_name]
         
         return {
             'url': url,
@@ -190,13 +383,51 @@ class MediaService:
             'filename': final_filename
         }
 
-    def finalize_upload(self, object_name: str, original_filename: str, mime_type: str, file_size: int, uploader: User, description: str = None):
-        """Create Media record after successful direct upload."""
+    def store_local_upload(self, object_name, content_type, expires_at, signature, stream):
+        """
+        Store the body of a signed PUT to the app (storage other than GCS).
+
+        The body is streamed from the WSGI input (no form parsing, no spooled temp
+        copy) into the storage backend, which never shows a half-finished upload
+        under its final name. Returns the number of bytes stored; raises
+        PermissionError for a bad/expired signature and FileExistsError when the
+        object already exists.
+        """
+        if not verify_local_upload(current_app.config['SECRET_KEY'], object_name, content_type,
+                                   expires_at, signature, time.time()):
+            raise PermissionError("Invalid or expired upload URL")
+
+        storage = get_storage()
+        if storage.exists(object_name):
+            raise FileExistsError(object_name)
+        storage.put(object_name, stream, content_type)
+        return storage.stat(object_name).size
+
+    def finalize_upload(self, object_name: str, original_filename: str, mime_type: str, file_size: int, uploader: User, description: str = None, crc32c: str = None):
+        """
+        Create Media record after successful direct upload.
+        If the same content is already in the library, the new object is deleted and
+        the existing Media returned (flagged with `is_duplicate`). Finalizing an object
+        that already has its Media (a client retry) returns that Media unchanged.
+        """
         
-        # Verify existence (optional but recommended)
-        if current_app.config['STORAGE_BACKEND'] == 'gcs':
-            if not self._gcs_exists(object_name):
-                raise ValueError("File not found in storage. Upload may have failed.")
+        if not self.is_upload_object_name(object_name):
+            raise ValueError("Invalid object name")
+
+        # Checked before verifying: processing may since have rewritten the object in place
+        registered = db.session.execute(db.select(Media).where(Media.filename == object_name)).scalar()
+        if registered is not None:
+            if registered.uploader_id != uploader.id:
+                raise ValueError("This upload has already been registered.")
+            return registered
+
+        # The stored object must be exactly what the client sent
+        self._verify_uploaded_object(object_name, file_size, crc32c)
+
+        storage = get_storage()
+        with storage.open(object_name) as f:
+            digest = sha256_stream(f)
+        existing = self._media_by_content_hash([digest])
         
         media = Media(
             uploader_id=uploader.id,
@@ -205,30 +436,72 @@ class MediaService:
             mime_type=mime_type,
             file_size_bytes=file_size,
             status='processing',
-            description=description
+            description=description,
+            content_sha256=digest
         )
-        db.session.add(media)
-        db.session.commit()
+        if not existing:
+            existing = self._insert_deduplicated([media])
+        elif existing[digest].filename != object_name:
+            storage.delete(object_name)
+        if existing:
+            return existing[digest]
         
         # Trigger Task
-        if current_app.config['TASK_RUNNER'] == 'sync':
-            from app.blueprints.tasks import _process_media_logic
-            print(f"[Sync] Processing media {media.id} locally...")
-            _process_media_logic(str(media.id))
-        else:
-            self._create_cloud_task(media.id)
+        self._dispatch_processing(media)
             
         return media
 
-    def _save_to_local(self, file, object_name):
-        # object_name = galleries/2023/12/foo.jpg
-        full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], object_name)
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        file.save(full_path)
+    def _verify_uploaded_object(self, object_name, file_size, crc32c=None):
+        """
+        Check size (and CRC32C, base64 as reported by GCS) of a directly uploaded object.
+        A mismatching object is deleted and ValueError raised.
+        """
+        storage = get_storage()
+        info = storage.stat(object_name, checksum=bool(crc32c))
+        if info is None:
+            raise ValueError("File not found in storage. Upload may have failed.")
+        actual_size, actual_crc32c = info
 
-    def _create_cloud_task(self, media_id):
-        client = self._get_tasks_client()
-        queue_path = current_app.config['CLOUD_TASKS_QUEUE_PATH']
+        if actual_size != file_size:
+            error = f"Size mismatch: stored {actual_size} bytes, expected {file_size}"
+        elif crc32c and actual_crc32c != crc32c:
+            error = "Checksum mismatch"
+        else:
+            return
+
+        storage.delete(object_name)
+        raise ValueError(f"{error}. Please upload the file again.")
+
+    def _dispatch_processing(self, media):
+        self._dispatch_processing_batch([media])
+
+    def _dispatch_processing_batch(self, media_list):
+        task_runner = current_app.config['TASK_RUNNER']
+        if task_runner == 'sync':
+            # Run directly
+            from app.blueprints.tasks import _process_media_logic, RetryableProcessingError
+            for media in media_list:
+                print(f"[Sync] Processing media {media.id} locally...")
+                try:
+                    _process_media_logic(str(media.id))
+                except RetryableProcessingError as e:
+                    # The upload itself succeeded; the item stays 'processing' with the error recorded
+                    print(f"[Sync] Processing media {media.id} failed: {e}")
+        elif task_runner == 'local':
+            local_task_runner.enqueue_many([media.id for media in media_list])
+        elif len(media_list) == 1:
+            self._create_cloud_task(media_list[0].id)
+        else:
+            # Cloud Tasks has no batch create; resolve the target once and create concurrently
+            target = self._cloud_task_target()
+            if target is None:
+                return
+            workers = min(current_app.config['UPLOAD_WORKERS'], len(media_list))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda media: self._create_cloud_task(media.id, target), media_list))
+
+    def _cloud_task_target(self):
+        """(client, queue_path, handler_url, service_account_email) or None when no worker URL is known."""
         worker_url = current_app.config['CLOUD_RUN_SERVICE_URL']
         
         if not worker_url:
@@ -239,10 +512,17 @@ class MediaService:
 
         if not worker_url:
             print("Warning: CLOUD_RUN_SERVICE_URL not set and request context missing. Task not created.")
-            return
+            return None
 
         # Cloud Run Worker URL (e.g., https://service-url/handlers/process-media)
         url = f"{worker_url}/handlers/process-media"
+        return self._get_tasks_client(), current_app.config['CLOUD_TASKS_QUEUE_PATH'], url, self._get_service_account_email()
+
+    def _create_cloud_task(self, media_id, target=None):
+        target = target or self._cloud_task_target()
+        if target is None:
+            return
+        client, queue_path, url, sa_email = target
         
         payload = {'media_id': str(media_id)}
         json_payload = json.dumps(payload).encode()
@@ -255,7 +535,7 @@ class MediaService:
                 'body': json_payload,
                 # Add OIDC token for authentication
                 'oidc_token': {
-                    'service_account_email': self._get_service_account_email()
+                    'service_account_email': sa_email
                 }
             }
         }
@@ -266,40 +546,155 @@ class MediaService:
             print(f"Failed to create cloud task: {e}")
 
     def _get_service_account_email(self):
-        sa_email = os.environ.get('SERVICE_ACCOUNT_EMAIL')
-        if sa_email:
-            return sa_email
-        return f"thesalo-app-sa@{current_app.config['GOOGLE_CLOUD_PROJECT']}.iam.gserviceaccount.com"
+        return service_account_email()
 
-    def get_global_media(self, limit=20, offset=0, sort_by='created_at_desc', filter_type='all', user_id=None):
-        query = db.select(Media)
-        
-        # Filter
+    SORT_MODES = ('created_at_desc', 'created_at_asc', 'taken_at_desc', 'taken_at_asc')
+
+    def _filter_media_query(self, query, filter_type='all', user_id=None):
         if filter_type == 'image':
-            query = query.filter(Media.mime_type.like('image%'))
+            query = query.filter(Media.media_kind == 'image')
         elif filter_type == 'video':
-            query = query.filter(Media.mime_type.like('video%'))
+            query = query.filter(Media.media_kind == 'video')
         elif filter_type == 'mine' and user_id:
             query = query.filter(Media.uploader_id == user_id)
         elif filter_type == 'favorites' and user_id:
-            query = query.join(Media.favorited_by).filter(User.id == user_id)
-            
-        # Sort
+            # Join the association table only; the users row itself is not needed
+            query = query.join(media_favorites, media_favorites.c.media_id == Media.id).filter(
+                media_favorites.c.user_id == user_id
+            )
+        return query
+
+    def _grid_query(self, user_id=None):
+        """
+        Base SELECT for grid pages: uploader joined in the same statement and, for a
+        viewer, an EXISTS flag telling whether they favorited each row. Without this
+        every tile lazily loads its uploader and the full favorited_by list.
+        """
+        query = db.select(Media).options(joinedload(Media.uploader))
+        if user_id:
+            is_favorited = db.exists().where(
+                media_favorites.c.media_id == Media.id,
+                media_favorites.c.user_id == user_id
+            ).correlate(Media).label('is_favorited')
+            query = query.add_columns(is_favorited)
+        return query
+
+    def _grid_rows(self, query, user_id=None):
+        result = db.session.execute(query)
+        if not user_id:
+            return result.scalars().all()
+
+        media_list = []
+        for media, is_favorited in result.all():
+            # Transient attribute read by the grid template instead of media.favorited_by
+            media.is_favorited = bool(is_favorited)
+            media_list.append(media)
+        return media_list
+
+    def _normalize_sort(self, sort_by):
+        # Unknown sort modes fall back to created_at desc
+        return sort_by if sort_by in self.SORT_MODES else 'created_at_desc'
+
+    def _order_media_query(self, query, sort_by):
+        # `id` is appended as a tie-breaker so the order is total (required for keyset paging)
         if sort_by == 'created_at_asc':
-            query = query.order_by(Media.created_at.asc())
-        elif sort_by == 'created_at_desc':
-            query = query.order_by(Media.created_at.desc())
-        elif sort_by == 'taken_at_desc':
-            query = query.order_by(Media.taken_at.desc().nullslast(), Media.created_at.desc())
-        elif sort_by == 'taken_at_asc':
-            query = query.order_by(Media.taken_at.asc().nullslast(), Media.created_at.asc())
+            return query.order_by(Media.created_at.asc(), Media.id.asc())
+        if sort_by == 'taken_at_desc':
+            return query.order_by(Media.taken_at.desc().nullslast(), Media.created_at.desc(), Media.id.desc())
+        if sort_by == 'taken_at_asc':
+            return query.order_by(Media.taken_at.asc().nullslast(), Media.created_at.asc(), Media.id.asc())
+        return query.order_by(Media.created_at.desc(), Media.id.desc())
+
+    def get_global_media(self, limit=20, offset=0, sort_by='created_at_desc', filter_type='all', user_id=None):
+        query = self._filter_media_query(self._grid_query(user_id), filter_type, user_id)
+        query = self._order_media_query(query, self._normalize_sort(sort_by))
+
+        return self._grid_rows(query.limit(limit).offset(offset), user_id)
+
+    def get_media_feed(self, cursor=None, limit=20, sort_by='created_at_desc', filter_type='all', user_id=None):
+        """
+        Keyset-paginated variant of get_global_media.
+        Returns (media_list, next_cursor); next_cursor is None on the last page.
+        Each page is a range scan starting right after the cursor row, so page N
+        costs the same as page 1 regardless of library size.
+        """
+        sort_by = self._normalize_sort(sort_by)
+        query = self._filter_media_query(self._grid_query(user_id), filter_type, user_id)
+
+        if cursor:
+            query = query.filter(self._cursor_condition(sort_by, self._decode_cursor(cursor, sort_by)))
+
+        query = self._order_media_query(query, sort_by)
+
+        # Fetch one extra row to know whether another page exists
+        rows = self._grid_rows(query.limit(limit + 1), user_id)
+        media_list = rows[:limit]
+
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = self._encode_cursor(media_list[-1], sort_by)
+
+        return media_list, next_cursor
+
+    def _encode_cursor(self, media: Media, sort_by: str) -> str:
+        key = {
+            's': sort_by,
+            'c': media.created_at.isoformat(),
+            'i': str(media.id)
+        }
+        if sort_by.startswith('taken_at'):
+            key['t'] = media.taken_at.isoformat() if media.taken_at else None
+
+        raw = json.dumps(key, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def _decode_cursor(self, cursor: str, sort_by: str) -> dict:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            decoded = {
+                'created_at': datetime.fromisoformat(key['c']),
+                'id': uuid6.UUID(key['i']),
+                'taken_at': datetime.fromisoformat(key['t']) if key.get('t') else None
+            }
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+        # A cursor is only meaningful for the ordering it was issued for
+        if key.get('s') != sort_by:
+            raise ValueError("Cursor does not match sort order")
+
+        return decoded
+
+    def _cursor_condition(self, sort_by: str, key: dict):
+        """Build the WHERE clause selecting rows strictly after the cursor row."""
+        created_at, media_id = key['created_at'], key['id']
+
+        # Row-value comparison so the planner can use it as an index bound
+        # (an equivalent OR of ranges is applied as a filter after the scan)
+        position = tuple_(Media.created_at, Media.id)
+        cursor_position = tuple_(
+            literal(created_at, Media.created_at.type), literal(media_id, Media.id.type)
+        )
+        if sort_by.endswith('_asc'):
+            after_created = position > cursor_position
         else:
-            # Default to created_at desc
-            query = query.order_by(Media.created_at.desc())
-            
-        return db.session.execute(
-            query.limit(limit).offset(offset)
-        ).scalars().all()
+            after_created = position < cursor_position
+
+        if not sort_by.startswith('taken_at'):
+            return after_created
+
+        # taken_at is sorted NULLS LAST in both directions
+        taken_at = key['taken_at']
+        if taken_at is None:
+            return and_(Media.taken_at.is_(None), after_created)
+
+        past_taken = Media.taken_at > taken_at if sort_by.endswith('_asc') else Media.taken_at < taken_at
+        return or_(
+            past_taken,
+            and_(Media.taken_at == taken_at, after_created),
+            Media.taken_at.is_(None)
+        )
 
     def get_media(self, media_id: str):
         try:
@@ -310,39 +705,106 @@ class MediaService:
     def delete_media(self, media: Media):
         if not media:
              return
-             
-        # Delete from Storage
-        try:
-            if current_app.config['STORAGE_BACKEND'] == 'gcs':
-                storage_client = self._get_storage_client()
-                bucket_name = current_app.config['GCS_BUCKET_NAME']
-                bucket = storage_client.bucket(bucket_name)
-                
-                # Delete Original
-                blob = bucket.blob(media.filename)
-                if blob.exists():
-                    blob.delete()
-                    
-                # Delete Thumbnail if exists
-                if media.thumbnail_path:
-                    thumb_blob = bucket.blob(media.thumbnail_path)
-                    if thumb_blob.exists():
-                        thumb_blob.delete()
+
+        result = self.delete_media_bulk([media.id])[0]
+        if result['status'] == 'error':
+            raise RuntimeError(result['error'])
+
+    def delete_media_bulk(self, media_ids, user: User = None):
+        """
+        Delete several media with their stored objects (original, thumbnail, renditions).
+
+        Objects of all items are removed in one storage call (GCS batch requests), then
+        the rows and their tag/pet/favorite/album/task rows go in a few set-based
+        DELETEs and a single commit. An item whose objects could not all be removed
+        keeps its row so the delete can be retried. When `user` is given, only their
+        own uploads (or anything, for owners) are deleted.
+
+        Returns one {'id', 'status', 'error'} per distinct requested id, in order; status is
+        'deleted', 'not_found', 'forbidden' or 'error'.
+        """
+        parsed = {}
+        for media_id in media_ids:
+            try:
+                parsed[str(media_id)] = media_id if isinstance(media_id, uuid6.UUID) else uuid6.UUID(str(media_id))
+            except ValueError:
+                parsed[str(media_id)] = None
+
+        wanted = {value for value in parsed.values() if value is not None}
+        found = {}
+        if wanted:
+            found = {
+                media.id: media
+                for media in db.session.execute(db.select(Media).where(Media.id.in_(wanted))).scalars()
+            }
+
+        storage = get_storage()
+        statuses = {}
+        objects = {}
+        for key, media_id in parsed.items():
+            media = found.get(media_id)
+            if media is None:
+                statuses[key] = ('not_found', None)
+            elif user is not None and media.uploader_id != user.id and not user.is_owner:
+                statuses[key] = ('forbidden', None)
             else:
-                # Local Delete
-                full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], media.filename)
-                if os.path.exists(full_path):
-                    os.remove(full_path)
-                if media.thumbnail_path:
-                    thumb_path = os.path.join(current_app.config['UPLOAD_FOLDER'], media.thumbnail_path)
-                    if os.path.exists(thumb_path):
-                        os.remove(thumb_path)
+                objects[key] = [n for n in [media.filename, media.thumbnail_path] + [r['path'] for r in media.renditions or []] if n]
+                # An HLS package is a folder of playlists and segments
+                for hls in media.renditions_for('hls'):
+                    objects[key].extend(storage.names(posixpath.dirname(hls['path']) + '/'))
 
-        except Exception as e:
-            print(f"Error deleting from storage: {e}")
-                
-        db.session.delete(media)
-        db.session.commit()
+        storage_errors = storage.delete_many(name for names in objects.values() for name in names)
+
+        deletable = []
+        for key, names in objects.items():
+            errors = [f"{name}: {storage_errors[name]}" for name in names if storage_errors.get(name)]
+            if errors:
+                print(f"Error deleting media {key} from storage: {errors}")
+                statuses[key] = ('error', '; '.join(errors))
+            else:
+                statuses[key] = ('deleted', None)
+                deletable.append(parsed[key])
+
+            for name in names:
+                signed_url_cache.invalidate(name)
+
+        if deletable:
+            for table in (media_tags, media_pets, media_favorites, album_media):
+                db.session.execute(table.delete().where(table.c.media_id.in_(deletable)))
+            db.session.execute(db.delete(ProcessingTask).where(ProcessingTask.media_id.in_(deletable)))
+            db.session.execute(db.delete(Media).where(Media.id.in_(deletable)))
+            db.session.commit()
+            similar_media_index.discard(deletable)
+
+        return [
+            {'id': key, 'status': statuses[key][0], 'error': statuses[key][1]}
+            for key in parsed
+        ]
+
+    def find_similar_media(self, media: Media, max_distance: int = None, limit: int = 50):
+        """
+        Near-duplicates of a processed image (burst shots, re-saved or resized copies):
+        [(Media, phash_distance, dhash_distance)], closest first, excluding `media` itself.
+        Raises ValueError when the image has no perceptual hash yet.
+        """
+        if not media.phash:
+            raise ValueError("Media has no perceptual hash (not processed yet, or not an image)")
+        if max_distance is None:
+            max_distance = current_app.config['SIMILAR_MEDIA_DISTANCE']
+
+        similar_media_index.refresh()
+        matches = [m for m in similar_media_index.search(media.phash, media.dhash, max_distance) if m[0] != media.id]
+        matches = matches[:limit]
+        if not matches:
+            return []
+
+        rows = {
+            m.id: m
+            for m in db.session.execute(db.select(Media).where(Media.id.in_([m[0] for m in matches]))).scalars()
+        }
+        # Rows deleted by another process since the index last saw them
+        similar_media_index.discard([media_id for media_id, _, _ in matches if media_id not in rows])
+        return [(rows[media_id], distance, d_distance) for media_id, distance, d_distance in matches if media_id in rows]
 
     def toggle_favorite(self, media_id: str, user_id: uuid6.UUID) -> dict:
         media = self.get_media(media_id)
@@ -365,3 +827,45 @@ class MediaService:
             'media_id': str(media.id),
             'items': is_favorited # current state
         }
+
+    def backfill_taken_at_chunk(self, after_id=None, batch_size=500):
+        """
+        Convert one chunk of legacy taken_at strings to the typed column.
+
+        Rows are visited in id order starting after `after_id`; converted rows have
+        taken_at_legacy cleared in the same commit, so an interrupted backfill simply
+        resumes with the rows that are still left. Returns
+        (last_id, converted, unparseable); last_id is None once nothing is left.
+        """
+        table = Media.__table__
+        query = db.select(table.c.id, table.c.taken_at, table.c.taken_at_legacy).where(
+            table.c.taken_at_legacy.is_not(None)
+        )
+        if after_id is not None:
+            query = query.where(table.c.id > after_id)
+        rows = db.session.execute(query.order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            return None, 0, 0
+
+        updates = []
+        unparseable = 0
+        for media_id, taken_at, legacy in rows:
+            if taken_at is None:
+                taken_at = parse_taken_at(legacy)
+                if taken_at is None:
+                    # Left in place (and reported) rather than silently dropped
+                    unparseable += 1
+                    continue
+            updates.append({'b_id': media_id, 'b_taken_at': taken_at, 'b_legacy': legacy})
+
+        if updates:
+            # Only rows nobody edited since the chunk was read
+            db.session.execute(
+                table.update()
+                .where(table.c.id == bindparam('b_id'), table.c.taken_at_legacy == bindparam('b_legacy'))
+                .values(taken_at=bindparam('b_taken_at'), taken_at_legacy=None),
+                updates
+            )
+        db.session.commit()
+
+        return rows[-1][0], len(updates), unparseable
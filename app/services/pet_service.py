@@ -1,13 +1,9 @@
 from app.extensions import db
 from app.models.media import PetProfile
 import uuid6
-import os
 from werkzeug.utils import secure_filename
-from flask import current_app
 from pathlib import Path
-import google.auth
-from google.cloud import storage
-from google.auth import impersonated_credentials
+from .storage_backend import get_storage
 
 class PetService:
     def get_all_pets(self):
@@ -19,24 +15,6 @@ class PetService:
         except:
             return None
 
-    def _get_storage_client(self):
-        if current_app.config.get('STORAGE_BACKEND') == 'gcs':
-             credentials, project = google.auth.default()
-             sa_email = os.environ.get('SERVICE_ACCOUNT_EMAIL') or f"thesalo-app-sa@{current_app.config['GOOGLE_CLOUD_PROJECT']}.iam.gserviceaccount.com"
-             
-             try:
-                 credentials = impersonated_credentials.Credentials(
-                     source_credentials=credentials,
-                     target_principal=sa_email,
-                     target_scopes=["https://www.googleapis.com/auth/cloud-platform"],
-                     lifetime=3600
-                 )
-             except Exception as e:
-                 print(f"Warning: Failed to create impersonated credentials: {e}")
-
-             return storage.Client(credentials=credentials)
-        return None
-
     def _save_avatar(self, file) -> str:
         if not file or file.filename == '':
             return None
@@ -47,30 +25,11 @@ class PetService:
         ext = Path(filename).suffix
         filename = f"pet_avatar_{uuid6.uuid7().hex[:8]}{ext}"
         
-        # GCS Support
-        if current_app.config.get('STORAGE_BACKEND') == 'gcs':
-            storage_client = self._get_storage_client()
-            bucket_name = current_app.config['GCS_BUCKET_NAME']
-            bucket = storage_client.bucket(bucket_name)
-            
-            # Save to 'avatars/' prefix in bucket
-            object_name = f"avatars/{filename}"
-            blob = bucket.blob(object_name)
-            
-            file.seek(0)
-            blob.upload_from_file(file)
-            
-            return object_name
-            
-        # Local Fallback
-        upload_folder = Path(current_app.config['UPLOAD_FOLDER'])
-        avatars_dir = upload_folder / 'avatars'
-        avatars_dir.mkdir(parents=True, exist_ok=True)
-        
-        save_path = avatars_dir / filename
-        file.save(str(save_path))
+        object_name = f"avatars/{filename}"
+        file.seek(0)
+        get_storage().put(object_name, file, file.mimetype or None)
         
-        return str(save_path.relative_to(upload_folder)).replace('\\', '/')
+        return object_name
             
     def create_pet(self, data: dict, avatar_file=None):
         avatar_url = self._save_avatar(avatar_file)
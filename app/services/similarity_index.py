@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import combinations
+from flask import current_app
+from app.extensions import db
+from app.models.media import Media
+
+# 64-bit hashes split into 8 one-byte chunks, one lookup table per chunk
+HASH_BITS = 64
+CHUNK_BITS = 8
+CHUNKS = HASH_BITS // CHUNK_BITS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+# Rows committed this long after their updated_at was stamped are still picked up
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+def _chunk_neighbours(value, radius):
+    """Every chunk value within `radius` bits of `value`."""
+    yield value
+    for r in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            flipped = value
+            for bit in bits:
+                flipped ^= 1 << bit
+            yield flipped
+
+
+class HammingIndex:
+    """
+    Multi-index hashing over 64-bit hashes for Hamming-radius queries.
+
+    Each hash is filed under its 8 byte-sized chunks. By the pigeonhole principle two
+    hashes within distance d agree to within d // 8 bits on at least one chunk, so a
+    query only probes those chunk values (1 per table up to d=7, 9 up to d=15) and
+    verifies the few candidates, instead of comparing against every hash. Adding and
+    removing are O(1), so the index is kept up to date incrementally.
+    Not thread-safe; SimilarMediaIndex serialises access.
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._tables = [defaultdict(set) for _ in range(CHUNKS)]
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, key):
+        return key in self._hashes
+
+    def add(self, key, value: int):
+        self.remove(key)
+        self._hashes[key] = value
+        for i, table in enumerate(self._tables):
+            table[(value >> (i * CHUNK_BITS)) & CHUNK_MASK].add(key)
+
+    def remove(self, key):
+        value = self._hashes.pop(key, None)
+        if value is None:
+            return
+        for i, table in enumerate(self._tables):
+            chunk = (value >> (i * CHUNK_BITS)) & CHUNK_MASK
+            bucket = table[chunk]
+            bucket.discard(key)
+            if not bucket:
+                del table[chunk]
+
+    def search(self, value: int, max_distance: int):
+        """[(distance, key)] of every hash within `max_distance` bits, closest first."""
+        radius = max_distance // CHUNKS
+        candidates = set()
+        for i, table in enumerate(self._tables):
+            chunk = (value >> (i * CHUNK_BITS)) & CHUNK_MASK
+            for probe in _chunk_neighbours(chunk, radius):
+                bucket = table.get(probe)
+                if bucket:
+                    candidates.update(bucket)
+
+        matches = []
+        for key in candidates:
+            distance = (self._hashes[key] ^ value).bit_count()
+            if distance <= max_distance:
+                matches.append((distance, key))
+        matches.sort(key=lambda m: (m[0], str(m[1])))
+        return matches
+
+
+class SimilarMediaIndex:
+    """
+    Process-wide near-duplicate index of processed images (Media.phash / dhash).
+
+    The first query loads every hashed row; after that, refresh() only reads rows
+    whose updated_at moved since the previous refresh (at most every
+    SIMILAR_INDEX_REFRESH_SEC), so media processed by other processes show up within
+    seconds. Deleted media are dropped when a query finds their row gone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = HammingIndex()
+        self._dhashes = {}
+        self._watermark = None
+        self._refreshed_at = None
+
+    def clear(self):
+        with self._lock:
+            self._index = HammingIndex()
+            self._dhashes = {}
+            self._watermark = None
+            self._refreshed_at = None
+
+    def __len__(self):
+        return len(self._index)
+
+    def refresh(self, force=False):
+        interval = current_app.config['SIMILAR_INDEX_REFRESH_SEC']
+        with self._lock:
+            if not force and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < interval:
+                return
+            query = db.select(Media.id, Media.phash, Media.dhash, Media.updated_at)
+            if self._watermark is None:
+                query = query.where(Media.phash.isnot(None))
+            else:
+                query = query.where(Media.updated_at >= self._watermark - REFRESH_OVERLAP)
+            for media_id, phash, dhash, updated_at in db.session.execute(query):
+                self._put(media_id, phash, dhash)
+                if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                    self._watermark = updated_at
+            self._refreshed_at = time.monotonic()
+
+    def _put(self, media_id, phash, dhash):
+        if phash is None:
+            self._index.remove(media_id)
+            self._dhashes.pop(media_id, None)
+            return
+        self._index.add(media_id, int(phash, 16))
+        self._dhashes[media_id] = int(dhash, 16) if dhash else None
+
+    def add(self, media_id, phash, dhash=None):
+        with self._lock:
+            self._put(media_id, phash, dhash)
+
+    def discard(self, media_ids):
+        with self._lock:
+            for media_id in media_ids:
+                self._put(media_id, None, None)
+
+    def search(self, phash, dhash=None, max_distance=6):
+        """
+        [(media_id, phash_distance, dhash_distance)] within `max_distance` pHash bits,
+        ranked by the sum of both distances (dhash_distance is None when unknown).
+        """
+        value = int(phash, 16)
+        other = int(dhash, 16) if dhash else None
+        with self._lock:
+            matches = []
+            for distance, media_id in self._index.search(value, max_distance):
+                candidate = self._dhashes.get(media_id)
+                d_distance = (candidate ^ other).bit_count() if candidate is not None and other is not None else None
+                matches.append((media_id, distance, d_distance))
+        matches.sort(key=lambda m: (m[1] + (m[2] if m[2] is not None else m[1]), m[1]))
+        return matches
+
+
+similar_media_index = SimilarMediaIndex()
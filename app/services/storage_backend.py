@@ -0,0 +1,387 @@
+import io
+import os
+import shutil
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from flask import current_app, url_for
+from google.api_core import exceptions as gcs_exceptions
+import uuid6
+from app.utils.hashing import file_crc32c, crc32c_b64
+from .storage_client import gcs_clients
+from .url_signer import sign_v4_hmac_url, sign_local_upload
+import google_crc32c
+
+# size in bytes; crc32c as base64 of the big-endian checksum (the format GCS reports)
+ObjectInfo = namedtuple('ObjectInfo', ['size', 'crc32c'])
+
+# The JSON API accepts at most 100 calls per batch request
+GCS_BATCH_SIZE = 100
+
+
+class StorageBackend:
+    """
+    Where media objects live. Object names are relative paths such as
+    galleries/2026/10/photo_<uuid>.jpg, avatars/... or renditions/...; callers never
+    branch on STORAGE_BACKEND themselves but go through get_storage().
+
+    Subclasses implement put/open/stat/delete; the rest has generic defaults.
+    """
+    name = None
+    # True when browsers fetch objects from signed URLs rather than /media/file
+    serves_signed_urls = False
+    # True when browsers upload resumable parts straight to storage (resumable_upload_url)
+    resumable_uploads = False
+
+    def put(self, object_name, stream, content_type=None, size=None):
+        """Store everything readable from `stream` under `object_name` (replacing it)."""
+        raise NotImplementedError
+
+    def put_bytes(self, object_name, data, content_type=None):
+        self.put(object_name, io.BytesIO(data), content_type, len(data))
+
+    @contextmanager
+    def writer(self, object_name, content_type=None):
+        """File object to encode an output into; stored when the block exits without error."""
+        buffer = io.BytesIO()
+        yield buffer
+        size = buffer.tell()
+        buffer.seek(0)
+        self.put(object_name, buffer, content_type, size)
+
+    def open(self, object_name):
+        """Seekable binary reader over an object (use as a context manager)."""
+        raise NotImplementedError
+
+    def local_path(self, object_name):
+        """Filesystem path of the object when it can be read in place, else None."""
+        return None
+
+    def stat(self, object_name, checksum=False):
+        """ObjectInfo, or None when the object doesn't exist. crc32c may be None unless `checksum`."""
+        raise NotImplementedError
+
+    def exists(self, object_name):
+        return self.stat(object_name) is not None
+
+    def names(self, prefix=''):
+        """Sorted names of the objects under `prefix` (e.g. every segment of an HLS package)."""
+        raise NotImplementedError
+
+    def sizes(self, prefix=''):
+        """{name: size} of the objects under `prefix`."""
+        sizes = {}
+        for name in self.names(prefix):
+            info = self.stat(name)
+            if info is not None:
+                sizes[name] = info.size
+        return sizes
+
+    def compose(self, object_name, source_names, content_type=None):
+        """Store the concatenation of the source objects, in order, as `object_name`."""
+        with self.writer(object_name, content_type) as out:
+            for name in source_names:
+                with self.open(name) as source:
+                    shutil.copyfileobj(source, out, 1024 * 1024)
+
+    def resumable_upload_url(self, object_name, size, origin):
+        """
+        URL the browser uploads `size` bytes to directly, resuming after a dropped
+        connection (only with `resumable_uploads`; otherwise parts are PUT to the app).
+        """
+        raise NotImplementedError
+
+    def delete(self, object_name):
+        """Delete an object. Returns False when there was nothing to delete."""
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix):
+        """Delete every object under `prefix` (e.g. the parts of an upload session)."""
+        return self.delete_many(self.names(prefix))
+
+    def delete_many(self, object_names):
+        """Delete several objects: {object_name: None on success (or already gone), or the error}."""
+        return {name: self._delete_quietly(name) for name in dict.fromkeys(object_names)}
+
+    def _delete_quietly(self, object_name):
+        try:
+            self.delete(object_name)
+        except Exception as e:
+            return e
+        return None
+
+    def sign_urls(self, object_names, expires_at, method='GET', content_type=None):
+        """
+        Time-limited URLs ({object_name: url}) valid until `expires_at` (unix time).
+        Outside GCS only uploads are signed: PUT URLs point at media.put_local_upload,
+        which stores the body through this backend.
+        """
+        if method != 'PUT':
+            return {}
+        secret = current_app.config['SECRET_KEY']
+        return {
+            name: url_for('media.put_local_upload', object_name=name, expires=expires_at,
+                          signature=sign_local_upload(secret, name, content_type or '', expires_at))
+            for name in object_names
+        }
+
+
+class GCSStorage(StorageBackend):
+    """Objects in GCS_BUCKET_NAME through the process-wide client (see GCSClientManager)."""
+    name = 'gcs'
+    serves_signed_urls = True
+    resumable_uploads = True
+
+    @property
+    def bucket(self):
+        return gcs_clients.bucket()
+
+    def put(self, object_name, stream, content_type=None, size=None):
+        self.bucket.blob(object_name).upload_from_file(stream, content_type=content_type, size=size)
+
+    def put_bytes(self, object_name, data, content_type=None):
+        self.bucket.blob(object_name).upload_from_string(data, content_type=content_type)
+
+    def open(self, object_name):
+        # Streams through a buffer of at most PROCESSING_READ_CHUNK_SIZE bytes
+        return self.bucket.blob(object_name).open(
+            'rb', chunk_size=current_app.config['PROCESSING_READ_CHUNK_SIZE']
+        )
+
+    def stat(self, object_name, checksum=False):
+        blob = self.bucket.get_blob(object_name)
+        if blob is None:
+            return None
+        return ObjectInfo(blob.size, blob.crc32c)
+
+    def exists(self, object_name):
+        return self.bucket.blob(object_name).exists()
+
+    def names(self, prefix=''):
+        return sorted(blob.name for blob in self.bucket.list_blobs(prefix=prefix))
+
+    def sizes(self, prefix=''):
+        # One listing instead of a metadata request per object
+        return {blob.name: blob.size for blob in self.bucket.list_blobs(prefix=prefix)}
+
+    def compose(self, object_name, source_names, content_type=None):
+        """Server-side compose (at most 32 sources); nothing passes through the app."""
+        bucket = self.bucket
+        destination = bucket.blob(object_name)
+        destination.content_type = content_type
+        destination.compose([bucket.blob(name) for name in source_names])
+
+    def resumable_upload_url(self, object_name, size, origin):
+        # `origin` makes GCS answer the browser's CORS requests on the session URI
+        return self.bucket.blob(object_name).create_resumable_upload_session(
+            content_type='application/octet-stream', size=size, origin=origin
+        )
+
+    def delete(self, object_name):
+        try:
+            self.bucket.blob(object_name).delete()
+        except gcs_exceptions.NotFound:
+            return False
+        return True
+
+    def delete_many(self, object_names):
+        """Deletes through batch requests: one round-trip per 100 objects."""
+        names = list(dict.fromkeys(object_names))
+        results = {}
+        if not names:
+            return results
+        client = gcs_clients.client()
+        bucket = self.bucket
+        for start in range(0, len(names), GCS_BATCH_SIZE):
+            chunk = names[start:start + GCS_BATCH_SIZE]
+            batch = client.batch(raise_exception=False)
+            with batch:
+                for name in chunk:
+                    bucket.blob(name).delete()
+            # One response per deferred call, in order. `with batch` discards finish()'s
+            # return value, so they're read from the Batch afterwards; this relies on the
+            # pinned google-cloud-storage (requirements.txt), covered by UT-STORAGE-004
+            for name, response in zip(chunk, batch._responses):
+                status = response.status_code
+                if 200 <= status < 300 or status == 404:
+                    results[name] = None
+                else:
+                    results[name] = gcs_exceptions.from_http_response(response)
+        return results
+
+    def sign_urls(self, object_names, expires_at, method='GET', content_type=None):
+        """
+        V4 signed URLs. With the GCS HMAC key they are signed locally; otherwise
+        through concurrent IAM signBlob calls (SIGNED_URL_BATCH_WORKERS).
+        """
+        config = current_app.config
+        names = list(object_names)
+        bucket_name = config['GCS_BUCKET_NAME']
+
+        if config.get('GCS_HMAC_ACCESS_ID') and config.get('GCS_HMAC_SECRET') and content_type is None:
+            # Signing time derived from the expiry keeps the URL identical for equal expires_at
+            expiration = config['SIGNED_URL_EXPIRATION_SEC']
+            signed_at = datetime.fromtimestamp(expires_at - expiration, tz=timezone.utc)
+            return {
+                name: sign_v4_hmac_url(
+                    bucket_name, name,
+                    config['GCS_HMAC_ACCESS_ID'], config['GCS_HMAC_SECRET'],
+                    signed_at, expiration, method=method
+                )
+                for name in names
+            }
+
+        bucket = self.bucket
+        expires = datetime.fromtimestamp(expires_at, tz=timezone.utc)
+
+        def sign(name):
+            return bucket.blob(name).generate_signed_url(
+                version="v4", expiration=expires, method=method, content_type=content_type
+            )
+
+        if len(names) <= 1:
+            return {name: sign(name) for name in names}
+        workers = min(len(names), config['SIGNED_URL_BATCH_WORKERS'])
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(names, executor.map(sign, names)))
+
+
+class LocalStorage(StorageBackend):
+    """Files under UPLOAD_FOLDER, served by /media/file."""
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, object_name):
+        return os.path.join(self.root, object_name)
+
+    @contextmanager
+    def writer(self, object_name, content_type=None):
+        """
+        Written under a temporary name and renamed into place, so a reader (including
+        an original still being processed under the same name) never sees a partial file.
+        """
+        path = self.local_path(object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid6.uuid7().hex}.part"
+        try:
+            with open(tmp_path, 'wb') as f:
+                yield f
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put(self, object_name, stream, content_type=None, size=None):
+        with self.writer(object_name) as f:
+            shutil.copyfileobj(stream, f, 1024 * 1024)
+
+    def put_bytes(self, object_name, data, content_type=None):
+        with self.writer(object_name) as f:
+            f.write(data)
+
+    def open(self, object_name):
+        return open(self.local_path(object_name), 'rb')
+
+    def stat(self, object_name, checksum=False):
+        path = self.local_path(object_name)
+        if not os.path.isfile(path):
+            return None
+        return ObjectInfo(os.path.getsize(path), file_crc32c(path) if checksum else None)
+
+    def exists(self, object_name):
+        return os.path.exists(self.local_path(object_name))
+
+    def names(self, prefix=''):
+        # Object names use '/', so walk from the deepest directory the prefix names
+        folder = prefix.rsplit('/', 1)[0] if '/' in prefix else ''
+        names = []
+        for dirpath, _, filenames in os.walk(self.local_path(folder)):
+            relative = os.path.relpath(dirpath, self.root).replace(os.sep, '/')
+            for filename in filenames:
+                name = filename if relative == '.' else f"{relative}/{filename}"
+                if name.startswith(prefix):
+                    names.append(name)
+        return sorted(names)
+
+    def delete(self, object_name):
+        try:
+            os.remove(self.local_path(object_name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete_prefix(self, prefix):
+        """Also removes the folder the prefix names, so finished upload sessions leave nothing behind."""
+        results = super().delete_prefix(prefix)
+        if prefix.endswith('/'):
+            shutil.rmtree(self.local_path(prefix), ignore_errors=True)
+        return results
+
+    def delete_many(self, object_names):
+        """Unlinks on a thread pool (STORAGE_DELETE_WORKERS); each one is a blocking call, slow on network filesystems."""
+        names = list(dict.fromkeys(object_names))
+        workers = min(len(names), current_app.config['STORAGE_DELETE_WORKERS'])
+        if workers <= 1:
+            return super().delete_many(names)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(names, executor.map(self._delete_quietly, names)))
+
+
+class InMemoryStorage(StorageBackend):
+    """
+    STORAGE_BACKEND='memory': objects kept in a dict for tests and offline benchmarks
+    of the upload/processing pipeline. Shared by the whole process, lost on exit.
+    """
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._objects = {}
+
+    def clear(self):
+        with self._lock:
+            self._objects.clear()
+
+    def names(self, prefix=''):
+        with self._lock:
+            return sorted(name for name in self._objects if name.startswith(prefix))
+
+    def put(self, object_name, stream, content_type=None, size=None):
+        data = stream.read() if size is None else stream.read(size)
+        with self._lock:
+            self._objects[object_name] = (bytes(data), content_type)
+
+    def get_bytes(self, object_name):
+        with self._lock:
+            return self._objects[object_name][0]
+
+    def open(self, object_name):
+        return io.BytesIO(self.get_bytes(object_name))
+
+    def stat(self, object_name, checksum=False):
+        with self._lock:
+            entry = self._objects.get(object_name)
+        if entry is None:
+            return None
+        return ObjectInfo(len(entry[0]), crc32c_b64(google_crc32c.Checksum(entry[0])) if checksum else None)
+
+    def delete(self, object_name):
+        with self._lock:
+            return self._objects.pop(object_name, None) is not None
+
+
+memory_storage = InMemoryStorage()
+
+
+def get_storage() -> StorageBackend:
+    """The backend selected by STORAGE_BACKEND ('gcs', 'local' or 'memory')."""
+    backend = current_app.config['STORAGE_BACKEND']
+    if backend == 'gcs':
+        return GCSStorage()
+    if backend == 'memory':
+        return memory_storage
+    return LocalStorage(current_app.config['UPLOAD_FOLDER'])
@@ -0,0 +1,122 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+import google.auth
+from google.auth import impersonated_credentials
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.cloud import storage
+from requests.adapters import HTTPAdapter
+
+
+class GCSClientManager:
+    """
+    Process-wide, thread-safe holder for the GCS client.
+
+    Building a client means google.auth.default() + an IAM generateAccessToken call for
+    the impersonated credentials + a fresh HTTP session, so it is done once per process
+    (per project/service account) and shared by every request and worker thread.
+    Credentials are refreshed ahead of expiry by a single thread while the others keep
+    using the still-valid token.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._key = None
+        self._client = None
+        self._credentials = None
+        self._session = None
+
+    def client(self) -> storage.Client:
+        key = self._config_key()
+        with self._lock:
+            if self._client is None or self._key != key:
+                self._build(key)
+            client, credentials = self._client, self._credentials
+
+        self._refresh_ahead(credentials)
+        return client
+
+    def bucket(self, bucket_name: str = None) -> storage.Bucket:
+        return self.client().bucket(bucket_name or current_app.config['GCS_BUCKET_NAME'])
+
+    def reset(self):
+        """Drop the cached client (e.g. after a config change or in tests)."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._key = None
+            self._client = None
+            self._credentials = None
+            self._session = None
+
+    def _config_key(self):
+        return (
+            current_app.config['GOOGLE_CLOUD_PROJECT'],
+            service_account_email(),
+            current_app.config['GCS_HTTP_POOL_SIZE'],
+        )
+
+    def _build(self, key):
+        project, sa_email, pool_size = key
+
+        # On Cloud Run, default credentials don't support signing.
+        # We wrap them in ImpersonatedCredentials to use IAM API for signing.
+        credentials, _ = google.auth.default()
+        if sa_email:
+            try:
+                credentials = impersonated_credentials.Credentials(
+                    source_credentials=credentials,
+                    target_principal=sa_email,
+                    target_scopes=["https://www.googleapis.com/auth/cloud-platform"],
+                    lifetime=3600
+                )
+            except Exception as e:
+                print(f"Warning: Failed to create impersonated credentials: {e}")
+                # Fallback to default if impersonation fails (e.g. local dev with key)
+
+        # Keep-alive connections shared by all threads using this client
+        session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+
+        if self._session is not None:
+            self._session.close()
+
+        self._key = key
+        self._credentials = credentials
+        self._session = session
+        self._client = storage.Client(project=project, credentials=credentials, _http=session)
+
+    def _refresh_ahead(self, credentials):
+        window = timedelta(seconds=current_app.config['GCS_CREDENTIALS_REFRESH_AHEAD_SEC'])
+        expiry = getattr(credentials, 'expiry', None)
+        # expiry is a naive UTC datetime in google-auth
+        due = not credentials.valid or (expiry is not None and expiry - window <= datetime.utcnow())
+        if not due:
+            return
+
+        # While the current token is still valid only one thread refreshes; the rest move on.
+        # Once it has expired everybody waits for the refresh.
+        if not self._refresh_lock.acquire(blocking=not credentials.valid):
+            return
+        try:
+            expiry = getattr(credentials, 'expiry', None)
+            if not credentials.valid or (expiry is not None and expiry - window <= datetime.utcnow()):
+                credentials.refresh(Request())
+        except Exception as e:
+            # The client retries the refresh on its next authorized request
+            print(f"Warning: Failed to refresh GCS credentials ahead of expiry: {e}")
+        finally:
+            self._refresh_lock.release()
+
+
+def service_account_email():
+    sa_email = os.environ.get('SERVICE_ACCOUNT_EMAIL')
+    if sa_email:
+        return sa_email
+    return f"thesalo-app-sa@{current_app.config['GOOGLE_CLOUD_PROJECT']}.iam.gserviceaccount.com"
+
+
+gcs_clients = GCSClientManager()
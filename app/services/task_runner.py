@@ -0,0 +1,272 @@
+import atexit
+import multiprocessing
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from app.extensions import db
+from app.models.media import Media
+from app.models.task import ProcessingTask
+
+# Set in pool processes so their create_app() doesn't start another dispatcher
+_in_worker = False
+_worker_app = None
+
+
+def _media_leased():
+    """Media (joined on the task) whose processing lease hasn't expired yet."""
+    return Media.processing_lease_until.is_not(None) & (Media.processing_lease_until > _utcnow())
+
+
+def _init_worker():
+    global _in_worker, _worker_app
+    _in_worker = True
+    from app import create_app
+    _worker_app = create_app()
+
+
+def run_media_task(media_id):
+    """Entry point executed in a pool process; returns the _process_media_logic outcome."""
+    from app.blueprints.tasks import _process_media_logic
+    with _worker_app.app_context():
+        try:
+            return _process_media_logic(media_id)
+        finally:
+            db.session.remove()
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class LocalTaskRunner:
+    """
+    TASK_RUNNER='local': media processing on a bounded process pool fed from the
+    processing_tasks table.
+
+    Uploads only insert a queue row, so the request returns immediately. A dispatcher
+    thread per web process claims queued rows (a conditional UPDATE, so several
+    gunicorn workers can share one queue) and runs them on up to LOCAL_TASK_WORKERS
+    processes, one task per process at a time so decoding/ffmpeg use every core
+    without oversubscribing. Because the queue lives in the database, work that was
+    queued or interrupted by a restart is picked up again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._app = None
+        # future -> task id
+        self._inflight = {}
+
+    def init_app(self, app):
+        if app.config['TASK_RUNNER'] != 'local' or _in_worker:
+            return
+
+        # Started by the first request rather than here, so CLI commands
+        # (flask db upgrade, scripts) never begin processing
+        @app.before_request
+        def _ensure_local_task_runner():
+            self.start(app)
+
+    def start(self, app=None):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._app = app or current_app._get_current_object()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='local-task-dispatcher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop dispatching; tasks still running are put back in the queue."""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def enqueue(self, media_id):
+        self.enqueue_many([media_id])
+
+    def enqueue_many(self, media_ids):
+        """Queue processing for several media in one transaction."""
+        db.session.add_all([ProcessingTask(media_id=media_id) for media_id in media_ids])
+        db.session.commit()
+        if current_app.config['TASK_RUNNER'] == 'local':
+            self.start()
+            self._wake.set()
+
+    def claim(self, limit):
+        """
+        Atomically move up to `limit` of the oldest queued tasks to running. Tasks whose
+        media another worker holds (processing lease not yet expired) wait in the queue.
+        """
+        candidates = db.session.execute(
+            db.select(ProcessingTask.id, ProcessingTask.media_id)
+            .outerjoin(Media, Media.id == ProcessingTask.media_id)
+            .where(ProcessingTask.status == 'queued', ~_media_leased())
+            .order_by(ProcessingTask.created_at)
+            .limit(limit)
+        ).all()
+
+        claimed = []
+        for task_id, media_id in candidates:
+            # Another process may have claimed the row since the SELECT
+            result = db.session.execute(
+                db.update(ProcessingTask)
+                .where(ProcessingTask.id == task_id, ProcessingTask.status == 'queued')
+                .values(status='running', attempts=ProcessingTask.attempts + 1, started_at=_utcnow())
+            )
+            if result.rowcount == 1:
+                claimed.append((task_id, media_id))
+        db.session.commit()
+        return claimed
+
+    def complete(self, task_id, error=None, fatal=False):
+        """Delete a finished task, or retry/fail it after an error (`fatal`: no retry)."""
+        task = db.session.get(ProcessingTask, task_id)
+        if task is None:
+            return
+        if error is None:
+            db.session.delete(task)
+        elif not fatal and task.attempts < current_app.config['LOCAL_TASK_MAX_ATTEMPTS']:
+            task.status = 'queued'
+            task.last_error = error
+        else:
+            task.status = 'error'
+            task.last_error = error
+            media = db.session.get(Media, task.media_id)
+            if media:
+                media.status = 'error'
+        db.session.commit()
+
+    def release(self, task_id):
+        """
+        Put a task back in the queue without counting the attempt: its media is held by
+        another worker (e.g. a duplicate queue row). claim() leaves it alone until that
+        lease ends, and the media row is not touched.
+        """
+        db.session.execute(
+            db.update(ProcessingTask)
+            .where(ProcessingTask.id == task_id)
+            .values(status='queued', attempts=ProcessingTask.attempts - 1)
+        )
+        db.session.commit()
+
+    def requeue_stale(self, stale_after):
+        """
+        Requeue running tasks whose process died (e.g. the server was killed). A task
+        whose media is still under a live processing lease is being worked on, however
+        long ago it started.
+        """
+        cutoff = _utcnow() - timedelta(seconds=stale_after)
+        leased = db.select(Media.id).where(Media.processing_lease_until > _utcnow())
+        result = db.session.execute(
+            db.update(ProcessingTask)
+            .where(
+                ProcessingTask.status == 'running',
+                ProcessingTask.started_at < cutoff,
+                ProcessingTask.media_id.not_in(leased)
+            )
+            .values(status='queued')
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def _make_pool(self):
+        config = self._app.config
+        # spawn: forking a multi-threaded web process is unsafe
+        return ProcessPoolExecutor(
+            max_workers=config['LOCAL_TASK_WORKERS'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            max_tasks_per_child=config['LOCAL_TASK_MAX_TASKS_PER_CHILD'],
+        )
+
+    def _on_done(self, future):
+        self._wake.set()
+
+    def _run(self):
+        config = self._app.config
+        last_stale_check = None
+
+        while not self._stopped.is_set():
+            try:
+                with self._app.app_context():
+                    self._reap()
+
+                    now = _utcnow()
+                    if last_stale_check is None or (now - last_stale_check).total_seconds() >= config['LOCAL_TASK_STALE_SEC'] / 4:
+                        self.requeue_stale(config['LOCAL_TASK_STALE_SEC'])
+                        last_stale_check = now
+
+                    free = config['LOCAL_TASK_WORKERS'] - len(self._inflight)
+                    if free > 0:
+                        for task_id, media_id in self.claim(free):
+                            if self._pool is None:
+                                self._pool = self._make_pool()
+                            future = self._pool.submit(run_media_task, str(media_id))
+                            self._inflight[future] = task_id
+                            future.add_done_callback(self._on_done)
+                    db.session.remove()
+            except Exception as e:
+                print(f"Local task dispatcher error: {e}")
+
+            # Woken by enqueue() and finished tasks; polling picks up rows queued by other processes
+            self._wake.wait(config['LOCAL_TASK_POLL_SEC'])
+            self._wake.clear()
+
+        self._release_inflight()
+
+    def _reap(self):
+        for future in [f for f in self._inflight if f.done()]:
+            task_id = self._inflight.pop(future)
+            error = None
+            fatal = False
+            if future.cancelled():
+                error = 'cancelled'
+            elif future.exception() is not None:
+                exc = future.exception()
+                error = ''.join(traceback.format_exception_only(type(exc), exc)).strip()
+                print(f"Local task {task_id} failed: {error}")
+                if isinstance(exc, BrokenProcessPool):
+                    # A worker died (e.g. OOM-killed); the pool can't be reused
+                    self._pool = None
+            elif future.result() == 'error':
+                # Unprocessable file; the media row already carries the reason
+                error, fatal = 'processing failed', True
+            elif future.result() == 'busy':
+                # Claimed by another worker (e.g. a duplicate queue row); check again
+                # once its lease is over
+                self.release(task_id)
+                continue
+            self.complete(task_id, error, fatal)
+
+    def _release_inflight(self):
+        if not self._inflight:
+            return
+        with self._app.app_context():
+            db.session.execute(
+                db.update(ProcessingTask)
+                .where(ProcessingTask.id.in_(list(self._inflight.values())), ProcessingTask.status == 'running')
+                .values(status='queued')
+            )
+            db.session.commit()
+            db.session.remove()
+        self._inflight.clear()
+
+
+local_task_runner = LocalTaskRunner()
@@ -0,0 +1,121 @@
+import math
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+import uuid6
+from .storage_backend import get_storage
+
+# GCS resumable uploads take data in multiples of 256 KiB
+PART_ALIGNMENT = 256 * 1024
+# compose() accepts at most 32 source objects per call
+MAX_PARTS = 32
+# Resumable session URIs are valid for a week
+SESSION_MAX_AGE_SEC = 7 * 24 * 3600
+
+
+class UploadSessionService:
+    """
+    Resumable, chunked direct uploads for large files.
+
+    A file is split into up to 32 parts that the browser uploads in parallel; each
+    part is its own object (uploads/{session}/part-NNNNN) in the storage backend.
+    Where the backend offers resumable uploads (GCS) every part gets its own session
+    URI, so a dropped connection resumes instead of restarting; elsewhere parts are
+    PUT to the app. complete() composes the parts through the backend (server-side
+    on GCS). The session itself is a signed token (no table): the browser keeps it to
+    resume later, and finished parts are found by listing the part prefix.
+    """
+
+    def _serializer(self):
+        return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='upload-session')
+
+    def create_session(self, object_name: str, mime_type: str, size: int, uploader_id) -> dict:
+        if size <= 0 or size > current_app.config['MAX_CONTENT_LENGTH']:
+            raise ValueError("Invalid file size")
+
+        # Parts at least UPLOAD_PART_SIZE and few enough for a single compose()
+        part_size = max(current_app.config['UPLOAD_PART_SIZE'], math.ceil(size / MAX_PARTS))
+        part_size = math.ceil(part_size / PART_ALIGNMENT) * PART_ALIGNMENT
+        parts = math.ceil(size / part_size)
+
+        session = {
+            'id': uuid6.uuid7().hex,
+            'object_name': object_name,
+            'mime_type': mime_type,
+            'size': size,
+            'part_size': part_size,
+            'parts': parts,
+            'uploader_id': str(uploader_id),
+        }
+        return {
+            'token': self._serializer().dumps(session),
+            'object_name': object_name,
+            'part_size': part_size,
+            'parts': parts,
+            'parallelism': current_app.config['UPLOAD_PART_PARALLELISM'],
+            # Parts go straight to storage (POST .../parts/N for a URI) or are PUT to the app
+            'direct_parts': get_storage().resumable_uploads,
+        }
+
+    def load_session(self, token: str, uploader_id) -> dict:
+        try:
+            session = self._serializer().loads(token, max_age=SESSION_MAX_AGE_SEC)
+        except BadSignature:
+            raise ValueError("Invalid or expired upload session")
+        if session['uploader_id'] != str(uploader_id):
+            raise PermissionError("Upload session belongs to another user")
+        return session
+
+    def part_length(self, session: dict, index: int) -> int:
+        if not 0 <= index < session['parts']:
+            raise ValueError("Invalid part number")
+        start = index * session['part_size']
+        return min(session['part_size'], session['size'] - start)
+
+    def _parts_prefix(self, session: dict) -> str:
+        return f"uploads/{session['id']}/"
+
+    def _part_name(self, session: dict, index: int) -> str:
+        return f"{self._parts_prefix(session)}part-{index:05d}"
+
+    def part_upload_url(self, session: dict, index: int, origin: str) -> str:
+        """Resumable upload URI the browser PUTs one part to (backends with `resumable_uploads`)."""
+        length = self.part_length(session, index)
+        return get_storage().resumable_upload_url(self._part_name(session, index), length, origin)
+
+    def store_part(self, session: dict, index: int, stream) -> int:
+        """Store one part from a request body; a part of the wrong length is not kept."""
+        length = self.part_length(session, index)
+        written = 0
+        # writer() stores the part only when the block completes, so it is whole or absent
+        with get_storage().writer(self._part_name(session, index), 'application/octet-stream') as f:
+            for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                written += len(chunk)
+                if written > length:
+                    break
+                f.write(chunk)
+            if written > length:
+                raise ValueError(f"Part {index} is longer than {length} bytes")
+            if written != length:
+                raise ValueError(f"Part {index} is {written} bytes, expected {length}")
+        return written
+
+    def completed_parts(self, session: dict) -> list:
+        sizes = get_storage().sizes(self._parts_prefix(session))
+        return [
+            index for index in range(session['parts'])
+            if sizes.get(self._part_name(session, index)) == self.part_length(session, index)
+        ]
+
+    def assemble(self, session: dict):
+        """Join all parts into session['object_name'] and remove them."""
+        missing = sorted(set(range(session['parts'])) - set(self.completed_parts(session)))
+        if missing:
+            raise ValueError(f"Missing parts: {missing}")
+
+        storage = get_storage()
+        part_names = [self._part_name(session, index) for index in range(session['parts'])]
+        storage.compose(session['object_name'], part_names, session['mime_type'])
+        for name, error in storage.delete_prefix(self._parts_prefix(session)).items():
+            if error is not None:
+                # Left for the bucket's uploads/ lifecycle rule
+                print(f"Failed to delete upload part {name}: {error}")
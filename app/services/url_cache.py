@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SignedUrlCache:
+    """
+    Bounded, thread-safe LRU cache of signed URLs with per-entry expiry.
+
+    Entries are keyed by (object_name, method). A URL is only handed out while it
+    still has at least `min_remaining` seconds of validity left, so a client that
+    receives it can still use it (and cache the response) for a while.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, min_remaining=0, now=None):
+        """Return (url, expires_at) or None if missing or about to expire."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] - now < min_remaining:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, url, expires_at):
+        with self._lock:
+            self._entries[key] = (url, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, object_name):
+        """Drop every cached URL for an object (e.g. after it was deleted or replaced)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == object_name]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+signed_url_cache = SignedUrlCache()
@@ -4,6 +4,8 @@ document.addEventListener('DOMContentLoaded', () => {
     initAutoResizeTextarea();
     initUploadPreview();
     initAjaxUpload();
+    initInfiniteScroll();
+    initVideoPreviews();
 });
 
 /* =========================================
@@ -174,7 +176,6 @@ function initAjaxUpload() {
     form.addEventListener('submit', async (e) => {
         e.preventDefault();
 
-        const formData = new FormData(form);
         const originalBtnText = btn.textContent;
 
         btn.textContent = 'アップロード中...';
@@ -186,7 +187,6 @@ function initAjaxUpload() {
             notification.style.display = 'none';
         }
 
-        const isGCS = form.dataset.storageBackend === 'gcs';
         const fileInput = document.getElementById('file-input');
 
         // Disable UI
@@ -197,87 +197,61 @@ function initAjaxUpload() {
         if (notification) notification.style.display = 'none';
 
         try {
-            if (isGCS) {
-                // --- Direct GCS Upload Flow ---
-                const files = fileInput.files;
-                if (!files || files.length === 0) {
-                    throw new Error("ファイルが選択されていません");
-                }
-
-                // Gather comments if possible. Since we have multiple comments inputs in preview,
-                // we need to map them to files. 
-                // Note: The preview logic generates independent textareas.
-                // We assume the order of files in fileInput matches the DOM order in previewContainer?
-                // initUploadPreview syncs fileInput.files from DataTransfer.
-                // We need to grab comments.
-
-                const commentInputs = document.querySelectorAll('#file-preview-container textarea[name="comments"]');
-                const comments = Array.from(commentInputs).map(input => input.value);
+            const files = Array.from(fileInput.files || []);
+            if (files.length === 0) {
+                throw new Error("ファイルが選択されていません");
+            }
 
-                let successCount = 0;
+            // Comments are the textareas generated by initUploadPreview, in file order
+            const commentInputs = document.querySelectorAll('#file-preview-container textarea[name="comments"]');
+            const comments = Array.from(commentInputs).map(input => input.value);
+
+            // Files larger than one part go through resumable, parallel part uploads
+            const resumableThreshold = parseInt(form.dataset.resumableThreshold || '0', 10);
+            const isLarge = (file) => resumableThreshold > 0 && file.size > resumableThreshold;
+
+            // --- Direct Upload Flow (sign -> PUT -> finalize; GCS or signed local URL) ---
+            // Files go through a small pool of concurrent uploads; failures are collected
+            // so one bad file doesn't stop the others
+            const workers = Math.max(1, Math.min(parseInt(form.dataset.uploadWorkers || '4', 10), files.length));
+            const progress = files.map(() => 0);
+            const failures = [];
+            let next = 0;
+            let finished = 0;
+
+            const showProgress = () => {
+                const total = files.reduce((sum, file) => sum + file.size, 0) || 1;
+                const sent = files.reduce((sum, file, i) => sum + file.size * progress[i], 0);
+                btn.textContent = `アップロード中 (${finished}/${files.length}) ${Math.floor(sent / total * 100)}%`;
+            };
 
-                for (let i = 0; i < files.length; i++) {
+            const worker = async () => {
+                while (next < files.length) {
+                    const i = next++;
                     const file = files[i];
                     const comment = comments[i] || '';
-
-                    // 1. Get Signed URL
-                    btn.textContent = `アップロード中 (${i + 1}/${files.length})...`; // Update progress text
-
-                    const signRes = await fetch('/media/upload/sign', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({
-                            filename: file.name,
-                            mime_type: file.type
-                        })
-                    });
-
-                    if (!signRes.ok) throw new Error('署名URLの取得に失敗しました');
-                    const signData = await signRes.json();
-
-                    // 2. Upload to GCS
-                    // Note: 'Content-Type' header MUST match what was signed
-                    const uploadRes = await fetch(signData.url, {
-                        method: 'PUT',
-                        headers: {
-                            'Content-Type': file.type
-                        },
-                        body: file
-                    });
-
-                    if (!uploadRes.ok) throw new Error('GCSへのアップロードに失敗しました');
-
-                    // 3. Finalize
-                    const finRes = await fetch('/media/upload/finalize', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({
-                            object_name: signData.object_name,
-                            original_filename: file.name,
-                            mime_type: file.type,
-                            file_size: file.size,
-                            description: comment
-                        })
-                    });
-
-                    if (!finRes.ok) throw new Error('保存処理に失敗しました');
-                    successCount++;
+                    try {
+                        if (isLarge(file)) {
+                            await uploadResumable(file, comment, (done, total) => {
+                                progress[i] = done / total;
+                                showProgress();
+                            });
+                        } else {
+                            await uploadDirect(file, comment);
+                        }
+                    } catch (error) {
+                        failures.push(`${file.name}: ${error.message}`);
+                    }
+                    progress[i] = 1;
+                    finished++;
+                    showProgress();
                 }
+            };
+            showProgress();
+            await Promise.all(Array.from({ length: workers }, worker));
 
-            } else {
-                // --- Legacy Local Upload Flow ---
-                // Need to construct FormData correctly with comments
-                // The original form submit includes 'file' (multiple) and 'comments' (multiple)
-                // But since we manipulated fileInput via DataTransfer, we should be fine trusting formData?
-                // Actually, textareas are outside the form? No, they are appended to wrapper in previewContainer which is inside form.
-                // So FormData(form) should capture them.
-
-                const response = await fetch(form.action, {
-                    method: 'POST',
-                    body: formData
-                });
-                const result = await response.json();
-                if (!response.ok) throw new Error(result.error || 'Upload failed');
+            if (failures.length > 0) {
+                throw new Error(`${failures.length}/${files.length} 件のアップロードに失敗しました (${failures.join(', ')})`);
             }
 
             // --- Success Handling (Common) ---
@@ -329,6 +303,212 @@ function initAjaxUpload() {
 }
 
 
+// Upload one file: signed URL, PUT to storage, then finalize
+async function uploadDirect(file, comment) {
+    // 1. Get Signed URL
+    const signRes = await fetch('/media/upload/sign', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            filename: file.name,
+            mime_type: file.type
+        })
+    });
+
+    if (!signRes.ok) throw new Error('署名URLの取得に失敗しました');
+    const signData = await signRes.json();
+
+    // 2. Upload to storage (checksum computed meanwhile for finalize)
+    // Note: 'Content-Type' header MUST match what was signed
+    const crcPromise = crc32cBase64(file);
+    const uploadRes = await fetch(signData.url, {
+        method: 'PUT',
+        headers: {
+            'Content-Type': file.type
+        },
+        body: file
+    });
+
+    if (!uploadRes.ok) throw new Error('アップロードに失敗しました');
+
+    // 3. Finalize (the server checks size and checksum of the stored object)
+    const finRes = await fetch('/media/upload/finalize', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            object_name: signData.object_name,
+            original_filename: file.name,
+            mime_type: file.type,
+            file_size: file.size,
+            description: comment,
+            crc32c: await crcPromise
+        })
+    });
+
+    if (!finRes.ok) throw new Error('保存処理に失敗しました');
+    return finRes.json();
+}
+
+/* =========================================
+   Resumable Chunked Upload (large files)
+   ========================================= */
+const CRC32C_TABLE = (() => {
+    const table = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+        let c = n;
+        for (let k = 0; k < 8; k++) {
+            c = (c & 1) ? (0x82F63B78 ^ (c >>> 1)) : (c >>> 1);
+        }
+        table[n] = c >>> 0;
+    }
+    return table;
+})();
+
+// CRC32C of a file as base64 of the big-endian value (the format GCS reports)
+async function crc32cBase64(file, sliceSize = 8 * 1024 * 1024) {
+    let crc = 0xFFFFFFFF;
+    for (let offset = 0; offset < file.size; offset += sliceSize) {
+        const bytes = new Uint8Array(await file.slice(offset, offset + sliceSize).arrayBuffer());
+        for (let i = 0; i < bytes.length; i++) {
+            crc = CRC32C_TABLE[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+        }
+    }
+    crc = (crc ^ 0xFFFFFFFF) >>> 0;
+    return btoa(String.fromCharCode(crc >>> 24, (crc >>> 16) & 0xFF, (crc >>> 8) & 0xFF, crc & 0xFF));
+}
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// PUT one part to a GCS resumable session URI; after a failure ask GCS how many
+// bytes it has and continue from there instead of resending the whole part
+async function putResumablePart(url, blob, maxAttempts = 5) {
+    const total = blob.size;
+    let offset = 0;
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const res = await fetch(url, {
+                method: 'PUT',
+                headers: { 'Content-Range': `bytes ${offset}-${total - 1}/${total}` },
+                body: blob.slice(offset)
+            });
+            if (res.ok) return;
+            if (res.status !== 308 && res.status < 500) {
+                throw new Error(`パートのアップロードに失敗しました (${res.status})`);
+            }
+        } catch (e) {
+            if (attempt >= maxAttempts) throw e;
+        }
+        if (attempt >= maxAttempts) throw new Error('パートのアップロードに失敗しました');
+        await sleep(500 * 2 ** attempt);
+
+        try {
+            const status = await fetch(url, { method: 'PUT', headers: { 'Content-Range': `bytes */${total}` } });
+            if (status.ok) return;
+            // 308 with "Range: bytes=0-N" when N+1 bytes were persisted
+            const range = status.headers.get('Range');
+            offset = range ? parseInt(range.split('-')[1], 10) + 1 : 0;
+        } catch (e) {
+            // Still offline; GCS ignores bytes it already has, so resending from the start is safe
+            offset = 0;
+        }
+    }
+}
+
+async function putLocalPart(url, blob, maxAttempts = 3) {
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const res = await fetch(url, { method: 'PUT', body: blob });
+            if (res.ok) return;
+            if (res.status < 500) throw new Error(`パートのアップロードに失敗しました (${res.status})`);
+        } catch (e) {
+            if (attempt >= maxAttempts) throw e;
+        }
+        if (attempt >= maxAttempts) throw new Error('パートのアップロードに失敗しました');
+        await sleep(500 * 2 ** attempt);
+    }
+}
+
+// Upload a large file in parallel parts. The session token is kept in localStorage,
+// so after a reload or a dropped connection only the missing parts are sent again.
+async function uploadResumable(file, comment, onProgress) {
+    const storageKey = `upload-session:${file.name}:${file.size}:${file.lastModified}`;
+    let session = null;
+    let completed = [];
+
+    const savedToken = localStorage.getItem(storageKey);
+    if (savedToken) {
+        const res = await fetch(`/media/upload/sessions/${savedToken}`);
+        if (res.ok) {
+            session = await res.json();
+            session.token = savedToken;
+            completed = session.completed_parts;
+        } else {
+            localStorage.removeItem(storageKey);
+        }
+    }
+
+    if (!session) {
+        const res = await fetch('/media/upload/sessions', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, mime_type: file.type, size: file.size })
+        });
+        if (!res.ok) throw new Error('アップロードの開始に失敗しました');
+        session = await res.json();
+        localStorage.setItem(storageKey, session.token);
+    }
+
+    // Checksum runs alongside the part uploads
+    const crcPromise = crc32cBase64(file);
+
+    const partsUrl = `/media/upload/sessions/${session.token}/parts`;
+    const pending = [];
+    for (let i = 0; i < session.parts; i++) {
+        if (!completed.includes(i)) pending.push(i);
+    }
+    let done = session.parts - pending.length;
+    if (onProgress) onProgress(done, session.parts);
+
+    const worker = async () => {
+        while (pending.length > 0) {
+            const index = pending.shift();
+            const start = index * session.part_size;
+            const blob = file.slice(start, Math.min(start + session.part_size, file.size));
+
+            if (session.direct_parts) {
+                const res = await fetch(`${partsUrl}/${index}`, { method: 'POST' });
+                if (!res.ok) throw new Error('アップロードURLの取得に失敗しました');
+                const part = await res.json();
+                await putResumablePart(part.url, blob);
+            } else {
+                await putLocalPart(`${partsUrl}/${index}`, blob);
+            }
+
+            done++;
+            if (onProgress) onProgress(done, session.parts);
+        }
+    };
+    const parallelism = Math.max(1, Math.min(session.parallelism || 4, pending.length));
+    await Promise.all(Array.from({ length: parallelism }, worker));
+
+    const res = await fetch(`/media/upload/sessions/${session.token}/complete`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            original_filename: file.name,
+            description: comment,
+            crc32c: await crcPromise
+        })
+    });
+    // /complete consumes the parts; after a failed verification the file is uploaded afresh
+    localStorage.removeItem(storageKey);
+    if (!res.ok) {
+        const result = await res.json().catch(() => ({}));
+        throw new Error(result.error || '保存処理に失敗しました');
+    }
+    return res.json();
+}
+
 /* =========================================
    Lightbox Logic
    ========================================= */
@@ -343,16 +523,23 @@ function initLightbox() {
     let currentIndex = -1;
     let mediaItems = [];
 
-    // Collect all media items from the grid
-    const triggers = document.querySelectorAll('.media-trigger');
-    mediaItems = Array.from(triggers).map(trigger => ({
-        type: trigger.dataset.type,
-        src: trigger.dataset.src,
-        id: trigger.closest('.grid-item').dataset.id,
-        description: trigger.dataset.description,
-        uploader: trigger.dataset.uploader,
-        date: trigger.dataset.date
-    }));
+    // Collect all media items from the grid (re-run when the feed appends more tiles)
+    const collectMediaItems = () => {
+        const triggers = document.querySelectorAll('.media-trigger');
+        mediaItems = Array.from(triggers).map(trigger => ({
+            type: trigger.dataset.type,
+            src: trigger.dataset.src,
+            srcset: trigger.dataset.srcset,
+            mobileSrc: trigger.dataset.mobileSrc,
+            hlsSrc: trigger.dataset.hlsSrc,
+            id: trigger.closest('.grid-item').dataset.id,
+            description: trigger.dataset.description,
+            uploader: trigger.dataset.uploader,
+            date: trigger.dataset.date
+        }));
+    };
+    collectMediaItems();
+    window.refreshLightboxItems = collectMediaItems;
 
     // Open Lightbox
     window.openLightbox = (index) => {
@@ -363,6 +550,12 @@ function initLightbox() {
         document.body.style.overflow = 'hidden'; // Prevent scrolling
     };
 
+    // Open Lightbox from a grid tile (index is resolved from DOM order)
+    window.openLightboxFor = (trigger) => {
+        const triggers = Array.from(document.querySelectorAll('.media-trigger'));
+        openLightbox(triggers.indexOf(trigger));
+    };
+
     // Close Lightbox
     const closeLightbox = () => {
         lightbox.classList.remove('active');
@@ -407,12 +600,20 @@ function initLightbox() {
         if (item.type === 'video') {
             lightboxImg.style.display = 'none';
             lightboxVideo.style.display = 'block';
-            lightboxVideo.src = item.src;
+            // Smaller MP4 rendition on phones and data-saver connections
+            const preferMobile = window.matchMedia('(max-width: 768px)').matches
+                || (navigator.connection && navigator.connection.saveData);
+            // Adaptive HLS where the browser plays it natively (Safari, iOS, recent Android)
+            const playsHls = item.hlsSrc && lightboxVideo.canPlayType('application/vnd.apple.mpegurl');
+            lightboxVideo.src = playsHls ? item.hlsSrc : ((preferMobile && item.mobileSrc) || item.src);
             // lightboxVideo.play(); // Optional: Autoplay
         } else {
             lightboxVideo.style.display = 'none';
             lightboxVideo.pause();
             lightboxImg.style.display = 'block';
+            // srcset first so the browser doesn't start fetching the full-size src
+            lightboxImg.sizes = '90vw';
+            lightboxImg.srcset = item.srcset || '';
             lightboxImg.src = item.src;
         }
 
@@ -448,6 +649,134 @@ function initLightbox() {
     }
 }
 
+/* =========================================
+   Infinite Scroll (Cursor Feed)
+   ========================================= */
+function initInfiniteScroll() {
+    const sentinel = document.getElementById('scroll-sentinel');
+    const grid = document.querySelector('.masonry-grid');
+
+    if (!sentinel || !grid || !sentinel.dataset.feedUrl) return;
+
+    let nextCursor = sentinel.dataset.nextCursor;
+    let loading = false;
+
+    const loadMore = async () => {
+        if (loading || !nextCursor) return;
+        loading = true;
+        sentinel.textContent = '読み込み中...';
+
+        try {
+            const url = new URL(sentinel.dataset.feedUrl, window.location.origin);
+            url.searchParams.set('cursor', nextCursor);
+
+            const res = await fetch(url);
+            if (!res.ok) throw new Error('Feed request failed');
+            const data = await res.json();
+
+            grid.insertAdjacentHTML('beforeend', data.html);
+            nextCursor = data.next_cursor;
+            if (window.refreshLightboxItems) window.refreshLightboxItems();
+            sentinel.textContent = '';
+        } catch (err) {
+            console.error(err);
+            sentinel.textContent = '';
+        } finally {
+            loading = false;
+        }
+
+        if (!nextCursor) observer.disconnect();
+    };
+
+    const observer = new IntersectionObserver((entries) => {
+        if (entries.some(entry => entry.isIntersecting)) loadMore();
+    }, { rootMargin: '600px' });
+
+    if (nextCursor) observer.observe(sentinel);
+}
+
+/* =========================================
+   Video Hover Previews
+   ========================================= */
+function initVideoPreviews() {
+    // Mouse only; on touch devices a tap opens the lightbox
+    if (!window.matchMedia('(hover: hover)').matches) return;
+
+    const wrapperFor = (el) => el && el.closest && el.closest('.media-wrapper[data-preview-src], .media-wrapper[data-sprite-src]');
+    // One preview at a time: the sprite while the pointer moves, the clip once it rests
+    const REST_MS = 400;
+
+    // Short muted clip while the pointer rests on the tile
+    const playClip = (wrapper) => {
+        const sprite = wrapper.querySelector('.video-sprite');
+        if (sprite) sprite.hidden = true;
+        if (!wrapper.dataset.previewSrc) return;
+        let video = wrapper.querySelector('.video-preview');
+        if (!video) {
+            video = document.createElement('video');
+            video.className = 'video-preview';
+            video.muted = true;
+            video.loop = true;
+            video.playsInline = true;
+            video.src = wrapper.dataset.previewSrc;
+            wrapper.appendChild(video);
+        }
+        video.hidden = false;
+        video.play().catch(() => {});
+    };
+
+    const playWhenResting = (wrapper) => {
+        clearTimeout(wrapper.previewTimer);
+        wrapper.previewTimer = setTimeout(() => playClip(wrapper), REST_MS);
+    };
+
+    // Moving across the tile shows the sprite frame under the pointer (the clip pauses)
+    const scrub = (wrapper, e) => {
+        playWhenResting(wrapper);
+        if (!wrapper.dataset.spriteSrc) return;
+        const video = wrapper.querySelector('.video-preview');
+        if (video) {
+            video.pause();
+            video.hidden = true;
+        }
+        let sprite = wrapper.querySelector('.video-sprite');
+        if (!sprite) {
+            sprite = document.createElement('div');
+            sprite.className = 'video-sprite';
+            sprite.style.backgroundImage = `url("${wrapper.dataset.spriteSrc}")`;
+            wrapper.appendChild(sprite);
+        }
+        sprite.hidden = false;
+        const frames = Number(wrapper.dataset.spriteFrames);
+        const columns = Number(wrapper.dataset.spriteColumns);
+        const rows = Math.ceil(frames / columns);
+        const rect = wrapper.getBoundingClientRect();
+        const frame = Math.min(frames - 1, Math.max(0, Math.floor((e.clientX - rect.left) / rect.width * frames)));
+        const x = columns > 1 ? (frame % columns) / (columns - 1) * 100 : 0;
+        const y = rows > 1 ? Math.floor(frame / columns) / (rows - 1) * 100 : 0;
+        sprite.style.backgroundSize = `${columns * 100}% ${rows * 100}%`;
+        sprite.style.backgroundPosition = `${x}% ${y}%`;
+    };
+
+    const stop = (wrapper) => {
+        clearTimeout(wrapper.previewTimer);
+        wrapper.querySelectorAll('.video-preview, .video-sprite').forEach(el => el.remove());
+    };
+
+    document.addEventListener('mouseover', (e) => {
+        const wrapper = wrapperFor(e.target);
+        if (wrapper && !wrapper.contains(e.relatedTarget)) playWhenResting(wrapper);
+    });
+    document.addEventListener('mousemove', (e) => {
+        const wrapper = wrapperFor(e.target);
+        if (wrapper) scrub(wrapper, e);
+    });
+    document.addEventListener('mouseout', (e) => {
+        const wrapper = wrapperFor(e.target);
+        if (wrapper && !wrapper.contains(e.relatedTarget)) stop(wrapper);
+    });
+}
+
 /* =========================================
    Menu Dropdown Logic
    ========================================= */
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+import dateutil.parser
+
+# Family members are in Japan: naive capture times (EXIF without an offset, the edit form)
+# are interpreted as JST and everything is displayed in JST.
+JST = timezone(timedelta(hours=9), 'JST')
+
+
+def to_utc(value: datetime, assume_tz=JST) -> datetime:
+    """Return an aware UTC datetime; naive values are taken to be in `assume_tz`."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=assume_tz)
+    return value.astimezone(timezone.utc)
+
+
+def to_jst(value: datetime) -> datetime:
+    """Convert a stored timestamp to JST for display; naive values are UTC (as stored by SQLite)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(JST)
+
+
+def parse_exif_datetime(value, offset=None):
+    """
+    Parse an EXIF date ("2023:12:23 15:00:00") with an optional OffsetTime* tag
+    ("+09:00") into an aware UTC datetime. Returns None for blank/invalid values
+    such as the "0000:00:00 00:00:00" some cameras write.
+    """
+    if isinstance(value, bytes):
+        value = value.decode(errors='ignore')
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value.strip('\x00 ')[:19], '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+
+    tz = JST
+    if isinstance(offset, bytes):
+        offset = offset.decode(errors='ignore')
+    if offset:
+        try:
+            tz = datetime.strptime(offset.strip('\x00 '), '%z').tzinfo
+        except ValueError:
+            pass
+    return to_utc(parsed, tz)
+
+
+def parse_taken_at(value):
+    """
+    Parse a capture time given as text: the legacy taken_at strings
+    ("2023-12-23T15:00:00", sometimes with an offset), datetime-local form values
+    ("2023-12-23T15:00") or anything dateutil understands.
+    Returns an aware UTC datetime, or None for blank/unparseable input.
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return to_utc(value)
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = dateutil.parser.parse(value)
+        except (ValueError, OverflowError):
+            return None
+    return to_utc(parsed)
@@ -0,0 +1,52 @@
+import mimetypes
+import os
+from urllib.parse import quote
+from flask import current_app, abort, send_file
+from werkzeug.security import safe_join
+
+# HLS segments; the platform table often maps .ts to TypeScript/Qt Linguist
+mimetypes.add_type('video/mp2t', '.ts')
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+
+# Folders of derived objects, written once under names that are never reused
+WRITE_ONCE_FOLDERS = ('renditions', 'thumbs', 'hls', 'avatars')
+
+
+def send_local_file(filename):
+    """
+    Serve an object from UPLOAD_FOLDER (STORAGE_BACKEND=local).
+
+    Derived objects (renditions, thumbs, HLS, avatars) never change once written, so
+    they get a long-lived immutable Cache-Control. Originals are rewritten in place by
+    processing (a .jpg or .mp4 keeps its name), so they are revalidated every time
+    (no-cache). send_file answers If-None-Match/If-Modified-Since with 304 and Range
+    with 206 using a strong ETag. When a front proxy is configured the transfer is
+    offloaded to it: nginx via X-Accel-Redirect (LOCAL_FILE_ACCEL_PREFIX) or
+    Apache/lighttpd via X-Sendfile (USE_X_SENDFILE).
+    """
+    config = current_app.config
+    path = safe_join(config['UPLOAD_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    max_age = config['MEDIA_CACHE_MAX_AGE']
+    accel_prefix = config.get('LOCAL_FILE_ACCEL_PREFIX')
+
+    if accel_prefix:
+        # nginx serves the body (sendfile, Range, conditional requests) from its internal location
+        response = current_app.response_class()
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(filename)
+        response.headers['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        response = send_file(path, conditional=True, etag=True, max_age=max_age)
+
+    # Login is required, so only the user's browser may cache it
+    if _is_write_once(filename):
+        response.headers['Cache-Control'] = f'private, max-age={max_age}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _is_write_once(filename):
+    return any(folder in WRITE_ONCE_FOLDERS for folder in filename.split('/')[:-1])
@@ -1,5 +1,8 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 import dateutil.parser
+from flask import url_for
+from jinja2 import pass_context
+from app.utils.dates import JST, parse_taken_at, to_jst
 
 def format_datetime(value, format="%Y/%m/%d %H:%M"):
     if not value:
@@ -20,24 +23,15 @@ def friendly_date(value):
         return ""
     
     if isinstance(value, str):
-        try:
-            date_obj = dateutil.parser.parse(value)
-        except:
+        # Legacy string values; taken_at/created_at are datetimes
+        date_obj = parse_taken_at(value)
+        if date_obj is None:
             return value
     else:
         date_obj = value
-    
-    # Convert to JST if naive (assume UTC) or convert timezone
-    if date_obj.tzinfo is None:
-         # Assume UTC, make it JST
-         date_obj = date_obj + timedelta(hours=9)
-    else:
-         # Convert to JST (UTC+9)
-         target_tz = datetime.timezone(timedelta(hours=9))
-         date_obj = date_obj.astimezone(target_tz)
 
-    # Get current time in JST
-    now = datetime.utcnow() + timedelta(hours=9)
+    date_obj = to_jst(date_obj)
+    now = datetime.now(JST)
     diff = now.date() - date_obj.date()
     
     if diff.days == 0:
@@ -47,3 +41,13 @@ def friendly_date(value):
     else:
         # Always show year as requested
         return date_obj.strftime("%Y年%-m月%-d日")
+
+
+@pass_context
+def media_url(context, filename, endpoint='media.serve_file'):
+    """
+    URL for a stored object. Uses the pre-signed direct URL when the view passed
+    one in `signed_urls`, otherwise the (redirecting) serving route.
+    """
+    signed_urls = context.get('signed_urls') or {}
+    return signed_urls.get(filename) or url_for(endpoint, filename=filename)
@@ -0,0 +1,78 @@
+import base64
+import hashlib
+import math
+from PIL import Image
+import google_crc32c
+
+CHUNK_SIZE = 1024 * 1024
+
+# pHash: DCT of a 32x32 grayscale thumbnail, low 8x8 frequencies compared to their median
+PHASH_SIZE = 32
+PHASH_LOW_FREQ = 8
+_DCT_COS = [
+    [math.cos(math.pi * u * (2 * x + 1) / (2 * PHASH_SIZE)) for x in range(PHASH_SIZE)]
+    for u in range(PHASH_LOW_FREQ)
+]
+# dHash: sign of the horizontal gradient on a 9x8 grayscale thumbnail
+DHASH_SIZE = 8
+
+
+def sha256_stream(stream) -> str:
+    """Hex SHA-256 of everything readable from a binary stream, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def crc32c_b64(checksum: google_crc32c.Checksum) -> str:
+    """Base64 of the big-endian CRC32C, the format GCS reports in blob.crc32c."""
+    return base64.b64encode(checksum.digest()).decode()
+
+
+def file_crc32c(path) -> str:
+    checksum = google_crc32c.Checksum()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            checksum.update(chunk)
+    return crc32c_b64(checksum)
+
+
+def phash(img: Image.Image) -> str:
+    """
+    64-bit perceptual hash as 16 hex digits. Unlike the content hash it survives
+    re-encoding, resizing and small edits: near-identical pictures differ in only a
+    few bits (Hamming distance).
+    """
+    small = img.convert('L').resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(small.tobytes())
+    rows = [pixels[y * PHASH_SIZE:(y + 1) * PHASH_SIZE] for y in range(PHASH_SIZE)]
+
+    # Separable 2D DCT-II, computing only the low frequencies that are kept
+    row_dct = [[sum(c * p for c, p in zip(cos_u, row)) for cos_u in _DCT_COS] for row in rows]
+    coefficients = [
+        sum(cos_v[y] * row_dct[y][u] for y in range(PHASH_SIZE))
+        for cos_v in _DCT_COS
+        for u in range(PHASH_LOW_FREQ)
+    ]
+
+    median = sorted(coefficients)[len(coefficients) // 2]
+    bits = 0
+    for value in coefficients:
+        bits = (bits << 1) | (value > median)
+    return f"{bits:016x}"
+
+
+def dhash(img: Image.Image) -> str:
+    """
+    64-bit difference hash as 16 hex digits. Cheaper and coarser than pHash; used
+    alongside it to rank near-duplicates.
+    """
+    small = img.convert('L').resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for y in range(DHASH_SIZE):
+        row = pixels[y * (DHASH_SIZE + 1):(y + 1) * (DHASH_SIZE + 1)]
+        for x in range(DHASH_SIZE):
+            bits = (bits << 1) | (row[x + 1] > row[x])
+    return f"{bits:016x}"
@@ -0,0 +1,34 @@
+"""Store video duration as float and record the uploaded video codec
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9c0d1e2f3a4'
+down_revision = 'a8b9c0d1e2f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('video_codec', sa.String(length=32), nullable=True))
+        batch_op.alter_column('duration_sec',
+               existing_type=sa.Integer(),
+               type_=sa.Float(),
+               existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.alter_column('duration_sec',
+               existing_type=sa.Float(),
+               type_=sa.Integer(),
+               existing_nullable=True)
+        batch_op.drop_column('video_codec')
@@ -0,0 +1,30 @@
+"""Add media processing lease, attempt count and last error
+
+Revision ID: c0d1e2f3a4b5
+Revises: b9c0d1e2f3a4
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c0d1e2f3a4b5'
+down_revision = 'b9c0d1e2f3a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('processing_lease_until', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('processing_attempts', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('processing_error', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.drop_column('processing_error')
+        batch_op.drop_column('processing_attempts')
+        batch_op.drop_column('processing_lease_until')
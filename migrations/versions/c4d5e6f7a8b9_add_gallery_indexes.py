@@ -0,0 +1,65 @@
+"""Add media_kind and composite indexes for gallery filters/sorts
+
+Revision ID: c4d5e6f7a8b9
+Revises: b3c4d5e6f7a8
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d5e6f7a8b9'
+down_revision = 'b3c4d5e6f7a8'
+branch_labels = None
+depends_on = None
+
+
+# (name, columns, postgresql only)
+MEDIA_INDEXES = [
+    ('ix_media_created_at', ['created_at', 'id'], False),
+    ('ix_media_taken_at', ['taken_at', 'created_at', 'id'], False),
+    ('ix_media_taken_at_desc', [sa.text('taken_at DESC NULLS LAST'), sa.text('created_at DESC'), sa.text('id DESC')], True),
+    ('ix_media_kind_created_at', ['media_kind', 'created_at', 'id'], False),
+    ('ix_media_kind_taken_at', ['media_kind', 'taken_at', 'created_at', 'id'], False),
+    ('ix_media_kind_taken_at_desc', ['media_kind', sa.text('taken_at DESC NULLS LAST'), sa.text('created_at DESC'), sa.text('id DESC')], True),
+    ('ix_media_uploader_created_at', ['uploader_id', 'created_at', 'id'], False),
+    ('ix_media_uploader_taken_at', ['uploader_id', 'taken_at', 'created_at', 'id'], False),
+    ('ix_media_uploader_taken_at_desc', ['uploader_id', sa.text('taken_at DESC NULLS LAST'), sa.text('created_at DESC'), sa.text('id DESC')], True),
+]
+
+
+def upgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('media_kind', sa.String(length=10), nullable=True))
+
+    op.execute(
+        "UPDATE media SET media_kind = CASE "
+        "WHEN mime_type LIKE 'image%' THEN 'image' "
+        "WHEN mime_type LIKE 'video%' THEN 'video' "
+        "ELSE 'other' END"
+    )
+
+    for name, columns, postgres_only in MEDIA_INDEXES:
+        if postgres_only and not is_postgres:
+            continue
+        op.create_index(name, 'media', columns, unique=False)
+
+    op.create_index('ix_media_favorites_user_id_media_id', 'media_favorites', ['user_id', 'media_id'], unique=False)
+
+
+def downgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+
+    op.drop_index('ix_media_favorites_user_id_media_id', table_name='media_favorites')
+
+    for name, _, postgres_only in reversed(MEDIA_INDEXES):
+        if postgres_only and not is_postgres:
+            continue
+        op.drop_index(name, table_name='media')
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.drop_column('media_kind')
@@ -0,0 +1,97 @@
+"""Store media.taken_at as a timezone-aware timestamp
+
+The old free-form string column is kept as taken_at_legacy and converted in chunks
+by scripts/backfill_taken_at.py after this migration (the app keeps working while
+it runs; rows show no capture date until converted).
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from datetime import timedelta, timezone
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e6f7a8b9c0'
+down_revision = 'c4d5e6f7a8b9'
+branch_labels = None
+depends_on = None
+
+
+# Indexes from c4d5e6f7a8b9 that include taken_at: (name, columns, postgresql only)
+TAKEN_AT_INDEXES = [
+    ('ix_media_taken_at', ['taken_at', 'created_at', 'id'], False),
+    ('ix_media_taken_at_desc', [sa.text('taken_at DESC NULLS LAST'), sa.text('created_at DESC'), sa.text('id DESC')], True),
+    ('ix_media_kind_taken_at', ['media_kind', 'taken_at', 'created_at', 'id'], False),
+    ('ix_media_kind_taken_at_desc', ['media_kind', sa.text('taken_at DESC NULLS LAST'), sa.text('created_at DESC'), sa.text('id DESC')], True),
+    ('ix_media_uploader_taken_at', ['uploader_id', 'taken_at', 'created_at', 'id'], False),
+    ('ix_media_uploader_taken_at_desc', ['uploader_id', sa.text('taken_at DESC NULLS LAST'), sa.text('created_at DESC'), sa.text('id DESC')], True),
+]
+
+JST = timezone(timedelta(hours=9))
+
+
+def _drop_taken_at_indexes(is_postgres):
+    for name, _, postgres_only in reversed(TAKEN_AT_INDEXES):
+        if postgres_only and not is_postgres:
+            continue
+        op.drop_index(name, table_name='media')
+
+
+def _create_taken_at_indexes(is_postgres):
+    for name, columns, postgres_only in TAKEN_AT_INDEXES:
+        if postgres_only and not is_postgres:
+            continue
+        op.create_index(name, 'media', columns, unique=False)
+
+
+def upgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+
+    _drop_taken_at_indexes(is_postgres)
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.alter_column('taken_at', new_column_name='taken_at_legacy',
+                              existing_type=sa.String(length=50), existing_nullable=True)
+
+    # Separate batch: SQLite can't rename and re-add the same name in one table rebuild
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('taken_at', sa.DateTime(timezone=True), nullable=True))
+
+    _create_taken_at_indexes(is_postgres)
+
+
+def downgrade():
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+
+    # Write converted timestamps back as the old local-time ISO strings
+    media = sa.table('media',
+                     sa.column('id', sa.Uuid()),
+                     sa.column('taken_at', sa.DateTime(timezone=True)),
+                     sa.column('taken_at_legacy', sa.String(50)))
+    rows = bind.execute(
+        sa.select(media.c.id, media.c.taken_at).where(media.c.taken_at.is_not(None))
+    ).all()
+    for media_id, taken_at in rows:
+        if taken_at.tzinfo is None:
+            taken_at = taken_at.replace(tzinfo=timezone.utc)
+        bind.execute(
+            media.update().where(media.c.id == media_id).values(
+                taken_at_legacy=taken_at.astimezone(JST).strftime('%Y-%m-%dT%H:%M:%S')
+            )
+        )
+
+    _drop_taken_at_indexes(is_postgres)
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.drop_column('taken_at')
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.alter_column('taken_at_legacy', new_column_name='taken_at',
+                              existing_type=sa.String(length=50), existing_nullable=True)
+
+    _create_taken_at_indexes(is_postgres)
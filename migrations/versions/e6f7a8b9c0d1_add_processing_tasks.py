@@ -0,0 +1,42 @@
+"""Add processing_tasks queue for TASK_RUNNER=local
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f7a8b9c0d1'
+down_revision = 'd5e6f7a8b9c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('processing_tasks',
+    sa.Column('media_id', sa.Uuid(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['media_id'], ['media.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('processing_tasks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_processing_tasks_media_id'), ['media_id'], unique=False)
+        batch_op.create_index('ix_processing_tasks_status_created_at', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('processing_tasks', schema=None) as batch_op:
+        batch_op.drop_index('ix_processing_tasks_status_created_at')
+        batch_op.drop_index(batch_op.f('ix_processing_tasks_media_id'))
+
+    op.drop_table('processing_tasks')
@@ -0,0 +1,52 @@
+"""
+Convert legacy media.taken_at strings to the typed timestamp column.
+
+Run once after migration d5e6f7a8b9c0:
+    python scripts/backfill_taken_at.py [--batch-size 500] [--sleep 0.1]
+
+Work is committed per chunk and converted rows leave taken_at_legacy, so the script
+can be stopped at any time and re-run to continue. Strings that cannot be parsed
+are reported and kept in taken_at_legacy for manual review.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services import MediaService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=500)
+    # Pause between chunks to keep load on the primary low
+    parser.add_argument('--sleep', type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_app()
+    svc = MediaService()
+    converted = unparseable = 0
+
+    with app.app_context():
+        last_id = None
+        while True:
+            last_id, chunk_converted, chunk_unparseable = svc.backfill_taken_at_chunk(last_id, args.batch_size)
+            if last_id is None:
+                break
+            converted += chunk_converted
+            unparseable += chunk_unparseable
+            print(f"... {converted:,} converted, {unparseable:,} unparseable (up to {last_id})")
+            if args.sleep:
+                time.sleep(args.sleep)
+
+    print(f"✅ Backfill finished: {converted:,} converted")
+    if unparseable:
+        print(f"⚠️ {unparseable:,} value(s) could not be parsed and were left in taken_at_legacy")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Gallery query plan benchmark (PostgreSQL).
+
+Seeds a scratch schema with BENCH_ROWS media rows (default 500,000), then runs
+EXPLAIN (ANALYZE, BUFFERS) on the grid query for every filter x sort combination,
+for the first page and for a deep keyset page. A combination passes when its plan
+reads media through an index in sort order (no Sort node and no Seq Scan on media),
+so page cost stays flat regardless of library size.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/benchmark_gallery_indexes.py
+
+The scratch schema is dropped afterwards; existing tables are not touched.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app import create_app
+from app.extensions import db
+from app.services import MediaService
+
+SCHEMA = 'bench_gallery'
+ROWS = int(os.environ.get('BENCH_ROWS', '500000'))
+PAGE = 20
+FILTERS = ('all', 'image', 'video', 'mine', 'favorites')
+
+SEED_SQL = [
+    # 20 uploaders
+    """
+    INSERT INTO users (id, email, name, google_id, role, created_at, updated_at)
+    SELECT gen_random_uuid(), 'bench' || i || '@example.com', 'Bench ' || i, 'bench-' || i, 'family', now(), now()
+    FROM generate_series(1, 20) AS i
+    """,
+    # Media spread over ~5 years; 20% without a capture date; ~15% videos
+    """
+    INSERT INTO media (id, uploader_id, filename, original_filename, mime_type, media_kind,
+                       file_size_bytes, taken_at, status, created_at, updated_at)
+    SELECT gen_random_uuid(), u.id,
+           'galleries/bench/' || i || '.jpg', i || '.jpg',
+           CASE WHEN i %% 7 = 0 THEN 'video/mp4' ELSE 'image/jpeg' END,
+           CASE WHEN i %% 7 = 0 THEN 'video' ELSE 'image' END,
+           1000,
+           CASE WHEN i %% 5 = 0 THEN NULL
+                ELSE now() - (i || ' minutes')::interval - interval '3 days' END,
+           'ready',
+           now() - (i * 5 || ' minutes')::interval,
+           now()
+    FROM generate_series(1, %(rows)s) AS i
+    JOIN (SELECT id, row_number() OVER () - 1 AS n FROM users) u ON u.n = i %% 20
+    """,
+    # The viewer favorited ~2% of the library
+    """
+    INSERT INTO media_favorites (media_id, user_id, created_at)
+    SELECT m.id, (SELECT id FROM users ORDER BY email LIMIT 1), now()
+    FROM media m WHERE random() < 0.02
+    """,
+    "ANALYZE",
+]
+
+
+def _walk(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _walk(child)
+
+
+def _explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect)
+    row = conn.exec_driver_sql(
+        "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    result = row[0]
+    nodes = list(_walk(result['Plan']))
+    return {
+        'ms': result['Execution Time'],
+        'sort': any(n['Node Type'] in ('Sort', 'Incremental Sort') for n in nodes),
+        'seq_scan': any(n['Node Type'] == 'Seq Scan' and n.get('Relation Name') == 'media' for n in nodes),
+        'indexes': sorted({n['Index Name'] for n in nodes if 'Index Name' in n}),
+    }
+
+
+def main():
+    app = create_app()
+    svc = MediaService()
+    failures = 0
+
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print("❌ DATABASE_URL must point to PostgreSQL")
+            return 1
+
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+            conn.exec_driver_sql(f"SET search_path TO {SCHEMA}")
+            db.metadata.create_all(conn)
+            print(f"Seeding {ROWS:,} media rows...")
+            for sql in SEED_SQL:
+                conn.exec_driver_sql(sql, {'rows': ROWS} if '%(rows)s' in sql else None)
+
+        try:
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql(f"SET search_path TO {SCHEMA}")
+                session = Session(bind=conn)
+                viewer_id = conn.exec_driver_sql("SELECT id FROM users ORDER BY email LIMIT 1").scalar()
+
+                print(f"{'filter':<10} {'sort':<16} {'page':<6} {'ms':>8}  plan")
+                for filter_type in FILTERS:
+                    for sort_by in svc.SORT_MODES:
+                        base = svc._filter_media_query(svc._grid_query(viewer_id), filter_type, viewer_id)
+
+                        # Deep page: the keyset condition for a row ~80% into the result
+                        total = session.execute(select(func.count()).select_from(base.subquery())).scalar()
+                        deep_row = session.execute(
+                            svc._order_media_query(base, sort_by).offset(int(total * 0.8)).limit(1)
+                        ).first()
+
+                        pages = [('first', svc._order_media_query(base, sort_by))]
+                        if deep_row:
+                            key = svc._decode_cursor(svc._encode_cursor(deep_row[0], sort_by), sort_by)
+                            pages.append(('deep', svc._order_media_query(
+                                base.filter(svc._cursor_condition(sort_by, key)), sort_by
+                            )))
+
+                        for page, stmt in pages:
+                            result = _explain(conn, stmt.limit(PAGE + 1))
+                            # The favorites page sorts only the viewer's own favorites
+                            ok = not result['seq_scan'] and (filter_type == 'favorites' or not result['sort'])
+                            failures += 0 if ok else 1
+                            plan = ', '.join(result['indexes']) or 'no index'
+                            if result['sort']:
+                                plan += ' + Sort'
+                            print(f"{filter_type:<10} {sort_by:<16} {page:<6} {result['ms']:>8.2f}  {'✅' if ok else '❌'} {plan}")
+        finally:
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    if failures:
+        print(f"\n❌ {failures} query plan(s) did not use an ordered index scan")
+        return 1
+    print("\n🎉 Every gallery query is served by an ordered index scan")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -189,6 +189,17 @@ resource "google_storage_bucket" "uploads" {
     }
   }
 
+  # Parts of abandoned resumable uploads (uploads/{session}/part-N); sessions expire after 7 days
+  lifecycle_rule {
+    action {
+      type = "Delete"
+    }
+    condition {
+      age            = 8 # days
+      matches_prefix = ["uploads/"]
+    }
+  }
+
   cors {
     origin          = ["*"]
     method          = ["GET", "HEAD", "PUT", "POST", "DELETE", "OPTIONS"]
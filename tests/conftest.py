@@ -1,4 +1,9 @@
+import os
 import pytest
+
+# Engines are created in create_app(), so the test DB must be configured before import
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
 from app import create_app
 from app.extensions import db
 
@@ -9,6 +14,8 @@ def app():
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
         "WTF_CSRF_ENABLED": False,
+        # Never reach GCS from tests unless a test opts in (and mocks it)
+        "STORAGE_BACKEND": "local",
         "CELERY": {
              "broker_url": "memory://",
              "result_backend": "cache+memory://",
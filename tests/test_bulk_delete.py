@@ -0,0 +1,120 @@
+from unittest.mock import patch
+from app.extensions import db
+from app.models.auth import User
+from app.models.media import Media, Tag, PetProfile, Album, media_favorites, media_tags, media_pets, album_media
+from app.models.task import ProcessingTask
+from app.services import MediaService
+from app.services.storage_backend import memory_storage
+import uuid6
+
+
+def _user(role='family'):
+    user = User(id=uuid6.uuid7(), email=f'{uuid6.uuid7()}@ex.com', name='U', google_id=str(uuid6.uuid7()), role=role)
+    db.session.add(user)
+    return user
+
+
+def _media(uploader, name):
+    media = Media(
+        uploader_id=uploader.id,
+        filename=f'galleries/2026/10/{name}.jpg',
+        original_filename=f'{name}.jpg',
+        mime_type='image/jpeg',
+        file_size_bytes=3,
+        status='ready',
+        thumbnail_path=f'galleries/2026/10/thumbs/{name}_thumb.jpg',
+        renditions=[{'format': 'webp', 'width': 320, 'height': 240, 'path': f'galleries/2026/10/renditions/{name}_320.webp'}]
+    )
+    db.session.add(media)
+    for object_name in [media.filename, media.thumbnail_path, media.renditions[0]['path']]:
+        memory_storage.put_bytes(object_name, b'abc')
+    return media
+
+
+def _count(table, media_ids):
+    return db.session.execute(
+        db.select(db.func.count()).select_from(table).where(table.c.media_id.in_(media_ids))
+    ).scalar()
+
+
+def test_bulk_delete_removes_objects_rows_and_associations(app):
+    """UT-BULKDEL-001: Selected media, their objects and association rows are deleted with per-item results"""
+    app.config['STORAGE_BACKEND'] = 'memory'
+    memory_storage.clear()
+    with app.app_context():
+        member, other = _user(), _user()
+        mine = [_media(member, f'mine{i}') for i in range(3)]
+        theirs = _media(other, 'theirs')
+        tag, pet, album = Tag(name='t'), PetProfile(name='p', type='dog'), Album(name='a')
+        db.session.add_all([tag, pet, album])
+        db.session.flush()
+        for media in mine:
+            media.tags.append(tag)
+            media.pets.append(pet)
+            media.favorited_by.append(member)
+            album.media.append(media)
+            db.session.add(ProcessingTask(media_id=media.id, status='error'))
+        db.session.commit()
+        mine_ids = [m.id for m in mine]
+
+        results = MediaService().delete_media_bulk(
+            [str(i) for i in mine_ids] + [str(theirs.id), str(uuid6.uuid7()), 'not-a-uuid'], member
+        )
+
+        assert [r['status'] for r in results] == ['deleted'] * 3 + ['forbidden', 'not_found', 'not_found']
+        assert db.session.execute(db.select(db.func.count(Media.id))).scalar() == 1
+        for table in (media_tags, media_pets, media_favorites, album_media):
+            assert _count(table, mine_ids) == 0
+        assert db.session.execute(db.select(db.func.count(ProcessingTask.id))).scalar() == 0
+        # Only the other user's objects are left
+        assert memory_storage.names() == sorted([
+            theirs.filename, theirs.thumbnail_path, theirs.renditions[0]['path']
+        ])
+
+
+def test_bulk_delete_keeps_rows_whose_objects_failed(app):
+    """UT-BULKDEL-002: An item whose storage delete failed keeps its row and reports the error"""
+    app.config['STORAGE_BACKEND'] = 'memory'
+    memory_storage.clear()
+    with app.app_context():
+        owner = _user('owner')
+        ok, broken = _media(owner, 'ok'), _media(owner, 'broken')
+        db.session.commit()
+
+        def delete_many(names):
+            return {name: (IOError('backend down') if 'broken' in name else None) for name in names}
+
+        with patch.object(type(memory_storage), 'delete_many', side_effect=delete_many) as storage_delete:
+            results = MediaService().delete_media_bulk([ok.id, broken.id], owner)
+
+        # One storage call for every object of the selection
+        assert storage_delete.call_count == 1
+        assert [r['status'] for r in results] == ['deleted', 'error']
+        assert 'backend down' in results[1]['error']
+        assert db.session.execute(db.select(Media.id)).scalars().all() == [broken.id]
+
+
+def test_bulk_delete_route(client, app):
+    """IT-BULKDEL-001: POST /media/bulk-delete deletes the selection and validates the payload"""
+    app.config['STORAGE_BACKEND'] = 'memory'
+    memory_storage.clear()
+    with app.app_context():
+        owner = _user('owner')
+        media = [_media(owner, f'r{i}') for i in range(2)]
+        db.session.commit()
+        ids = [str(m.id) for m in media]
+        owner_id = str(owner.id)
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = owner_id
+        sess['_fresh'] = True
+
+    assert client.post('/media/bulk-delete', json={}).status_code == 400
+    app.config['BULK_DELETE_MAX_ITEMS'] = 1
+    assert client.post('/media/bulk-delete', json={'ids': ids}).status_code == 400
+    app.config['BULK_DELETE_MAX_ITEMS'] = 500
+
+    res = client.post('/media/bulk-delete', json={'ids': ids})
+    assert res.status_code == 200
+    assert res.get_json()['deleted'] == 2
+    assert memory_storage.names() == []
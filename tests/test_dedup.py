@@ -0,0 +1,163 @@
+import io
+from unittest.mock import patch
+from PIL import Image, ImageDraw
+from werkzeug.datastructures import FileStorage
+from app.blueprints.tasks import _process_media_logic
+from app.extensions import db
+from app.models.auth import User
+from app.models.media import Media
+from app.models.task import ProcessingTask
+from app.services import MediaService
+from app.services.storage_backend import memory_storage
+from app.utils.hashing import phash
+import uuid6
+
+
+def _uploader():
+    user = User(id=uuid6.uuid7(), email=f'{uuid6.uuid7()}@ex.com', name='Uploader', google_id=str(uuid6.uuid7()), role='family')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _file(data, name):
+    return (FileStorage(io.BytesIO(data), filename=name), None)
+
+
+def _picture(seed):
+    img = Image.new('RGB', (640, 480), (240, 240, 240))
+    draw = ImageDraw.Draw(img)
+    for i in range(6):
+        x = (seed * 97 + i * 131) % 560
+        y = (seed * 53 + i * 71) % 400
+        draw.ellipse([x, y, x + 80, y + 80], fill=((seed * 40 + i * 30) % 256, 60, 120))
+    return img
+
+
+def _jpeg(img):
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def _distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def test_duplicate_content_is_stored_once(app):
+    """UT-DEDUP-001: Identical bytes in a batch and in a later upload resolve to one Media"""
+    app.config.update(STORAGE_BACKEND='memory', TASK_RUNNER='local')
+    memory_storage.clear()
+    svc = MediaService()
+    with app.app_context(), patch('app.services.task_runner.LocalTaskRunner.start'):
+        user = _uploader()
+        media_list, failures = svc.upload_media_batch(
+            [_file(b'same bytes', 'a.jpg'), _file(b'other bytes', 'b.jpg'), _file(b'same bytes', 'c.jpg')], user
+        )
+        assert failures == []
+        assert [m.original_filename for m in media_list] == ['a.jpg', 'b.jpg']
+        assert len(memory_storage.names('galleries/')) == 2
+
+        again, _ = svc.upload_media_batch([_file(b'same bytes', 'again.jpg')], user)
+        assert again[0].id == media_list[0].id
+        assert again[0].is_duplicate
+        assert len(memory_storage.names('galleries/')) == 2
+        assert db.session.execute(db.select(db.func.count(Media.id))).scalar() == 2
+        assert db.session.execute(db.select(db.func.count(ProcessingTask.id))).scalar() == 2
+
+
+def test_finalize_duplicate_direct_upload(app, client):
+    """IT-DEDUP-001: Finalizing a direct upload of known content deletes the new object and returns the existing media"""
+    app.config.update(STORAGE_BACKEND='memory', TASK_RUNNER='local')
+    memory_storage.clear()
+    with app.app_context(), patch('app.services.task_runner.LocalTaskRunner.start'):
+        user = _uploader()
+        existing, _ = MediaService().upload_media_batch([_file(b'photo bytes', 'first.jpg')], user)
+        memory_storage.put_bytes('galleries/2026/10/second.jpg', b'photo bytes')
+
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user.id)
+        response = client.post('/media/upload/finalize', json={
+            'object_name': 'galleries/2026/10/second.jpg',
+            'original_filename': 'second.jpg',
+            'mime_type': 'image/jpeg',
+            'file_size': len(b'photo bytes'),
+        })
+
+        assert response.status_code == 200
+        assert response.json['id'] == str(existing[0].id)
+        assert response.json['duplicate'] is True
+        assert not memory_storage.exists('galleries/2026/10/second.jpg')
+
+
+
+def test_finalizing_the_same_object_twice_keeps_it(app):
+    """UT-DEDUP-004: A repeated finalize returns the same Media and never deletes its object"""
+    app.config.update(STORAGE_BACKEND='memory', TASK_RUNNER='local')
+    memory_storage.clear()
+    name = 'galleries/2026/10/retry.jpg'
+    data = _jpeg(_picture(5))
+    with app.app_context(), patch('app.services.task_runner.LocalTaskRunner.start'):
+        user = _uploader()
+        memory_storage.put_bytes(name, data)
+        svc = MediaService()
+        first = svc.finalize_upload(name, 'retry.jpg', 'image/jpeg', len(data), user)
+        second = svc.finalize_upload(name, 'retry.jpg', 'image/jpeg', len(data), user)
+        assert second.id == first.id
+        assert memory_storage.exists(name)
+
+        # Processing rewrites the JPEG in place; a late retry still finds its Media
+        _process_media_logic(str(first.id))
+        third = svc.finalize_upload(name, 'retry.jpg', 'image/jpeg', len(data), user)
+        assert third.id == first.id
+        assert memory_storage.exists(name)
+        assert db.session.execute(db.select(db.func.count(Media.id))).scalar() == 1
+
+
+def test_failed_media_does_not_block_a_new_upload(app):
+    """UT-DEDUP-005: The same bytes as a Media whose processing failed are uploaded as a new Media"""
+    app.config.update(STORAGE_BACKEND='memory', TASK_RUNNER='local')
+    memory_storage.clear()
+    svc = MediaService()
+    with app.app_context(), patch('app.services.task_runner.LocalTaskRunner.start'):
+        user = _uploader()
+        [failed], _ = svc.upload_media_batch([_file(b'flaky bytes', 'first.jpg')], user)
+        failed.status = 'error'
+        db.session.commit()
+
+        [again], _ = svc.upload_media_batch([_file(b'flaky bytes', 'again.jpg')], user)
+        assert again.id != failed.id
+        assert not getattr(again, 'is_duplicate', False)
+        assert again.status == 'processing'
+        assert db.session.get(Media, failed.id, populate_existing=True).content_sha256 is None
+
+def test_phash_tolerates_reencoding_and_resizing():
+    """UT-DEDUP-002: pHash stays close for a re-encoded/resized copy and far for another picture"""
+    original = _picture(1)
+    buffer = io.BytesIO()
+    original.resize((320, 240)).save(buffer, 'JPEG', quality=60)
+    copy = Image.open(buffer)
+
+    assert len(phash(original)) == 16
+    assert _distance(phash(original), phash(copy)) <= 4
+    assert _distance(phash(original), phash(_picture(7))) > 10
+
+
+def test_processing_sets_phash(app, tmp_path):
+    """UT-DEDUP-003: Image processing stores the perceptual hash"""
+    app.config.update(STORAGE_BACKEND='local', UPLOAD_FOLDER=str(tmp_path))
+    with app.app_context():
+        user = _uploader()
+        object_name = 'galleries/2026/10/pic.png'
+        (tmp_path / 'galleries/2026/10').mkdir(parents=True)
+        _picture(3).save(tmp_path / object_name)
+        media = Media(uploader_id=user.id, filename=object_name, original_filename='pic.png',
+                      mime_type='image/png', file_size_bytes=1, status='processing')
+        db.session.add(media)
+        db.session.commit()
+
+        _process_media_logic(str(media.id))
+        db.session.refresh(media)
+
+        assert media.status == 'ready'
+        assert media.phash == phash(_picture(3))
@@ -0,0 +1,60 @@
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.services.ffmpeg_executor import FFmpegExecutor, FFmpegTimeout
+
+
+@pytest.fixture
+def executor_app(app, tmp_path):
+    app.config.update(FFMPEG_LOCK_DIR=str(tmp_path / 'locks'), FFMPEG_MAX_CONCURRENCY=2, FFMPEG_NICE=0)
+    return app
+
+
+def test_jobs_beyond_the_limit_wait_for_a_slot(executor_app):
+    """UT-FFMPEG-001: At most FFMPEG_MAX_CONCURRENCY jobs run at once; waits are reported in metrics"""
+    executor = FFmpegExecutor()
+
+    def job(_):
+        with executor_app.app_context():
+            executor.run(['sleep', '0.3'])
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(job, range(4)))
+    elapsed = time.monotonic() - started
+
+    assert 0.55 < elapsed < 1.2
+    metrics = executor.metrics()
+    assert metrics['completed'] == 4 and metrics['queued'] == 0 and metrics['running'] == 0
+    assert metrics['wait_ms_p95'] >= 250
+
+
+def test_timeouts_and_failures(executor_app):
+    """UT-FFMPEG-002: A job over its wall-clock limit is killed; a failing job raises CalledProcessError"""
+    executor = FFmpegExecutor()
+    with executor_app.app_context():
+        started = time.monotonic()
+        with pytest.raises(FFmpegTimeout):
+            executor.run(['sleep', '5'], timeout=0.3)
+        assert time.monotonic() - started < 2
+
+        with pytest.raises(subprocess.CalledProcessError):
+            executor.run(['false'])
+
+        result = executor.run(['echo', 'ok'], stdout=subprocess.PIPE)
+        assert result.stdout == b'ok\n'
+
+    metrics = executor.metrics()
+    assert (metrics['timed_out'], metrics['failed'], metrics['completed']) == (1, 1, 1)
+
+
+def test_threads_are_sized_to_the_core_share(executor_app, monkeypatch):
+    """UT-FFMPEG-003: ffmpeg gets -threads for every input and the output, sized cores / concurrency"""
+    monkeypatch.setattr('os.cpu_count', lambda: 8)
+    executor = FFmpegExecutor()
+    with executor_app.app_context():
+        assert executor.threads() == 4
+        cmd = executor._with_threads(['ffmpeg', '-y', '-i', 'in.mov', '-c:v', 'libx264', 'out.mp4'], 4)
+    assert cmd == ['ffmpeg', '-filter_threads', '4', '-y', '-threads', '4', '-i', 'in.mov',
+                   '-c:v', 'libx264', '-threads', '4', 'out.mp4']
@@ -0,0 +1,65 @@
+import pytest
+from app.models.auth import User
+from app.extensions import db
+import uuid6
+
+
+@pytest.fixture
+def local_client(client, app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    (tmp_path / 'galleries/2025/01').mkdir(parents=True)
+    (tmp_path / 'galleries/2025/01/clip.mp4').write_bytes(bytes(range(256)) * 4)
+    (tmp_path / 'galleries/2025/01/renditions').mkdir()
+    (tmp_path / 'galleries/2025/01/renditions/clip_854.mp4').write_bytes(b'rendition')
+
+    with app.app_context():
+        user = User(id=uuid6.uuid7(), email='f@ex.com', name='F', google_id='f')
+        db.session.add(user)
+        db.session.commit()
+        user_id = str(user.id)
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user_id
+        sess['_fresh'] = True
+    return client
+
+
+def test_local_file_caching_headers(local_client):
+    """IT-FILE-001: Strong ETag and 304 on revalidation; only derived objects are cached as immutable"""
+    res = local_client.get('/media/file/galleries/2025/01/clip.mp4')
+    assert res.status_code == 200
+    assert len(res.data) == 1024
+    # Processing may rewrite an original under the same name
+    assert res.headers['Cache-Control'] == 'private, no-cache'
+    etag = res.headers['ETag']
+    assert etag and not etag.startswith('W/')
+
+    res = local_client.get('/media/file/galleries/2025/01/clip.mp4', headers={'If-None-Match': etag})
+    assert res.status_code == 304
+
+    res = local_client.get('/media/file/galleries/2025/01/renditions/clip_854.mp4')
+    assert res.headers['Cache-Control'] == 'private, max-age=31536000, immutable'
+
+
+def test_local_file_range(local_client):
+    """IT-FILE-002: Range requests return 206 with only the requested bytes"""
+    res = local_client.get('/media/file/galleries/2025/01/clip.mp4', headers={'Range': 'bytes=256-511'})
+    assert res.status_code == 206
+    assert res.data == bytes(range(256))
+    assert res.headers['Content-Range'] == 'bytes 256-511/1024'
+
+
+def test_local_file_accel_redirect(local_client, app):
+    """IT-FILE-003: With an nginx prefix the body is offloaded via X-Accel-Redirect"""
+    app.config['LOCAL_FILE_ACCEL_PREFIX'] = '/_uploads/'
+    res = local_client.get('/media/thumb/galleries/2025/01/clip.mp4')
+    assert res.status_code == 200
+    assert res.data == b''
+    assert res.headers['X-Accel-Redirect'] == '/_uploads/galleries/2025/01/clip.mp4'
+    assert res.headers['Content-Type'] == 'video/mp4'
+
+
+def test_local_file_missing_or_traversal(local_client):
+    """IT-FILE-004: Missing files and paths outside UPLOAD_FOLDER are 404"""
+    assert local_client.get('/media/file/galleries/nope.jpg').status_code == 404
+    assert local_client.get('/media/file/../conftest.py').status_code == 404
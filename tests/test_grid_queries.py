@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.models.media import Media
+from app.models.auth import User
+from app.extensions import db
+import uuid6
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _seed(count, viewer):
+    fans = [User(id=uuid6.uuid7(), email=f'fan{count}_{i}@ex.com', name=f'Fan{i}', google_id=f'fan{count}_{i}') for i in range(3)]
+    db.session.add_all(fans)
+    for i in range(count):
+        uploader = User(id=uuid6.uuid7(), email=f'up{count}_{i}@ex.com', name=f'Up{i}', google_id=f'up{count}_{i}')
+        media = Media(
+            uploader=uploader,
+            filename=f'galleries/2025/01/q_{i}.jpg',
+            original_filename=f'q_{i}.jpg',
+            mime_type='image/jpeg',
+            file_size_bytes=1,
+            status='ready'
+        )
+        media.favorited_by.extend(fans)
+        if i % 2:
+            media.favorited_by.append(viewer)
+        db.session.add(media)
+    db.session.commit()
+
+
+def _index_query_count(client, app, count):
+    with app.app_context():
+        viewer = User(id=uuid6.uuid7(), email=f'viewer{count}@ex.com', name='Viewer', google_id=f'viewer{count}')
+        db.session.add(viewer)
+        _seed(count, viewer)
+        viewer_id = str(viewer.id)
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = viewer_id
+        sess['_fresh'] = True
+
+    with app.app_context():
+        # Start from a cold identity map, like a real request
+        db.session.expunge_all()
+        with count_queries() as statements:
+            html = client.get('/').get_data(as_text=True)
+
+    assert html.count('favorite-btn active') == count // 2
+    return len(statements)
+
+
+def test_index_query_count_is_constant(client, app):
+    """IT-GRID-001: Rendering the grid does not issue per-tile queries (no N+1)"""
+    small = _index_query_count(client, app, 2)
+
+    with app.app_context():
+        db.session.execute(db.delete(Media.__table__.metadata.tables['media_favorites']))
+        db.session.execute(db.delete(Media))
+        db.session.commit()
+
+    large = _index_query_count(client, app, 12)
+
+    assert large == small
+    assert large <= 4
+
+
+def test_favorites_filter_with_viewer_flag(app):
+    """IT-GRID-002: The favorites filter can be combined with the per-viewer favorite flag"""
+    from app.services.media_service import MediaService
+
+    with app.app_context():
+        viewer = User(id=uuid6.uuid7(), email='favviewer@ex.com', name='Viewer', google_id='favviewer')
+        db.session.add(viewer)
+        _seed(4, viewer)
+
+        media_list, _ = MediaService().get_media_feed(filter_type='favorites', user_id=viewer.id)
+
+        assert len(media_list) == 2
+        assert all(m.is_favorited for m in media_list)
+
+
+def test_media_kind_follows_mime_type(app):
+    """UT-GRID-003: media_kind is derived from mime_type for the kind filter indexes"""
+    media = Media(mime_type='video/mp4')
+    assert media.media_kind == 'video'
+    media.mime_type = 'image/heic'
+    assert media.media_kind == 'image'
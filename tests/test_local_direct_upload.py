@@ -0,0 +1,81 @@
+import os
+import time
+from unittest.mock import patch
+import pytest
+from app.extensions import db
+from app.models.auth import User
+from app.models.media import Media
+import uuid6
+
+
+@pytest.fixture
+def family_client(client, app, tmp_path):
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), TASK_RUNNER='local')
+    with app.app_context():
+        user = User(id=uuid6.uuid7(), email='direct@ex.com', name='D', google_id='direct', role='family')
+        db.session.add(user)
+        db.session.commit()
+        user_id = str(user.id)
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user_id
+        sess['_fresh'] = True
+    with patch('app.services.task_runner.LocalTaskRunner.start'):
+        yield client
+
+
+def test_local_sign_put_finalize(family_client, app, tmp_path):
+    """IT-DIRECT-001: With local storage the sign -> PUT -> finalize flow stores the body as sent"""
+    sign = family_client.post('/media/upload/sign', json={'filename': 'photo.jpg', 'mime_type': 'image/jpeg'}).get_json()
+    body = os.urandom(5000)
+
+    res = family_client.put(sign['url'], data=body, headers={'Content-Type': 'image/jpeg'})
+    assert res.status_code == 201
+    assert (tmp_path / sign['object_name']).read_bytes() == body
+
+    res = family_client.post('/media/upload/finalize', json={
+        'object_name': sign['object_name'], 'original_filename': 'photo.jpg',
+        'mime_type': 'image/jpeg', 'file_size': len(body)
+    })
+    assert res.status_code == 200
+    with app.app_context():
+        assert db.session.get(Media, uuid6.UUID(res.get_json()['id'])).file_size_bytes == len(body)
+
+
+def test_local_put_rejects_bad_signature_and_content_type(family_client, tmp_path):
+    """UT-DIRECT-002: Tampered URLs and a Content-Type other than the signed one are refused"""
+    sign = family_client.post('/media/upload/sign', json={'filename': 'a.jpg', 'mime_type': 'image/jpeg'}).get_json()
+
+    assert family_client.put(sign['url'].replace('signature=', 'signature=0'), data=b'x',
+                             headers={'Content-Type': 'image/jpeg'}).status_code == 403
+    assert family_client.put(sign['url'], data=b'x', headers={'Content-Type': 'text/html'}).status_code == 403
+    assert not (tmp_path / sign['object_name']).exists()
+
+
+def test_local_put_url_expires_and_never_overwrites(family_client, app):
+    """UT-DIRECT-003: Expired URLs are refused and an existing object is not replaced"""
+    from app.services.storage_backend import get_storage
+    with app.test_request_context():
+        url = get_storage().sign_urls(['galleries/2026/10/old.jpg'], int(time.time()) - 1,
+                                      method='PUT', content_type='image/jpeg')['galleries/2026/10/old.jpg']
+    assert family_client.put(url, data=b'x', headers={'Content-Type': 'image/jpeg'}).status_code == 403
+
+    sign = family_client.post('/media/upload/sign', json={'filename': 'b.jpg', 'mime_type': 'image/jpeg'}).get_json()
+    assert family_client.put(sign['url'], data=b'first', headers={'Content-Type': 'image/jpeg'}).status_code == 201
+    assert family_client.put(sign['url'], data=b'second', headers={'Content-Type': 'image/jpeg'}).status_code == 409
+
+
+def test_finalize_rejects_names_outside_uploads(family_client, tmp_path):
+    """UT-DIRECT-004: Only galleries/{yyyy}/{mm}/{file} can be finalized; other paths are never touched"""
+    (tmp_path / 'galleries/2026/10/renditions').mkdir(parents=True)
+    (tmp_path / 'galleries/2026/10/renditions/other_640.jpg').write_bytes(b'rendition')
+    (tmp_path / 'secret.txt').write_bytes(b'secret')
+
+    for object_name in ['galleries/2026/10/renditions/other_640.jpg', 'galleries/2026/../../secret.txt',
+                        'secret.txt', 'galleries/2026/10/../../../secret.txt']:
+        res = family_client.post('/media/upload/finalize', json={
+            'object_name': object_name, 'original_filename': 'x.jpg',
+            'mime_type': 'image/jpeg', 'file_size': 1
+        })
+        assert res.status_code == 400
+    assert (tmp_path / 'galleries/2026/10/renditions/other_640.jpg').read_bytes() == b'rendition'
+    assert (tmp_path / 'secret.txt').read_bytes() == b'secret'
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pytest
+from PIL import Image
+from app.blueprints.tasks import _process_media_logic, _claim_media, RetryableProcessingError
+from app.extensions import db
+from app.models.auth import User
+from app.models.media import Media
+import uuid6
+
+
+def _media(tmp_path, name='photo.png', data=None):
+    user = User(id=uuid6.uuid7(), email=f'{uuid6.uuid7()}@ex.com', name='C', google_id=str(uuid6.uuid7()))
+    db.session.add(user)
+    object_name = f'galleries/2026/10/{name}'
+    path = tmp_path / object_name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if data is None:
+        Image.new('RGB', (64, 48), (10, 200, 30)).save(path)
+    else:
+        path.write_bytes(data)
+    media = Media(uploader_id=user.id, filename=object_name, original_filename=name,
+                  mime_type='image/png', file_size_bytes=1, status='processing')
+    db.session.add(media)
+    db.session.commit()
+    return media
+
+
+@pytest.fixture
+def local_app(app, tmp_path):
+    app.config.update(STORAGE_BACKEND='local', UPLOAD_FOLDER=str(tmp_path), MEDIA_PROCESSING_MAX_ATTEMPTS=2)
+    return app
+
+
+def test_duplicate_delivery_is_skipped(local_app, tmp_path):
+    """UT-CLAIM-001: A second delivery of a processed item does no work"""
+    with local_app.app_context():
+        media = _media(tmp_path)
+        assert _process_media_logic(str(media.id)) == 'ready'
+
+        with patch('app.blueprints.tasks._process_image') as process_image:
+            assert _process_media_logic(str(media.id)) == 'skipped'
+        process_image.assert_not_called()
+        assert db.session.get(Media, media.id, populate_existing=True).processing_attempts == 1
+
+
+def test_claim_is_exclusive_until_the_lease_expires(local_app, tmp_path):
+    """UT-CLAIM-002: Only one worker holds the claim; an expired lease can be taken over"""
+    with local_app.app_context():
+        media = _media(tmp_path)
+        assert _claim_media(media.id) == 'claimed'
+        assert _claim_media(media.id) == 'busy'
+
+        db.session.execute(db.update(Media).where(Media.id == media.id)
+                           .values(processing_lease_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        assert _claim_media(media.id) == 'claimed'
+        assert db.session.get(Media, media.id, populate_existing=True).processing_attempts == 2
+
+
+def test_fatal_and_retryable_failures(local_app, tmp_path):
+    """UT-CLAIM-003: Unreadable files fail at once; transient errors release the claim until attempts run out"""
+    with local_app.app_context():
+        broken = _media(tmp_path, 'broken.png', b'not an image')
+        assert _process_media_logic(str(broken.id)) == 'error'
+        broken = db.session.get(Media, broken.id, populate_existing=True)
+        assert broken.status == 'error'
+        assert 'UnidentifiedImageError' in broken.processing_error
+
+        flaky = _media(tmp_path, 'flaky.png')
+        with patch('app.blueprints.tasks._process_image', side_effect=OSError('storage unavailable')):
+            with pytest.raises(RetryableProcessingError):
+                _process_media_logic(str(flaky.id))
+            flaky = db.session.get(Media, flaky.id, populate_existing=True)
+            assert (flaky.status, flaky.processing_lease_until) == ('processing', None)
+            assert 'storage unavailable' in flaky.processing_error
+
+            # Second and last attempt
+            assert _process_media_logic(str(flaky.id)) == 'error'
+        assert db.session.get(Media, flaky.id, populate_existing=True).status == 'error'
+
+
+def test_handler_status_codes(local_app, client, tmp_path):
+    """IT-CLAIM-001: The handler asks Cloud Tasks to retry transient failures and busy items only"""
+    with local_app.app_context():
+        media = _media(tmp_path)
+        media_id = str(media.id)
+
+    with patch('app.blueprints.tasks._process_image', side_effect=OSError('timeout')):
+        response = client.post('/handlers/process-media', json={'media_id': media_id})
+    assert (response.status_code, response.json['status']) == (500, 'retry')
+
+    with local_app.app_context():
+        assert _claim_media(uuid6.UUID(media_id)) == 'claimed'
+    assert client.post('/handlers/process-media', json={'media_id': media_id}).status_code == 409
+
+    with local_app.app_context():
+        db.session.execute(db.update(Media).where(Media.id == uuid6.UUID(media_id)).values(processing_lease_until=None))
+        db.session.commit()
+    response = client.post('/handlers/process-media', json={'media_id': media_id})
+    assert (response.status_code, response.json['status']) == (200, 'ready')
+    response = client.post('/handlers/process-media', json={'media_id': media_id})
+    assert (response.status_code, response.json['status']) == (200, 'skipped')
@@ -0,0 +1,101 @@
+import pytest
+from datetime import datetime, timedelta
+from app.services import MediaService
+from app.models.media import Media
+from app.models.auth import User
+from app.extensions import db
+import uuid6
+
+
+def _seed_media(count, with_taken_at=True):
+    user = User(id=uuid6.uuid7(), email='feed@ex.com', name='Feed', google_id='feed')
+    db.session.add(user)
+
+    base = datetime(2025, 1, 1, 12, 0, 0)
+    for i in range(count):
+        db.session.add(Media(
+            uploader_id=user.id,
+            filename=f'galleries/2025/01/img_{i}.jpg',
+            original_filename=f'img_{i}.jpg',
+            mime_type='video/mp4' if i % 3 == 0 else 'image/jpeg',
+            file_size_bytes=100,
+            status='ready',
+            # Every other item shares a timestamp to exercise the id tie-breaker
+            created_at=base + timedelta(minutes=i // 2),
+            # Some items have no capture date (sorted last)
+            taken_at=base - timedelta(days=i % 5) if with_taken_at and i % 4 else None
+        ))
+    db.session.commit()
+    return user
+
+
+def _walk_feed(svc, **kwargs):
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = svc.get_media_feed(cursor=cursor, limit=4, **kwargs)
+        seen.extend(page)
+        if not cursor:
+            return seen
+
+
+@pytest.mark.parametrize('sort_by', MediaService.SORT_MODES)
+def test_media_feed_matches_offset_order(app, sort_by):
+    """UT-FEED-001: Keyset pages cover the same rows in the same order as a full scan"""
+    with app.app_context():
+        _seed_media(23)
+        svc = MediaService()
+
+        expected = svc.get_global_media(limit=100, sort_by=sort_by)
+        walked = _walk_feed(svc, sort_by=sort_by)
+
+        assert [m.id for m in walked] == [m.id for m in expected]
+        assert len({m.id for m in walked}) == 23
+
+
+def test_media_feed_filter(app):
+    """UT-FEED-002: Filters are applied on every page"""
+    with app.app_context():
+        _seed_media(23)
+        walked = _walk_feed(MediaService(), filter_type='video')
+
+        assert walked
+        assert all(m.mime_type.startswith('video') for m in walked)
+
+
+def test_media_feed_invalid_cursor(app):
+    """UT-FEED-003: Malformed cursors and cursors from another sort order are rejected"""
+    with app.app_context():
+        _seed_media(6)
+        svc = MediaService()
+        _, cursor = svc.get_media_feed(limit=2, sort_by='created_at_desc')
+
+        with pytest.raises(ValueError):
+            svc.get_media_feed(cursor='not-a-cursor')
+        with pytest.raises(ValueError):
+            svc.get_media_feed(cursor=cursor, sort_by='taken_at_asc')
+
+
+def test_media_feed_endpoint(client, app):
+    """IT-FEED-001: JSON feed returns items, rendered tiles and the next cursor"""
+    with app.app_context():
+        user = _seed_media(5)
+        user_id = str(user.id)
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user_id
+        sess['_fresh'] = True
+
+    res = client.get('/media/feed?limit=3')
+    assert res.status_code == 200
+    data = res.get_json()
+    assert len(data['items']) == 3
+    assert data['html'].count('grid-item') == 3
+    assert data['next_cursor']
+
+    res = client.get(f"/media/feed?limit=3&cursor={data['next_cursor']}")
+    data = res.get_json()
+    assert len(data['items']) == 2
+    assert data['next_cursor'] is None
+
+    assert client.get('/media/feed?cursor=garbage').status_code == 400
@@ -0,0 +1,87 @@
+import random
+from app.extensions import db
+from app.models.auth import User
+from app.models.media import Media
+from app.services.similarity_index import HammingIndex, similar_media_index
+import uuid6
+
+
+def _flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_hamming_index_matches_linear_scan():
+    """UT-SIMILAR-001: Multi-index search returns exactly the hashes a linear scan finds"""
+    rng = random.Random(7)
+    index = HammingIndex()
+    hashes = {}
+    base = rng.getrandbits(64)
+    for i in range(3000):
+        # Half random, half clustered around one hash so every radius has hits
+        value = rng.getrandbits(64) if i % 2 else _flip(base, rng.sample(range(64), rng.randint(0, 14)))
+        hashes[i] = value
+        index.add(i, value)
+    for key in range(0, 3000, 3):
+        index.remove(key)
+        del hashes[key]
+
+    for max_distance in (0, 3, 7, 8, 12, 15):
+        expected = sorted(
+            ((v ^ base).bit_count(), k) for k, v in hashes.items() if (v ^ base).bit_count() <= max_distance
+        )
+        assert sorted(index.search(base, max_distance)) == expected
+
+
+def test_similar_endpoint_finds_near_duplicates(app, client):
+    """IT-SIMILAR-001: The endpoint returns near-duplicates by distance, including newly processed media"""
+    app.config.update(SIMILAR_INDEX_REFRESH_SEC=0)
+    similar_media_index.clear()
+    with app.app_context():
+        owner = User(id=uuid6.uuid7(), email='o@ex.com', name='O', google_id='o', role='owner')
+        db.session.add(owner)
+
+        def media(name, phash, dhash=None):
+            m = Media(uploader_id=owner.id, filename=f'{name}.jpg', original_filename=f'{name}.jpg',
+                      mime_type='image/jpeg', file_size_bytes=1, status='ready', phash=phash, dhash=dhash)
+            db.session.add(m)
+            return m
+
+        base = media('base', 'f0f0f0f0f0f0f0f0', '0123456789abcdef')
+        burst = media('burst', 'f0f0f0f0f0f0f0f3', '0123456789abcdef')
+        resaved = media('resaved', 'f0f0f0f0f0f0f0f1', '0123456789abcdee')
+        media('other', '0f0f0f0f0f0f0f0f')
+        db.session.commit()
+        ids = {m.filename: str(m.id) for m in (base, burst, resaved)}
+        owner_id = str(owner.id)
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = owner_id
+    response = client.get(f"/media/{ids['base.jpg']}/similar")
+    assert response.status_code == 200
+    assert [(i['id'], i['distance']) for i in response.json['items']] == [(ids['resaved.jpg'], 1), (ids['burst.jpg'], 2)]
+
+    # A photo processed after the index was built is picked up by the next query
+    with app.app_context():
+        late = Media(uploader_id=uuid6.UUID(owner_id), filename='late.jpg', original_filename='late.jpg',
+                     mime_type='image/jpeg', file_size_bytes=1, status='ready', phash='f0f0f0f0f0f0f0f0')
+        db.session.add(late)
+        db.session.commit()
+        late_id = str(late.id)
+    response = client.get(f"/media/{ids['base.jpg']}/similar?distance=0")
+    assert [i['id'] for i in response.json['items']] == [late_id]
+
+
+def test_similar_endpoint_is_owner_only(app, client):
+    """IT-SIMILAR-002: Family members can't query near-duplicates"""
+    with app.app_context():
+        family = User(id=uuid6.uuid7(), email='f@ex.com', name='F', google_id='f', role='family')
+        db.session.add(family)
+        db.session.commit()
+        family_id = str(family.id)
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = family_id
+    response = client.get(f"/media/{uuid6.uuid7()}/similar")
+    assert response.status_code == 302
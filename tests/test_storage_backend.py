@@ -0,0 +1,136 @@
+import io
+from unittest.mock import MagicMock, patch
+import pytest
+import requests
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage as gcs_storage
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from app.extensions import db
+from app.models.auth import User
+from app.services import MediaService
+from app.services.storage_backend import LocalStorage, GCSStorage, memory_storage, get_storage
+import uuid6
+
+
+@pytest.fixture(params=['local', 'memory'])
+def storage(request, app, tmp_path):
+    app.config.update(STORAGE_BACKEND=request.param, UPLOAD_FOLDER=str(tmp_path))
+    memory_storage.clear()
+    with app.app_context():
+        yield get_storage()
+
+
+def test_storage_backend_roundtrip(storage):
+    """UT-STORAGE-001: Local and in-memory backends behave the same for put/open/stat/delete"""
+    storage.put('galleries/2026/10/a.bin', io.BytesIO(b'hello world'), 'application/octet-stream')
+    with storage.writer('galleries/2026/10/b.bin', 'application/octet-stream') as f:
+        f.write(b'abc')
+
+    assert storage.exists('galleries/2026/10/a.bin')
+    with storage.open('galleries/2026/10/a.bin') as f:
+        f.seek(6)
+        assert f.read() == b'world'
+    info = storage.stat('galleries/2026/10/b.bin', checksum=True)
+    assert info.size == 3 and info.crc32c == 'Nks/tw=='
+    assert storage.stat('galleries/2026/10/missing.bin') is None
+
+    assert storage.delete('galleries/2026/10/a.bin') is True
+    assert storage.delete('galleries/2026/10/a.bin') is False
+    assert storage.delete_many(['galleries/2026/10/b.bin', 'galleries/2026/10/missing.bin']) == {
+        'galleries/2026/10/b.bin': None, 'galleries/2026/10/missing.bin': None
+    }
+    assert not storage.exists('galleries/2026/10/b.bin')
+
+
+def test_local_writer_keeps_previous_object_on_error(app, tmp_path):
+    """UT-STORAGE-002: A failed write leaves neither a partial file nor a temp file behind"""
+    storage = LocalStorage(str(tmp_path))
+    storage.put_bytes('galleries/x.jpg', b'old')
+    with pytest.raises(RuntimeError):
+        with storage.writer('galleries/x.jpg') as f:
+            f.write(b'partial')
+            raise RuntimeError('encoder failed')
+
+    assert (tmp_path / 'galleries/x.jpg').read_bytes() == b'old'
+    assert [p.name for p in (tmp_path / 'galleries').iterdir()] == ['x.jpg']
+
+
+def test_gcs_delete_many_uses_batches(app):
+    """UT-STORAGE-003: GCS bulk deletes go out 100 per batch request and report each object"""
+    names = [f'galleries/{i}.jpg' for i in range(150)]
+    batches = []
+
+    def make_batch(raise_exception=True):
+        batch = MagicMock()
+        statuses = iter([500] + [204] * 99 if not batches else [404] * 50)
+        batch._responses = [MagicMock(status_code=next(statuses)) for _ in range(100 if not batches else 50)]
+        batches.append(batch)
+        return batch
+
+    with app.app_context(), patch('app.services.storage_backend.gcs_clients') as clients:
+        clients.client.return_value.batch.side_effect = make_batch
+        results = GCSStorage().delete_many(names)
+
+    assert len(batches) == 2
+    assert all(b.__enter__.called and b.__exit__.called for b in batches)
+    assert results['galleries/0.jpg'] is not None
+    # Missing objects count as deleted
+    assert [name for name, error in results.items() if error] == ['galleries/0.jpg']
+
+
+
+def _batch_response(statuses):
+    """A multipart/mixed batch response as the JSON API returns it."""
+    parts = [
+        f"--batch_x\r\nContent-Type: application/http\r\nContent-ID: <response-{i + 1}>\r\n\r\n"
+        f"HTTP/1.1 {status} Status\r\nContent-Type: application/json\r\n\r\n{{}}\r\n"
+        for i, status in enumerate(statuses)
+    ]
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['content-type'] = 'multipart/mixed; boundary=batch_x'
+    response._content = (''.join(parts) + '--batch_x--\r\n').encode()
+    return response
+
+
+def test_gcs_delete_many_with_the_real_batch(app):
+    """UT-STORAGE-004: Per-object results come from the pinned google-cloud-storage Batch"""
+    client = gcs_storage.Client(project='test', credentials=AnonymousCredentials())
+    names = ['galleries/a.jpg', 'galleries/gone.jpg', 'galleries/locked.jpg']
+
+    with app.app_context(), patch('app.services.storage_backend.gcs_clients') as clients, \
+         patch.object(client._base_connection, '_make_request', return_value=_batch_response([204, 404, 403])) as request:
+        clients.client.return_value = client
+        clients.bucket.return_value = client.bucket('bucket')
+        results = GCSStorage().delete_many(names)
+
+    assert request.call_count == 1
+    assert results['galleries/a.jpg'] is None and results['galleries/gone.jpg'] is None
+    assert results['galleries/locked.jpg'].code == 403
+
+def test_pipeline_runs_on_memory_backend(app):
+    """IT-STORAGE-001: Upload and processing run end to end against the in-memory backend"""
+    app.config.update(STORAGE_BACKEND='memory', TASK_RUNNER='sync')
+    memory_storage.clear()
+    source = io.BytesIO()
+    Image.new('RGB', (2400, 1600), (30, 60, 90)).save(source, 'PNG')
+    source.seek(0)
+
+    with app.app_context():
+        user = User(id=uuid6.uuid7(), email='mem@ex.com', name='M', google_id='mem', role='family')
+        db.session.add(user)
+        db.session.commit()
+
+        media = MediaService().upload_media(FileStorage(source, filename='pic.png'), user)
+        db.session.refresh(media)
+
+        assert media.status == 'ready'
+        assert media.filename.endswith('.jpg')
+        stored = memory_storage.names('galleries/')
+        assert media.filename in stored
+        assert all(r['path'] in stored for r in media.renditions)
+        assert not any(name.endswith('.png') for name in stored)
+
+        MediaService().delete_media(media)
+        assert memory_storage.names() == []
@@ -0,0 +1,49 @@
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from app.services.storage_client import GCSClientManager
+
+
+def _mock_google(mocker):
+    creds = MagicMock(valid=True, expiry=datetime.utcnow() + timedelta(hours=1))
+    default = mocker.patch('google.auth.default', return_value=(MagicMock(), 'proj'))
+    mocker.patch('google.auth.impersonated_credentials.Credentials', return_value=creds)
+    client_cls = mocker.patch('app.services.storage_client.storage.Client')
+    return default, client_cls, creds
+
+
+def test_gcs_client_is_shared(app, mocker):
+    """UT-STORAGE-001: Credentials and client are built once and shared across threads"""
+    default, client_cls, creds = _mock_google(mocker)
+    manager = GCSClientManager()
+
+    clients = []
+
+    def worker():
+        with app.app_context():
+            clients.append(manager.client())
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(clients) == 20
+    assert len({id(c) for c in clients}) == 1
+    default.assert_called_once()
+    client_cls.assert_called_once()
+    creds.refresh.assert_not_called()
+
+
+def test_gcs_credentials_refresh_ahead(app, mocker):
+    """UT-STORAGE-002: Credentials close to expiry are refreshed before they are used"""
+    _, _, creds = _mock_google(mocker)
+    manager = GCSClientManager()
+
+    with app.app_context():
+        manager.client()
+        creds.expiry = datetime.utcnow() + timedelta(seconds=60)
+        manager.client()
+
+    creds.refresh.assert_called_once()
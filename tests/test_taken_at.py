@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from app.models.media import Media
+from app.models.auth import User
+from app.extensions import db
+from app.services import MediaService
+from app.utils.dates import parse_exif_datetime, parse_taken_at
+from app.utils.filters import friendly_date
+import uuid6
+
+
+def test_parse_exif_datetime():
+    """UT-DATE-001: EXIF dates are converted to UTC, honoring OffsetTime* when present"""
+    assert parse_exif_datetime('2023:12:23 15:00:00') == datetime(2023, 12, 23, 6, 0, tzinfo=timezone.utc)
+    assert parse_exif_datetime(b'2023:12:23 15:00:00\x00', '+01:00') == datetime(2023, 12, 23, 14, 0, tzinfo=timezone.utc)
+    assert parse_exif_datetime('0000:00:00 00:00:00') is None
+    assert parse_exif_datetime(None) is None
+
+
+def test_parse_taken_at_legacy_strings():
+    """UT-DATE-002: Legacy strings and form values parse as JST unless they carry an offset"""
+    assert parse_taken_at('2023-12-23T15:00:00') == datetime(2023, 12, 23, 6, 0, tzinfo=timezone.utc)
+    assert parse_taken_at('2023-12-23T15:00') == datetime(2023, 12, 23, 6, 0, tzinfo=timezone.utc)
+    assert parse_taken_at('2023-12-23T15:00:00+00:00') == datetime(2023, 12, 23, 15, 0, tzinfo=timezone.utc)
+    assert parse_taken_at('garbage') is None
+    assert parse_taken_at('') is None
+
+
+def test_friendly_date_timezones():
+    """UT-DATE-003: friendly_date renders naive (UTC) and aware datetimes in JST"""
+    assert friendly_date(datetime(2023, 12, 23, 16, 0)) == '2023年12月24日'
+    assert friendly_date(datetime(2023, 12, 23, 16, 0, tzinfo=timezone.utc)) == '2023年12月24日'
+
+
+def _seed_legacy(values):
+    user = User(id=uuid6.uuid7(), email='legacy@ex.com', name='Legacy', google_id='legacy')
+    db.session.add(user)
+    media_list = []
+    for i, value in enumerate(values):
+        media = Media(
+            uploader_id=user.id,
+            filename=f'galleries/2020/01/legacy_{i}.jpg',
+            original_filename=f'legacy_{i}.jpg',
+            mime_type='image/jpeg',
+            file_size_bytes=1,
+            status='ready',
+            taken_at_legacy=value
+        )
+        db.session.add(media)
+        media_list.append(media)
+    db.session.commit()
+    return [m.id for m in media_list]
+
+
+def test_backfill_taken_at_is_chunked_and_resumable(app):
+    """IT-DATE-004: The backfill converts in chunks and a re-run continues where it stopped"""
+    svc = MediaService()
+    with app.app_context():
+        ids = _seed_legacy(['2023-12-23T15:00:00'] * 4 + ['not a date'])
+
+        # Interrupted after the first chunk
+        last_id, converted, unparseable = svc.backfill_taken_at_chunk(None, batch_size=2)
+        assert (converted, unparseable) == (2, 0)
+
+        # A fresh run starts from the beginning and only sees what is left
+        totals = [0, 0]
+        last_id = None
+        while True:
+            last_id, converted, unparseable = svc.backfill_taken_at_chunk(last_id, batch_size=2)
+            if last_id is None:
+                break
+            totals[0] += converted
+            totals[1] += unparseable
+        assert totals == [2, 1]
+
+        db.session.expire_all()
+        rows = [db.session.get(Media, media_id) for media_id in ids]
+        assert all(m.taken_at == datetime(2023, 12, 23, 6, 0) for m in rows[:4])
+        assert all(m.taken_at_legacy is None for m in rows[:4])
+        assert rows[4].taken_at is None and rows[4].taken_at_legacy == 'not a date'
@@ -0,0 +1,148 @@
+import io
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app.extensions import db
+from app.models.auth import User
+from app.models.media import Media
+from app.models.task import ProcessingTask
+from app.services.task_runner import LocalTaskRunner
+import uuid6
+
+
+def _media(uploader):
+    media = Media(
+        uploader=uploader,
+        filename=f'galleries/2025/01/{uuid6.uuid7()}.jpg',
+        original_filename='x.jpg',
+        mime_type='image/jpeg',
+        file_size_bytes=1,
+        status='processing'
+    )
+    db.session.add(media)
+    db.session.commit()
+    return media
+
+
+def _user():
+    user = User(id=uuid6.uuid7(), email=f'{uuid6.uuid7()}@ex.com', name='Runner', google_id=str(uuid6.uuid7()))
+    db.session.add(user)
+    return user
+
+
+def test_claim_is_exclusive_and_fifo(app):
+    """UT-TASK-001: Queued tasks are claimed oldest first and only once"""
+    runner = LocalTaskRunner()
+    with app.app_context():
+        user = _user()
+        first, second = _media(user), _media(user)
+        runner.enqueue(first.id)
+        runner.enqueue(second.id)
+
+        assert [media_id for _, media_id in runner.claim(1)] == [first.id]
+        assert [media_id for _, media_id in runner.claim(5)] == [second.id]
+        assert runner.claim(5) == []
+
+
+def test_complete_retries_then_marks_error(app):
+    """UT-TASK-002: Failed tasks are retried up to LOCAL_TASK_MAX_ATTEMPTS, then the media is marked error"""
+    runner = LocalTaskRunner()
+    app.config['LOCAL_TASK_MAX_ATTEMPTS'] = 2
+    with app.app_context():
+        media = _media(_user())
+        runner.enqueue(media.id)
+
+        task_id, _ = runner.claim(1)[0]
+        runner.complete(task_id, 'boom')
+        assert db.session.get(ProcessingTask, task_id).status == 'queued'
+
+        task_id, _ = runner.claim(1)[0]
+        runner.complete(task_id, 'boom again')
+        task = db.session.get(ProcessingTask, task_id)
+        assert (task.status, task.attempts, task.last_error) == ('error', 2, 'boom again')
+        assert db.session.get(Media, media.id).status == 'error'
+
+        other = _media(media.uploader)
+        runner.enqueue(other.id)
+        task_id, _ = runner.claim(1)[0]
+        runner.complete(task_id)
+        assert db.session.get(ProcessingTask, task_id) is None
+
+
+def test_stale_running_tasks_are_requeued(app):
+    """UT-TASK-003: Tasks left running by a dead process go back to the queue"""
+    runner = LocalTaskRunner()
+    with app.app_context():
+        media = _media(_user())
+        runner.enqueue(media.id)
+        task_id, _ = runner.claim(1)[0]
+
+        assert runner.requeue_stale(3600) == 0
+        db.session.get(ProcessingTask, task_id).started_at = datetime.utcnow() - timedelta(hours=2)
+        db.session.commit()
+
+        assert runner.requeue_stale(3600) == 1
+        assert [t for t, _ in runner.claim(1)] == [task_id]
+
+
+
+def test_tasks_of_leased_media_wait_without_using_attempts(app):
+    """UT-TASK-011: A task whose media another worker holds is neither failed nor requeued as stale"""
+    runner = LocalTaskRunner()
+    app.config['LOCAL_TASK_MAX_ATTEMPTS'] = 1
+    with app.app_context():
+        media = _media(_user())
+        runner.enqueue(media.id)
+        task_id, _ = runner.claim(1)[0]
+
+        # The worker came back 'busy': another worker holds the lease
+        future = Future()
+        future.set_result('busy')
+        runner._inflight[future] = task_id
+        runner._reap()
+        task = db.session.get(ProcessingTask, task_id)
+        assert (task.status, task.attempts) == ('queued', 0)
+        assert db.session.get(Media, media.id).status == 'processing'
+
+        media.processing_lease_until = datetime.utcnow() + timedelta(hours=2)
+        db.session.commit()
+        assert runner.claim(1) == []
+
+        # A long video keeps renewing its lease past LOCAL_TASK_STALE_SEC
+        task.status, task.started_at = 'running', datetime.utcnow() - timedelta(hours=2)
+        db.session.commit()
+        assert runner.requeue_stale(3600) == 0
+
+        media.processing_lease_until = None
+        task.status = 'queued'
+        db.session.commit()
+        assert [t for t, _ in runner.claim(1)] == [task_id]
+
+def test_upload_with_local_runner_only_enqueues(client, app, tmp_path):
+    """IT-TASK-004: With TASK_RUNNER=local the upload request returns before processing"""
+    app.config['TASK_RUNNER'] = 'local'
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    with app.app_context():
+        user = User(id=uuid6.uuid7(), email='localrunner@ex.com', name='Local', google_id='localrunner', role='family')
+        db.session.add(user)
+        db.session.commit()
+        user_id = str(user.id)
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user_id
+        sess['_fresh'] = True
+
+    with patch('app.services.task_runner.LocalTaskRunner.start') as start, \
+         patch('app.blueprints.tasks._process_media_logic') as process, \
+         patch('app.services.media_service.magic.from_buffer', return_value='image/jpeg'):
+        res = client.post('/media/upload', data={'file': (io.BytesIO(b'jpegdata'), 'photo.jpg')},
+                          content_type='multipart/form-data')
+
+    assert res.status_code == 200
+    assert res.get_json()['uploaded'][0]['status'] == 'processing'
+    process.assert_not_called()
+    start.assert_called()
+
+    with app.app_context():
+        task = db.session.execute(db.select(ProcessingTask)).scalar_one()
+        assert task.status == 'queued'
@@ -0,0 +1,131 @@
+import io
+import os
+from unittest.mock import patch
+from PIL import Image
+from app.blueprints.tasks import _process_media_logic, _request_reduced_decode, RENDITION_WIDTHS
+from app.models.media import Media
+from app.models.auth import User
+from app.extensions import db
+import uuid6
+
+
+def test_process_image_renditions(app, tmp_path):
+    """UT-TASK-003: One decode produces the main JPEG plus smaller/modern-format renditions"""
+    app.config.update({'STORAGE_BACKEND': 'local', 'UPLOAD_FOLDER': str(tmp_path)})
+    with app.app_context():
+        user = User(id=uuid6.uuid7(), email='r@ex.com', name='R', google_id='r')
+        db.session.add(user)
+
+        object_name = 'galleries/2025/01/photo.png'
+        os.makedirs(tmp_path / 'galleries/2025/01')
+        Image.new('RGB', (3000, 2000), (200, 120, 40)).save(tmp_path / object_name)
+
+        media = Media(
+            uploader_id=user.id,
+            filename=object_name,
+            original_filename='photo.png',
+            mime_type='image/png',
+            file_size_bytes=1000,
+            status='processing'
+        )
+        db.session.add(media)
+        db.session.commit()
+
+        _process_media_logic(str(media.id))
+        db.session.refresh(media)
+
+        assert media.status == 'ready'
+        assert media.filename == 'galleries/2025/01/photo.jpg'
+        assert (media.width, media.height) == (1920, 1280)
+
+        jpegs = media.renditions_for('jpeg')
+        assert [r['width'] for r in jpegs] == [320, 640]
+        assert [r['width'] for r in media.renditions_for('webp')] == [320, 640, 1920]
+
+        for rendition in media.renditions:
+            path = tmp_path / rendition['path']
+            assert path.exists()
+            with Image.open(path) as img:
+                assert max(img.size) in RENDITION_WIDTHS
+                assert img.size == (rendition['width'], rendition['height'])
+
+
+class _FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket, self.name = bucket, name
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+    def open(self, mode, chunk_size=None):
+        self.bucket.read_chunk_sizes.append(chunk_size)
+        return io.BytesIO(self.bucket.objects[self.name])
+
+    def delete(self):
+        del self.bucket.objects[self.name]
+
+    def upload_from_file(self, f, size=None, content_type=None):
+        self.bucket.objects[self.name] = f.read(size)
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.objects[self.name] = bytes(data)
+
+
+class _FakeBucket:
+    def __init__(self, objects):
+        self.objects = objects
+        self.read_chunk_sizes = []
+
+    def blob(self, name):
+        return _FakeBlob(self, name)
+
+
+def test_process_image_streams_gcs_without_temp_files(app):
+    """UT-TASK-004: GCS originals are streamed into the decoder and outputs uploaded from memory"""
+    source = io.BytesIO()
+    Image.new('RGB', (800, 600), (10, 20, 30)).save(source, 'PNG')
+    bucket = _FakeBucket({'galleries/2025/01/cloud.png': source.getvalue()})
+
+    app.config.update({'STORAGE_BACKEND': 'gcs', 'PROCESSING_READ_CHUNK_SIZE': 1024 * 1024})
+    with app.app_context(), \
+         patch('app.services.storage_backend.gcs_clients.bucket', return_value=bucket), \
+         patch('tempfile.TemporaryDirectory', side_effect=AssertionError('temp dir used')):
+        user = User(id=uuid6.uuid7(), email='g@ex.com', name='G', google_id='g')
+        db.session.add(user)
+        media = Media(
+            uploader_id=user.id,
+            filename='galleries/2025/01/cloud.png',
+            original_filename='cloud.png',
+            mime_type='image/png',
+            file_size_bytes=1000,
+            status='processing'
+        )
+        db.session.add(media)
+        db.session.commit()
+
+        _process_media_logic(str(media.id))
+        db.session.refresh(media)
+
+        assert media.status == 'ready'
+        assert bucket.read_chunk_sizes == [1024 * 1024]
+        assert 'galleries/2025/01/cloud.png' not in bucket.objects
+        with Image.open(io.BytesIO(bucket.objects[media.filename])) as img:
+            assert img.format == 'JPEG' and img.size == (800, 600)
+        assert all(r['path'] in bucket.objects for r in media.renditions)
+
+
+def test_large_jpeg_is_decoded_at_reduced_scale(tmp_path):
+    """UT-TASK-005: Large JPEGs are decoded straight at a reduced scale that still covers the display size"""
+    path = tmp_path / 'large.jpg'
+    Image.new('RGB', (8064, 6048), (90, 90, 90)).save(path, 'JPEG')
+
+    with Image.open(path) as img:
+        _request_reduced_decode(img, RENDITION_WIDTHS[0])
+        img.load()
+        assert img.size == (2016, 1512)
+
+    # Less than twice the display size: decoded as is
+    Image.new('RGB', (3000, 2000)).save(path, 'JPEG')
+    with Image.open(path) as img:
+        _request_reduced_decode(img, RENDITION_WIDTHS[0])
+        assert img.size == (3000, 2000)
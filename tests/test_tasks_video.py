@@ -0,0 +1,262 @@
+import json
+from datetime import datetime, timedelta
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+from app.blueprints.tasks import _process_media_logic, RetryableProcessingError
+from app.extensions import db
+from app.models.auth import User
+from app.models.media import Media
+from app.services import MediaService
+from app.services.ffmpeg_executor import FFmpegExecutor, FFmpegTimeout
+from app.services.storage_backend import InMemoryStorage, memory_storage
+import uuid6
+
+
+class _FakeFFmpeg:
+    """Stands in for the ffmpeg process: answers ffprobe with `probe` and writes ffmpeg outputs."""
+
+    def __init__(self, probe):
+        self.probe = probe
+        self.commands = []
+
+    def __call__(self, cmd, *args, **kwargs):
+        self.commands.append(cmd)
+        if cmd[0] == 'ffprobe':
+            return subprocess.CompletedProcess(cmd, 0, json.dumps(self.probe).encode(), b'')
+        if cmd[-1] == 'pipe:1':
+            return subprocess.CompletedProcess(cmd, 0, b'\xff\xd8thumb', b'')
+        if 'hls' in cmd:
+            # One playlist and two segments per variant
+            for i in range(len(cmd[cmd.index('-var_stream_map') + 1].split())):
+                playlist = Path(cmd[-1].replace('%v', str(i)))
+                playlist.parent.mkdir(parents=True)
+                playlist.write_text('#EXTM3U\n#EXTINF:6.0,\nseg_00000.ts\n#EXTINF:6.0,\nseg_00001.ts\n#EXT-X-ENDLIST\n')
+                for n in range(2):
+                    (playlist.parent / f'seg_{n:05d}.ts').write_bytes(b'ts')
+            return subprocess.CompletedProcess(cmd, 0, b'', b'')
+        # Every output file (inputs follow -i)
+        for i, arg in enumerate(cmd):
+            if arg.endswith(('.mp4', '.jpg')) and cmd[i - 1] != '-i':
+                with open(arg, 'wb') as f:
+                    f.write(b'mp4:' + ' '.join(cmd).encode())
+        return subprocess.CompletedProcess(cmd, 0, b'', b'')
+
+    def encodes(self):
+        return [cmd for cmd in self.commands if cmd[0] == 'ffmpeg' and cmd[-1] != 'pipe:1'
+                and 'hls' not in cmd and '-filter_complex' not in cmd]
+
+    def preview_commands(self):
+        return [cmd for cmd in self.commands if '-skip_frame' in cmd]
+
+
+def _probe(container, video_codec, width, height, audio_codec='aac', rotation=None, pix_fmt='yuv420p'):
+    video = {'codec_type': 'video', 'codec_name': video_codec, 'width': width, 'height': height, 'pix_fmt': pix_fmt}
+    if rotation is not None:
+        video['side_data_list'] = [{'side_data_type': 'Display Matrix', 'rotation': rotation}]
+    streams = [video] + ([{'codec_type': 'audio', 'codec_name': audio_codec}] if audio_codec else [])
+    return {'streams': streams, 'format': {'format_name': container, 'duration': '12.480000'}}
+
+
+def _video(name, mime):
+    user = User(id=uuid6.uuid7(), email=f'{uuid6.uuid7()}@ex.com', name='V', google_id=str(uuid6.uuid7()))
+    db.session.add(user)
+    memory_storage.put_bytes(f'galleries/2026/10/{name}', b'original video')
+    media = Media(uploader_id=user.id, filename=f'galleries/2026/10/{name}', original_filename=name,
+                  mime_type=mime, file_size_bytes=14, status='processing')
+    db.session.add(media)
+    db.session.commit()
+    return media
+
+
+def test_hevc_video_is_transcoded_with_faststart(app):
+    """UT-TASK-006: A rotated HEVC .mov becomes an H.264/AAC faststart MP4 plus a mobile rendition, with metadata"""
+    app.config.update(STORAGE_BACKEND='memory', HLS_ENABLED=False)
+    memory_storage.clear()
+    fake = _FakeFFmpeg(_probe('mov,mp4,m4a,3gp,3g2,mj2', 'hevc', 3840, 2160, rotation=-90))
+    with app.app_context(), patch.object(FFmpegExecutor, '_run_limited', side_effect=fake):
+        media = _video('clip.mov', 'video/quicktime')
+        _process_media_logic(str(media.id))
+        db.session.refresh(media)
+
+        assert media.status == 'ready'
+        assert (media.duration_sec, media.video_codec) == (12.48, 'hevc')
+        # Portrait after rotation, scaled to the main size
+        assert (media.width, media.height) == (1080, 1920)
+        assert media.filename == 'galleries/2026/10/clip.mp4'
+        assert media.mime_type == 'video/mp4'
+        assert not memory_storage.exists('galleries/2026/10/clip.mov')
+        assert media.renditions_for('mp4') == [{'format': 'mp4', 'width': 480, 'height': 854,
+                                                'path': 'galleries/2026/10/renditions/clip_854.mp4'}]
+        assert all(memory_storage.exists(r['path']) for r in media.renditions)
+        assert memory_storage.exists(media.thumbnail_path)
+
+        encodes = fake.encodes()
+        assert len(encodes) == 2
+        for cmd in encodes:
+            assert cmd[cmd.index('-c:v') + 1] == 'libx264'
+            assert cmd[cmd.index('-c:a') + 1] == 'aac'
+            assert cmd[cmd.index('-movflags') + 1] == '+faststart'
+        # ffprobe runs once
+        assert sum(1 for cmd in fake.commands if cmd[0] == 'ffprobe') == 1
+
+
+def test_browser_playable_mp4_is_only_remuxed(app):
+    """UT-TASK-007: A small H.264/AAC MP4 is remuxed (moov moved first) without re-encoding or renditions"""
+    app.config.update(STORAGE_BACKEND='memory', HLS_MIN_DURATION_SEC=60)
+    memory_storage.clear()
+    fake = _FakeFFmpeg(_probe('mov,mp4,m4a,3gp,3g2,mj2', 'h264', 854, 480))
+    with app.app_context(), patch.object(FFmpegExecutor, '_run_limited', side_effect=fake):
+        media = _video('small.mp4', 'video/mp4')
+        _process_media_logic(str(media.id))
+        db.session.refresh(media)
+
+        assert media.filename == 'galleries/2026/10/small.mp4'
+        assert memory_storage.get_bytes(media.filename).startswith(b'mp4:')
+        assert (media.width, media.height) == (854, 480)
+        assert media.renditions_for('mp4') == []
+
+        [cmd] = fake.encodes()
+        assert cmd[cmd.index('-c') + 1] == 'copy'
+        assert '+faststart' in cmd
+
+
+def test_video_previews_come_from_one_keyframe_seeking_run(app):
+    """UT-TASK-008: A sprite sheet and a muted 3s clip are produced by a single ffmpeg run with fast seeking"""
+    app.config.update(STORAGE_BACKEND='memory', HLS_ENABLED=False)
+    memory_storage.clear()
+    fake = _FakeFFmpeg(_probe('mov,mp4,m4a,3gp,3g2,mj2', 'h264', 1920, 1080))
+    with app.app_context(), patch.object(FFmpegExecutor, '_run_limited', side_effect=fake):
+        media = _video('trip.mp4', 'video/mp4')
+        _process_media_logic(str(media.id))
+        db.session.refresh(media)
+
+        [sprite] = media.renditions_for('sprite')
+        assert sprite == {'format': 'sprite', 'width': 160, 'height': 90, 'frames': 10, 'columns': 5,
+                          'path': 'galleries/2026/10/renditions/trip_sprite.jpg'}
+        [clip] = media.renditions_for('preview')
+        assert (clip['width'], clip['height']) == (320, 180)
+        assert memory_storage.exists(sprite['path']) and memory_storage.exists(clip['path'])
+
+        [cmd] = fake.preview_commands()
+        # Keyframes only for the sprite; the clip input seeks 10% in for 3 seconds
+        assert cmd[cmd.index('-skip_frame') + 1] == 'nokey'
+        assert cmd[cmd.index('-ss') + 1] == '1.248' and cmd[cmd.index('-t') + 1] == '3'
+        assert 'tile=5x2' in cmd[cmd.index('-filter_complex') + 1]
+        assert '-an' in cmd
+
+
+def _sign(names, expires_at, method='GET', content_type=None):
+    return {name: f'https://storage.example/{name}?sig={expires_at}' for name in names}
+
+
+def test_long_video_is_packaged_as_hls_and_served_with_signed_segments(app, client):
+    """IT-TASK-001: Long videos get an HLS ladder; playlists are served by the app with segments signed in one batch"""
+    app.config.update(STORAGE_BACKEND='memory', HLS_ENABLED=True, HLS_MIN_DURATION_SEC=10)
+    memory_storage.clear()
+    fake = _FakeFFmpeg(_probe('matroska,webm', 'h264', 1280, 720))
+    with app.app_context(), patch.object(FFmpegExecutor, '_run_limited', side_effect=fake):
+        media = _video('long.mkv', 'video/x-matroska')
+        _process_media_logic(str(media.id))
+        db.session.refresh(media)
+
+        [hls] = media.renditions_for('hls')
+        assert hls['path'] == 'galleries/2026/10/hls/long/master.m3u8'
+        # 1080p rung skipped for a 720p source
+        master = memory_storage.get_bytes(hls['path']).decode()
+        assert 'RESOLUTION=1280x720' in master and 'RESOLUTION=640x360' in master
+        assert 'RESOLUTION=1920x1080' not in master
+        assert memory_storage.exists('galleries/2026/10/hls/long/v2/seg_00001.ts')
+        [cmd] = [cmd for cmd in fake.commands if 'hls' in cmd]
+        assert cmd[cmd.index('-var_stream_map') + 1] == 'v:0,a:0 v:1,a:1 v:2,a:2'
+
+        user = User(id=uuid6.uuid7(), email='hls@ex.com', name='H', google_id='hls', role='family')
+        db.session.add(user)
+        db.session.commit()
+        user_id, media_id = str(user.id), media.id
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user_id
+    with patch.object(InMemoryStorage, 'serves_signed_urls', True), \
+         patch.object(InMemoryStorage, 'sign_urls', side_effect=_sign) as sign:
+        response = client.get('/media/file/galleries/2026/10/hls/long/master.m3u8')
+        assert response.headers['Content-Type'] == 'application/vnd.apple.mpegurl'
+        # Variant playlists stay relative, fetched through the app again
+        assert 'v0/index.m3u8' in response.text.splitlines()
+        assert sign.call_count == 0
+
+        response = client.get('/media/file/galleries/2026/10/hls/long/v1/index.m3u8')
+        lines = response.text.splitlines()
+        assert lines[2].startswith('https://storage.example/galleries/2026/10/hls/long/v1/seg_00000.ts?sig=')
+        assert lines[4].startswith('https://storage.example/galleries/2026/10/hls/long/v1/seg_00001.ts?sig=')
+        assert sign.call_count == 1
+        assert 'private, max-age=' in response.headers['Cache-Control']
+
+    with app.app_context():
+        MediaService().delete_media(db.session.get(Media, media_id))
+        assert memory_storage.names('galleries/2026/10/hls/') == []
+
+
+def test_retry_after_a_later_step_fails_keeps_the_original(app):
+    """UT-TASK-009: A transient failure after the transcode leaves the original in place, and the retry completes"""
+    app.config.update(STORAGE_BACKEND='memory', HLS_ENABLED=False, MEDIA_PROCESSING_MAX_ATTEMPTS=2)
+    memory_storage.clear()
+    fake = _FakeFFmpeg(_probe('mov,mp4,m4a,3gp,3g2,mj2', 'hevc', 1920, 1080))
+
+    def preview_times_out_once(cmd, *args, **kwargs):
+        if '-skip_frame' in cmd and not fake.preview_commands():
+            fake.commands.append(cmd)
+            raise FFmpegTimeout('ffmpeg exceeded 600s')
+        return fake(cmd, *args, **kwargs)
+
+    with app.app_context(), patch.object(FFmpegExecutor, '_run_limited', side_effect=preview_times_out_once):
+        media = _video('clip.mov', 'video/quicktime')
+        with pytest.raises(RetryableProcessingError):
+            _process_media_logic(str(media.id))
+        media = db.session.get(Media, media.id, populate_existing=True)
+        assert (media.status, media.filename) == ('processing', 'galleries/2026/10/clip.mov')
+        assert memory_storage.exists('galleries/2026/10/clip.mov')
+
+        assert _process_media_logic(str(media.id)) == 'ready'
+        media = db.session.get(Media, media.id, populate_existing=True)
+        assert media.filename == 'galleries/2026/10/clip.mp4'
+        assert memory_storage.exists(media.filename)
+        assert not memory_storage.exists('galleries/2026/10/clip.mov')
+
+
+def test_lease_is_renewed_before_each_ffmpeg_job(app):
+    """UT-TASK-010: The claim is extended to cover each job's slot wait and timeout; a lost claim stops processing"""
+    app.config.update(STORAGE_BACKEND='memory', HLS_ENABLED=False, MEDIA_PROCESSING_LEASE_SEC=60,
+                      FFMPEG_QUEUE_TIMEOUT_SEC=3600, FFMPEG_TIMEOUT_SEC=600, FFMPEG_TIMEOUT_PER_VIDEO_SEC=4)
+    memory_storage.clear()
+    fake = _FakeFFmpeg(_probe('mov,mp4,m4a,3gp,3g2,mj2', 'hevc', 1920, 1080))
+    leases = []
+
+    def record_lease(cmd, *args, **kwargs):
+        leases.append(db.session.execute(
+            db.select(Media.processing_lease_until).where(Media.id == media.id)
+        ).scalar() - datetime.utcnow())
+        return fake(cmd, *args, **kwargs)
+
+    with app.app_context(), patch.object(FFmpegExecutor, '_run_limited', side_effect=record_lease):
+        media = _video('long.mov', 'video/quicktime')
+        assert _process_media_logic(str(media.id)) == 'ready'
+        # At least the slot wait plus 600 s, far beyond MEDIA_PROCESSING_LEASE_SEC
+        assert len(leases) == len(fake.commands)
+        assert all(lease > timedelta(seconds=4100) for lease in leases)
+
+    def taken_over(cmd, *args, **kwargs):
+        if cmd[0] == 'ffprobe':
+            # Another worker claimed the item after this one's lease expired
+            with db.engine.begin() as connection:
+                connection.execute(db.update(Media).where(Media.id == media.id)
+                                   .values(processing_attempts=Media.processing_attempts + 1))
+        return fake(cmd, *args, **kwargs)
+
+    with app.app_context(), patch.object(FFmpegExecutor, '_run_limited', side_effect=taken_over):
+        media = _video('other.mov', 'video/quicktime')
+        assert _process_media_logic(str(media.id)) == 'busy'
+        media = db.session.get(Media, media.id, populate_existing=True)
+        assert (media.status, media.filename) == ('processing', 'galleries/2026/10/other.mov')
+        assert media.processing_lease_until is not None
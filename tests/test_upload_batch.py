@@ -0,0 +1,99 @@
+import io
+import time
+from unittest.mock import patch
+import pytest
+from werkzeug.datastructures import FileStorage
+from app.extensions import db
+from app.models.auth import User
+from app.models.task import ProcessingTask
+from app.services import MediaService
+from app.services.storage_backend import GCSStorage, LocalStorage
+import uuid6
+
+
+def _files(names):
+    # Content differs per file even for equal names (identical content is deduplicated)
+    return [(FileStorage(io.BytesIO(b'\xff\xd8\xff' + f'{i}:{name}'.encode()), filename=name), f'comment {i}')
+            for i, name in enumerate(names)]
+
+
+def _uploader():
+    user = User(id=uuid6.uuid7(), email=f'{uuid6.uuid7()}@ex.com', name='Uploader', google_id=str(uuid6.uuid7()), role='family')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.mark.parametrize('naming', ['uuid7', 'sequential'])
+def test_batch_upload_reserves_unique_names(app, tmp_path, naming):
+    """UT-UPLOAD-001: Same-named files in one batch get distinct object names"""
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), TASK_RUNNER='local', UPLOAD_OBJECT_NAMING=naming)
+    with app.app_context(), patch('app.services.task_runner.LocalTaskRunner.start'):
+        media_list, failures = MediaService().upload_media_batch(_files(['image.jpg'] * 5), _uploader())
+
+        assert failures == []
+        names = [m.filename for m in media_list]
+        assert len(set(names)) == 5
+        assert all((tmp_path / name).exists() for name in names)
+        assert [m.description for m in media_list] == [f'comment {i}' for i in range(5)]
+        # Processing queued in bulk
+        assert db.session.execute(db.select(db.func.count(ProcessingTask.id))).scalar() == 5
+
+
+def test_batch_upload_stores_files_concurrently(app):
+    """UT-UPLOAD-002: Storage writes of one batch overlap instead of running one by one"""
+    app.config.update(STORAGE_BACKEND='gcs', TASK_RUNNER='local', UPLOAD_WORKERS=8)
+
+    def slow_save(object_name, stream, content_type=None):
+        time.sleep(0.2)
+
+    svc = MediaService()
+    with app.app_context(), \
+         patch.object(GCSStorage, 'put', side_effect=slow_save), \
+         patch('app.services.task_runner.LocalTaskRunner.start'):
+        started = time.monotonic()
+        media_list, _ = svc.upload_media_batch(_files([f'p{i}.jpg' for i in range(8)]), _uploader())
+        elapsed = time.monotonic() - started
+
+    assert len(media_list) == 8
+    assert elapsed < 0.8
+
+
+def test_batch_upload_keeps_stored_files_when_one_fails(app):
+    """UT-UPLOAD-003: A failed storage write is reported without dropping the other files"""
+    app.config.update(STORAGE_BACKEND='gcs', TASK_RUNNER='local')
+
+    def flaky_save(object_name, stream, content_type=None):
+        if 'bad' in object_name:
+            raise IOError('network down')
+
+    with app.app_context(), \
+         patch.object(GCSStorage, 'put', side_effect=flaky_save), \
+         patch('app.services.task_runner.LocalTaskRunner.start'):
+        media_list, failures = MediaService().upload_media_batch(_files(['ok.jpg', 'bad.jpg', 'ok2.jpg']), _uploader())
+
+        assert [m.original_filename for m in media_list] == ['ok.jpg', 'ok2.jpg']
+        assert [name for name, _ in failures] == ['bad.jpg']
+
+
+def test_batch_upload_rejects_invalid_files_before_storing(app):
+    """UT-UPLOAD-004: One invalid extension rejects the batch before anything is written"""
+    with app.app_context(), patch.object(LocalStorage, 'put') as save:
+        with pytest.raises(ValueError):
+            MediaService().upload_media_batch(_files(['ok.jpg', 'evil.exe']), _uploader())
+    save.assert_not_called()
+
+
+def test_uuid7_naming_never_probes_storage(app):
+    """UT-UPLOAD-005: Default naming picks collision-free names without existence checks"""
+    app.config.update(STORAGE_BACKEND='gcs', TASK_RUNNER='local')
+    with app.app_context(), \
+         patch.object(GCSStorage, 'exists') as exists, \
+         patch.object(GCSStorage, 'put'), \
+         patch('app.services.task_runner.LocalTaskRunner.start'):
+        media_list, _ = MediaService().upload_media_batch(_files(['IMG_0001.JPG'] * 3), _uploader())
+        names = [m.filename for m in media_list]
+
+    exists.assert_not_called()
+    assert len(set(names)) == 3
+    assert all(name.startswith('galleries/') and name.endswith('.JPG') and '/IMG_0001_' in name for name in names)
@@ -0,0 +1,149 @@
+import base64
+import os
+from unittest.mock import patch, MagicMock
+import google_crc32c
+import pytest
+from app.extensions import db
+from app.models.auth import User
+from app.models.media import Media
+from app.services import MediaService
+from app.services.storage_backend import memory_storage
+import uuid6
+
+PART = 256 * 1024
+
+
+@pytest.fixture
+def uploader_client(client, app, tmp_path):
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), UPLOAD_PART_SIZE=PART, TASK_RUNNER='local')
+    with app.app_context():
+        user = User(id=uuid6.uuid7(), email='resumable@ex.com', name='R', google_id='resumable', role='family')
+        db.session.add(user)
+        db.session.commit()
+        user_id = str(user.id)
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user_id
+        sess['_fresh'] = True
+    with patch('app.services.task_runner.LocalTaskRunner.start'):
+        yield client
+
+
+def _crc(data):
+    return base64.b64encode(google_crc32c.Checksum(data).digest()).decode()
+
+
+def test_local_chunked_upload_resumes_and_assembles(uploader_client, app, tmp_path):
+    """IT-RESUME-001: Parts arrive out of order and across sessions; complete() assembles and verifies"""
+    data = os.urandom(PART * 2 + 1000)
+    res = uploader_client.post('/media/upload/sessions', json={'filename': 'movie.mp4', 'mime_type': 'video/mp4', 'size': len(data)})
+    session = res.get_json()
+    assert session['parts'] == 3 and session['part_size'] == PART
+    token = session['token']
+
+    # Upload the last part first, then "reconnect" and ask what is missing
+    assert uploader_client.put(f'/media/upload/sessions/{token}/parts/2', data=data[2 * PART:]).status_code == 200
+    status = uploader_client.get(f'/media/upload/sessions/{token}').get_json()
+    assert status['completed_parts'] == [2]
+
+    for index in (0, 1):
+        uploader_client.put(f'/media/upload/sessions/{token}/parts/{index}', data=data[index * PART:(index + 1) * PART])
+
+    res = uploader_client.post(f'/media/upload/sessions/{token}/complete',
+                               json={'original_filename': 'movie.mp4', 'crc32c': _crc(data)})
+    assert res.status_code == 200
+
+    with app.app_context():
+        media = db.session.get(Media, uuid6.UUID(res.get_json()['id']))
+        assert media.file_size_bytes == len(data)
+        assert (tmp_path / media.filename).read_bytes() == data
+    # Parts are cleaned up
+    assert not (tmp_path / 'uploads').exists() or not any((tmp_path / 'uploads').iterdir())
+
+
+def test_part_with_wrong_length_is_rejected(uploader_client):
+    """UT-RESUME-002: A truncated part is not stored"""
+    token = uploader_client.post('/media/upload/sessions', json={'filename': 'a.mp4', 'size': PART * 2}).get_json()['token']
+    res = uploader_client.put(f'/media/upload/sessions/{token}/parts/0', data=b'x' * 10)
+    assert res.status_code == 400
+    assert uploader_client.get(f'/media/upload/sessions/{token}').get_json()['completed_parts'] == []
+
+
+def test_checksum_mismatch_discards_object(uploader_client, tmp_path):
+    """UT-RESUME-003: complete() with a wrong checksum deletes the assembled object"""
+    data = os.urandom(1000)
+    session = uploader_client.post('/media/upload/sessions', json={'filename': 'b.mp4', 'size': len(data)}).get_json()
+    uploader_client.put(f"/media/upload/sessions/{session['token']}/parts/0", data=data)
+
+    res = uploader_client.post(f"/media/upload/sessions/{session['token']}/complete", json={'crc32c': _crc(b'other')})
+    assert res.status_code == 400
+    assert not (tmp_path / session['object_name']).exists()
+
+
+def test_tampered_session_token_is_rejected(uploader_client):
+    """UT-RESUME-004: Tampered tokens are rejected"""
+    token = uploader_client.post('/media/upload/sessions', json={'filename': 'c.mp4', 'size': 10}).get_json()['token']
+    assert uploader_client.get(f'/media/upload/sessions/{token}x').status_code == 400
+
+
+def test_finalize_verifies_gcs_object(app):
+    """UT-RESUME-005: finalize_upload checks the stored object's size and CRC32C"""
+    app.config['STORAGE_BACKEND'] = 'gcs'
+    blob = MagicMock(size=10, crc32c='AAAAAA==')
+    bucket = MagicMock()
+    bucket.get_blob.return_value = blob
+    with app.app_context(), patch('app.services.storage_backend.gcs_clients') as clients:
+        clients.bucket.return_value = bucket
+        user = User(id=uuid6.uuid7(), email='fin@ex.com', name='F', google_id='fin')
+        with pytest.raises(ValueError, match='Size mismatch'):
+            MediaService().finalize_upload('galleries/2026/10/x.mp4', 'x.mp4', 'video/mp4', 11, user)
+        with pytest.raises(ValueError, match='Checksum mismatch'):
+            MediaService().finalize_upload('galleries/2026/10/x.mp4', 'x.mp4', 'video/mp4', 10, user, crc32c='BBBBBB==')
+        assert bucket.blob.return_value.delete.call_count == 2
+
+
+def test_gcs_assemble_composes_parts_in_order(app):
+    """UT-RESUME-006: On GCS the parts are composed into the final object and deleted"""
+    from app.services import UploadSessionService
+    app.config.update(STORAGE_BACKEND='gcs', UPLOAD_PART_SIZE=PART)
+    svc = UploadSessionService()
+    with app.app_context(), patch('app.services.storage_backend.gcs_clients') as clients:
+        bucket = clients.bucket.return_value
+        created = svc.create_session('galleries/2026/10/v.mp4', 'video/mp4', PART * 2 + 1, 'u1')
+        session = svc.load_session(created['token'], 'u1')
+
+        listed = [MagicMock(size=svc.part_length(session, i)) for i in range(3)]
+        for i, blob in enumerate(listed):
+            blob.name = f"uploads/{session['id']}/part-{i:05d}"
+        bucket.list_blobs.return_value = listed
+        blobs = {}
+        bucket.blob.side_effect = lambda name: blobs.setdefault(name, MagicMock())
+
+        svc.assemble(session)
+
+        destination = blobs['galleries/2026/10/v.mp4']
+        sources = destination.compose.call_args.args[0]
+        assert sources == [blobs[blob.name] for blob in listed]
+        assert destination.content_type == 'video/mp4'
+        assert all(source.delete.called for source in sources)
+
+
+def test_chunked_upload_goes_through_the_storage_backend(uploader_client, app, tmp_path):
+    """IT-RESUME-002: Parts and the assembled file live in the configured backend, never on disk"""
+    app.config['STORAGE_BACKEND'] = 'memory'
+    memory_storage.clear()
+    data = os.urandom(PART + 500)
+    session = uploader_client.post('/media/upload/sessions', json={'filename': 'm.mp4', 'mime_type': 'video/mp4',
+                                                                     'size': len(data)}).get_json()
+    assert session['direct_parts'] is False
+    token = session['token']
+    assert uploader_client.post(f'/media/upload/sessions/{token}/parts/0').status_code == 400
+
+    for index in (1, 0):
+        res = uploader_client.put(f'/media/upload/sessions/{token}/parts/{index}', data=data[index * PART:(index + 1) * PART])
+        assert res.status_code == 200
+    res = uploader_client.post(f'/media/upload/sessions/{token}/complete', json={'crc32c': _crc(data)})
+
+    assert res.status_code == 200
+    assert memory_storage.get_bytes(session['object_name']) == data
+    assert memory_storage.names('uploads/') == []
+    assert list(tmp_path.iterdir()) == []
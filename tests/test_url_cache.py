@@ -0,0 +1,120 @@
+from unittest.mock import MagicMock
+from app.services import MediaService
+from app.services.url_cache import SignedUrlCache, signed_url_cache
+from app.models.auth import User
+from app.extensions import db
+import uuid6
+
+
+def test_signed_url_cache_lru_and_ttl():
+    """UT-URLCACHE-001: Entries are evicted LRU and not served close to expiry"""
+    cache = SignedUrlCache(max_entries=2)
+    cache.put(('a', 'GET'), 'url-a', 1000)
+    cache.put(('b', 'GET'), 'url-b', 1000)
+    assert cache.get(('a', 'GET'), now=0) == ('url-a', 1000)
+
+    # 'b' is least recently used now
+    cache.put(('c', 'GET'), 'url-c', 1000)
+    assert cache.get(('b', 'GET'), now=0) is None
+    assert len(cache) == 2
+
+    assert cache.get(('a', 'GET'), min_remaining=100, now=950) is None
+    assert cache.get(('c', 'GET'), min_remaining=100, now=800) == ('url-c', 1000)
+
+    cache.invalidate('c')
+    assert cache.get(('c', 'GET'), now=0) is None
+
+
+def _mock_signing(mocker):
+    clients = mocker.patch('app.services.storage_backend.gcs_clients')
+    bucket = clients.bucket.return_value
+    bucket.blob.side_effect = lambda name: MagicMock(
+        generate_signed_url=MagicMock(return_value=f"https://signed/{name}")
+    )
+    return bucket
+
+
+def test_get_cached_signed_url_signs_once(app, mocker):
+    """UT-URLCACHE-002: Repeated reads of an object reuse one bucket-aligned signature"""
+    signed_url_cache.clear()
+    bucket = _mock_signing(mocker)
+    app.config['STORAGE_BACKEND'] = 'gcs'
+
+    with app.app_context():
+        svc = MediaService()
+        first = svc.get_cached_signed_url('galleries/2025/01/a.jpg')
+        second = svc.get_cached_signed_url('galleries/2025/01/a.jpg')
+        svc.get_cached_signed_url('galleries/2025/01/b.jpg')
+
+    assert first == second
+    assert first[1] % app.config['SIGNED_URL_BUCKET_SEC'] == 0
+    assert bucket.blob.call_count == 2
+
+
+def test_serve_file_redirect_is_cacheable(client, app, mocker):
+    """IT-URLCACHE-001: /media/file redirects to the same URL with a private Cache-Control"""
+    signed_url_cache.clear()
+    _mock_signing(mocker)
+    app.config['STORAGE_BACKEND'] = 'gcs'
+
+    with app.app_context():
+        user = User(id=uuid6.uuid7(), email='c@ex.com', name='C', google_id='c')
+        db.session.add(user)
+        db.session.commit()
+        user_id = str(user.id)
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user_id
+        sess['_fresh'] = True
+
+    first = client.get('/media/file/galleries/2025/01/a.jpg')
+    second = client.get('/media/file/galleries/2025/01/a.jpg')
+
+    assert first.status_code == 302
+    assert first.headers['Location'] == second.headers['Location']
+    assert first.headers['Cache-Control'].startswith('private, max-age=')
+
+
+def test_get_signed_urls_hmac_batch(app, mocker):
+    """UT-URLCACHE-003: With an HMAC key a batch is signed locally and deterministically"""
+    signed_url_cache.clear()
+    clients = mocker.patch('app.services.storage_backend.gcs_clients')
+    app.config.update({'STORAGE_BACKEND': 'gcs', 'GCS_HMAC_ACCESS_ID': 'GOOG1EXAMPLE', 'GCS_HMAC_SECRET': 'secret'})
+
+    with app.app_context():
+        svc = MediaService()
+        names = ['galleries/2025/01/a b.jpg', 'galleries/2025/01/c.jpg', 'galleries/2025/01/c.jpg', None]
+        urls = svc.get_signed_urls(names)
+        signed_url_cache.clear()
+        again = svc.get_signed_urls(names)
+
+    clients.bucket.assert_not_called()
+    assert set(urls) == {'galleries/2025/01/a b.jpg', 'galleries/2025/01/c.jpg'}
+    assert urls == again
+    url = urls['galleries/2025/01/a b.jpg'][0]
+    assert url.startswith('https://storage.googleapis.com/')
+    assert '/galleries/2025/01/a%20b.jpg?' in url
+    assert 'X-Goog-Algorithm=GOOG4-HMAC-SHA256' in url
+    assert 'X-Goog-Signature=' in url
+
+
+def test_index_embeds_direct_urls(client, app, mocker):
+    """IT-URLCACHE-002: The gallery page links images straight to storage"""
+    from tests.test_services_feed import _seed_media
+    signed_url_cache.clear()
+    sign = mocker.patch.object(MediaService, 'get_signed_urls', side_effect=lambda names, **k: {
+        n: (f"https://signed/{n}", 0) for n in names
+    })
+    app.config['STORAGE_BACKEND'] = 'gcs'
+
+    with app.app_context():
+        user_id = str(_seed_media(3).id)
+
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user_id
+        sess['_fresh'] = True
+
+    html = client.get('/').get_data(as_text=True)
+    sign.assert_called_once()
+    assert 'data-src="https://signed/galleries/2025/01/img_0.jpg"' in html
+    assert 'src="/media/file/' not in html